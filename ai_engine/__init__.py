@@ -28,3 +28,11 @@ def get_model_function(model_name: str) -> ModelFunction | None:
         return None
 
     return _load_model_function(definition.module, definition.handler)
+
+
+def get_summary_function(model_name: str) -> ModelFunction | None:
+    definition = get_model_definition(model_name)
+    if not definition or not definition.summary_handler:
+        return None
+
+    return _load_model_function(definition.module, definition.summary_handler)
@@ -3,7 +3,12 @@ from __future__ import annotations
 from typing import Any, Dict, Generator
 
 from ai_engine.gemini import gemini_stream as _provider_stream
+from ai_engine.gemini import summarize_history as _provider_summarize
 
 
 def base_stream(user_id: str, user_message_data: Dict[str, Any]) -> Generator[Any, None, None]:
     yield from _provider_stream(user_id, user_message_data)
+
+
+def base_summarize(previous_summary: str, transcript: str, max_chars: int) -> str:
+    return _provider_summarize(previous_summary, transcript, max_chars)
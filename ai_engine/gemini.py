@@ -13,6 +13,7 @@ from google import genai
 from google.genai import errors, types
 
 from ai_engine.personalization import build_system_prompt
+from ai_engine.prompt_templates import render_prompt
 from config import GEMINI_API_KEY
 from services.files import restore_stored_file_for_model
 from services.model_tools import (
@@ -23,6 +24,7 @@ from services.model_tools import (
     model_tool_declarations,
     serialize_tool_output,
 )
+from utils.concurrency import release_idle_db_connection
 
 logger = logging.getLogger(__name__)
 
@@ -509,6 +511,9 @@ def gemini_stream(user_id: str, user_message_data: dict[str, Any]) -> Generator[
             function_calls: list[tuple[str, dict[str, Any]]] = []
             round_answer_chunks: list[str] = []
 
+            # Prompt and tool preparation only read; keep no connection checked out
+            # while the provider stream is awaited.
+            release_idle_db_connection()
             response_stream = chat.send_message_stream(
                 next_message,
                 config=_generation_config(
@@ -697,3 +702,35 @@ def gemini_stream(user_id: str, user_message_data: dict[str, Any]) -> Generator[
                 client.close()
             except Exception:
                 logger.warning("Failed to close Gemini 3.1 Flash-Lite client", exc_info=True)
+
+
+def summarize_history(previous_summary: str, transcript: str, max_chars: int) -> str:
+    if not GEMINI_API_KEY or GEMINI_API_KEY == "ВАШ_API_КЛЮЧ":
+        raise RuntimeError("gemini_api_key_not_configured")
+
+    prompt = render_prompt(
+        "context/summarize_conversation.md",
+        {
+            "MAX_CHARS": max_chars,
+            "PREVIOUS_SUMMARY": previous_summary or "(none)",
+            "TRANSCRIPT": transcript,
+        },
+    )
+    client = genai.Client(api_key=GEMINI_API_KEY)
+    try:
+        response = client.models.generate_content(
+            model=GEMINI_31_FLASH_LITE_MODEL_ID,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                thinking_config=types.ThinkingConfig(thinking_level=types.ThinkingLevel.MINIMAL),
+                automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True),
+            ),
+        )
+    except errors.APIError as exc:
+        raise RuntimeError("gemini_api_request_failed") from exc
+    finally:
+        try:
+            client.close()
+        except Exception:
+            logger.warning("Failed to close Gemini 3.1 Flash-Lite client", exc_info=True)
+    return _THINK_BLOCK_RE.sub("", str(response.text or "")).strip()[:max_chars]
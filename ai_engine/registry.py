@@ -4,6 +4,8 @@ from dataclasses import dataclass
 from enum import StrEnum
 from importlib.util import find_spec
 
+from config import CHAT_CONTEXT_TOKEN_BUDGET, CHAT_CONTEXT_VERBATIM_TURNS
+
 
 class ModelStage(StrEnum):
     RELEASE = "release"
@@ -25,6 +27,12 @@ class ModelDefinition:
     subtitle_key: str | None = None
     thinking_levels: tuple[str, ...] = ()
     default_thinking_level: str | None = None
+    # History sent to the model, in estimated tokens; None uses CHAT_CONTEXT_TOKEN_BUDGET
+    # and 0 sends the whole active path.
+    context_token_budget: int | None = None
+    context_verbatim_turns: int | None = None
+    # Callable in ``module`` that folds older turns into the rolling session summary.
+    summary_handler: str | None = None
 
 
 DEFAULT_MODEL_ID = "base"
@@ -44,6 +52,8 @@ MODEL_DEFINITIONS: tuple[ModelDefinition, ...] = (
         handler="base_stream",
         thinking_levels=("minimal", "low", "medium", "high"),
         default_thinking_level="medium",
+        context_token_budget=32000,
+        summary_handler="base_summarize",
     ),
     ModelDefinition(
         id="demo_image",
@@ -110,3 +120,14 @@ def model_runtime_available(definition: ModelDefinition) -> bool:
         return find_spec(definition.module) is not None
     except (ImportError, AttributeError, ValueError):
         return False
+
+
+def model_context_limits(model_name: str | None) -> tuple[int, int]:
+    """Token budget and verbatim turn count for the history sent to ``model_name``."""
+    definition = get_model_definition(model_name)
+    budget = definition.context_token_budget if definition else None
+    turns = definition.context_verbatim_turns if definition else None
+    return (
+        CHAT_CONTEXT_TOKEN_BUDGET if budget is None else max(0, budget),
+        CHAT_CONTEXT_VERBATIM_TURNS if turns is None else max(1, turns),
+    )
@@ -32,6 +32,7 @@ from config import (
     VALIDATE_USER_AGENT,
 )
 from routes.api import api_bp
+from services.attachment_lifecycle import sweep_managed_files
 from utils.audit_log import AuditEvents, log_audit_event
 from utils.auth import setup_auth
 from utils.csrf_protection import add_csrf_token_to_response, setup_csrf_protection
@@ -133,6 +134,9 @@ def create_app():
             retention_result = prune_guest_chat_files(chats_folder=CHATS_FOLDER)
             if retention_result.get("deleted"):
                 logger.info("Privacy retention pruned guest chat files: %s", retention_result)
+            gc_result = sweep_managed_files(chats_folder=CHATS_FOLDER)
+            if gc_result["uploads"] or gc_result["generated_images"]:
+                logger.info("Attachment sweep deleted unreferenced files: %s", gc_result)
     except Exception as exc:
         logger.warning("Privacy retention pruning skipped: %s", exc, exc_info=True)
 
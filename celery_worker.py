@@ -1,6 +1,8 @@
 from celery import Celery
 
 from app_factory import create_app
+from config import ATTACHMENT_GC_INTERVAL_SECONDS
+from services.session_bulk_delete import SESSION_BULK_DELETE_STALE_SECONDS
 
 
 def make_celery(app):
@@ -8,8 +10,19 @@ def make_celery(app):
         app.import_name,
         backend=app.config.get("CELERY_RESULT_BACKEND"),
         broker=app.config.get("CELERY_BROKER_URL"),
+        include=["services.tasks"],
     )
     celery.conf.update(app.config)
+    celery.conf.beat_schedule = {
+        "attachments-sweep": {
+            "task": "attachments.sweep",
+            "schedule": float(ATTACHMENT_GC_INTERVAL_SECONDS),
+        },
+        "sessions-resume-bulk-deletes": {
+            "task": "sessions.resume_bulk_deletes",
+            "schedule": float(SESSION_BULK_DELETE_STALE_SECONDS),
+        },
+    }
 
     class ContextTask(celery.Task):
         def __call__(self, *args, **kwargs):
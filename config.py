@@ -36,6 +36,99 @@ try:
 except ValueError:
     CHAT_MAX_VARIANTS_PER_TURN: int = 50
 
+try:
+    CHAT_WRITE_MAX_ATTEMPTS: int = max(1, min(50, int(os.getenv("CHAT_WRITE_MAX_ATTEMPTS", "8"))))
+except ValueError:
+    CHAT_WRITE_MAX_ATTEMPTS: int = 8
+
+try:
+    # Top-level message fields at least this large are compressed at rest; 0 disables.
+    STORAGE_COMPRESSION_MIN_BYTES: int = max(
+        0, int(os.getenv("STORAGE_COMPRESSION_MIN_BYTES", "2048"))
+    )
+except ValueError:
+    STORAGE_COMPRESSION_MIN_BYTES: int = 2048
+
+try:
+    # Fallback model context budget in estimated tokens when a model sets none; 0 disables.
+    CHAT_CONTEXT_TOKEN_BUDGET: int = max(0, int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "24000")))
+except ValueError:
+    CHAT_CONTEXT_TOKEN_BUDGET: int = 24000
+
+try:
+    CHAT_CONTEXT_VERBATIM_TURNS: int = max(
+        1, min(200, int(os.getenv("CHAT_CONTEXT_VERBATIM_TURNS", "12")))
+    )
+except ValueError:
+    CHAT_CONTEXT_VERBATIM_TURNS: int = 12
+
+try:
+    CHAT_CONTEXT_SUMMARY_MAX_CHARS: int = max(
+        500, min(50_000, int(os.getenv("CHAT_CONTEXT_SUMMARY_MAX_CHARS", "4000")))
+    )
+except ValueError:
+    CHAT_CONTEXT_SUMMARY_MAX_CHARS: int = 4000
+
+try:
+    CHAT_CONTEXT_SUMMARY_WORKERS: int = max(
+        1, min(16, int(os.getenv("CHAT_CONTEXT_SUMMARY_WORKERS", "2")))
+    )
+except ValueError:
+    CHAT_CONTEXT_SUMMARY_WORKERS: int = 2
+
+try:
+    # How long shared caches (nginx, CDN) may serve a public share snapshot before
+    # revalidating it with its ETag; this bounds how long an unshared chat stays visible.
+    SHARE_SNAPSHOT_CACHE_SECONDS: int = max(
+        0, min(86_400, int(os.getenv("SHARE_SNAPSHOT_CACHE_SECONDS", "60")))
+    )
+except ValueError:
+    SHARE_SNAPSHOT_CACHE_SECONDS: int = 60
+
+try:
+    # How long a worker reuses a granted /uploads/ access decision for the same user.
+    # The worker that revokes a share or deletes a chat drops its cache at once; other
+    # workers keep serving such grants for at most this long.
+    UPLOAD_ACCESS_CACHE_SECONDS: int = max(
+        0, min(3600, int(os.getenv("UPLOAD_ACCESS_CACHE_SECONDS", "10")))
+    )
+except ValueError:
+    UPLOAD_ACCESS_CACHE_SECONDS: int = 10
+
+try:
+    # Unreferenced uploads and generated images are deleted only after staying
+    # unreferenced this long, so a file re-attached meanwhile is never lost.
+    ATTACHMENT_GC_GRACE_SECONDS: int = max(
+        0, min(30 * 86_400, int(os.getenv("ATTACHMENT_GC_GRACE_SECONDS", "3600")))
+    )
+except ValueError:
+    ATTACHMENT_GC_GRACE_SECONDS: int = 3600
+
+try:
+    ATTACHMENT_GC_INTERVAL_SECONDS: int = max(
+        60, min(86_400, int(os.getenv("ATTACHMENT_GC_INTERVAL_SECONDS", "600")))
+    )
+except ValueError:
+    ATTACHMENT_GC_INTERVAL_SECONDS: int = 600
+
+try:
+    ATTACHMENT_GC_BATCH_SIZE: int = max(
+        1, min(10_000, int(os.getenv("ATTACHMENT_GC_BATCH_SIZE", "500")))
+    )
+except ValueError:
+    ATTACHMENT_GC_BATCH_SIZE: int = 500
+
+try:
+    # In-process budget for restored history attachments (validated classification
+    # plus base64 data); 0 disables the cache.
+    MODEL_PART_CACHE_MAX_BYTES: int = max(
+        0, int(os.getenv("MODEL_PART_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    )
+except ValueError:
+    MODEL_PART_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+# Optional directory shared by workers for validated attachment classifications.
+MODEL_PART_CACHE_DIR: str = os.getenv("MODEL_PART_CACHE_DIR", "").strip()
+
 ALLOWED_IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "webp", "gif"}
 DEFAULT_LANGUAGE: str = "ru"
 
@@ -55,6 +148,8 @@ def _env_bool(name: str, default: bool = False) -> bool:
 
 
 PYTHON_RUNNER_ENABLED = _env_bool("PYTHON_RUNNER_ENABLED", default=False)
+# Render public share snapshots into /c/<public_id> for first paint before the SPA loads.
+SHARE_SNAPSHOT_HTML = _env_bool("SHARE_SNAPSHOT_HTML", default=True)
 
 
 def _sqlite_directory_usable(folder: Path) -> bool:
@@ -133,6 +228,8 @@ CORS_ALLOW_HEADERS = [
     "X-Request-Id",
     "Accept",
     "Accept-Language",
+    "If-None-Match",
+    "Last-Event-ID",
 ]
 
 CORS_EXPOSE_HEADERS = [
@@ -143,6 +240,7 @@ CORS_EXPOSE_HEADERS = [
     "X-Page-Number",
     "X-Chat-Request-Id",
     "X-Chat-Session-Token",
+    "ETag",
 ]
 
 CORS_METHODS = ["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"]
@@ -208,6 +306,66 @@ REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/1")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/1")
 
+SESSION_LOCK_BACKEND = os.getenv("SESSION_LOCK_BACKEND", "memory").strip().lower() or "memory"
+if SESSION_LOCK_BACKEND not in {"memory", "file", "redis"}:
+    SESSION_LOCK_BACKEND = "memory"
+SESSION_LOCK_DIR: Path = Path(os.getenv("SESSION_LOCK_DIR", str(CHATS_FOLDER / ".locks")))
+try:
+    SESSION_LOCK_LEASE_SECONDS: float = max(
+        1.0, float(os.getenv("SESSION_LOCK_LEASE_SECONDS", "30"))
+    )
+except ValueError:
+    SESSION_LOCK_LEASE_SECONDS: float = 30.0
+try:
+    SESSION_LOCK_WAIT_SECONDS: float = max(0.1, float(os.getenv("SESSION_LOCK_WAIT_SECONDS", "10")))
+except ValueError:
+    SESSION_LOCK_WAIT_SECONDS: float = 10.0
+
+# Journal of streamed /chat events for Last-Event-ID resumes: redis, memory or off.
+CHAT_STREAM_BACKEND = os.getenv("CHAT_STREAM_BACKEND", "redis").strip().lower() or "redis"
+if CHAT_STREAM_BACKEND not in {"redis", "memory", "off"}:
+    CHAT_STREAM_BACKEND = "redis"
+try:
+    CHAT_STREAM_TTL_SECONDS: int = max(30, int(os.getenv("CHAT_STREAM_TTL_SECONDS", "600")))
+except ValueError:
+    CHAT_STREAM_TTL_SECONDS: int = 600
+try:
+    CHAT_STREAM_MAX_EVENTS: int = max(100, int(os.getenv("CHAT_STREAM_MAX_EVENTS", "5000")))
+except ValueError:
+    CHAT_STREAM_MAX_EVENTS: int = 5000
+try:
+    CHAT_STREAM_LEASE_SECONDS: int = max(5, int(os.getenv("CHAT_STREAM_LEASE_SECONDS", "30")))
+except ValueError:
+    CHAT_STREAM_LEASE_SECONDS: int = 30
+# Reply and thinking deltas are coalesced into one SSE frame per window; 0 ms disables it.
+try:
+    CHAT_STREAM_FLUSH_MS: int = max(0, int(os.getenv("CHAT_STREAM_FLUSH_MS", "30")))
+except ValueError:
+    CHAT_STREAM_FLUSH_MS: int = 30
+try:
+    CHAT_STREAM_FLUSH_BYTES: int = max(1, int(os.getenv("CHAT_STREAM_FLUSH_BYTES", "4096")))
+except ValueError:
+    CHAT_STREAM_FLUSH_BYTES: int = 4096
+# Per client type (desktop, mobile) overrides as "<type>=<ms>:<bytes>", comma separated.
+CHAT_STREAM_FLUSH_POLICIES: dict[str, tuple[int, int]] = {}
+for raw_policy in os.getenv("CHAT_STREAM_FLUSH_POLICIES", "").split(","):
+    client_type, _sep, raw_limits = raw_policy.partition("=")
+    raw_interval, _sep, raw_bytes = raw_limits.partition(":")
+    try:
+        CHAT_STREAM_FLUSH_POLICIES[client_type.strip().lower()] = (
+            max(0, int(raw_interval)),
+            max(1, int(raw_bytes or CHAT_STREAM_FLUSH_BYTES)),
+        )
+    except ValueError:
+        continue
+
+# inline runs /chat generation in the web worker; worker hands it to Celery and only
+# relays the journaled events (needs CHAT_STREAM_BACKEND=redis).
+CHAT_GENERATION_MODE = os.getenv("CHAT_GENERATION_MODE", "inline").strip().lower() or "inline"
+if CHAT_GENERATION_MODE not in {"inline", "worker"}:
+    CHAT_GENERATION_MODE = "inline"
+CHAT_GENERATION_QUEUE = os.getenv("CHAT_GENERATION_QUEUE", "celery").strip() or "celery"
+
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 APPLE_APP_BUNDLE_ID = (
@@ -0,0 +1,27 @@
+"""Gunicorn settings of the web container, overridable through ``GUNICORN_*`` variables.
+
+The default ``gthread`` worker serves ``workers * threads`` requests at a time, and
+an SSE chat stream holds its thread for the whole generation. ``gevent`` runs each
+request on a greenlet instead, so up to ``GUNICORN_WORKER_CONNECTIONS`` streams per
+worker can wait on the model provider concurrently (see ``utils/concurrency.py``).
+"""
+
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread").strip().lower() or "gthread"
+workers = _env_int("GUNICORN_WORKERS", 2)
+threads = _env_int("GUNICORN_THREADS", 4)
+worker_connections = _env_int("GUNICORN_WORKER_CONNECTIONS", 500)
+timeout = _env_int("GUNICORN_TIMEOUT", 120)
+accesslog = "-"
+access_log_format = '%(t)s "%(m)s %(H)s" %(s)s %(b)s'
+errorlog = "-"
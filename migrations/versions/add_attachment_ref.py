@@ -0,0 +1,142 @@
+"""Index of the uploads referenced by each chat message.
+
+Revision ID: add_attachment_ref
+Revises: add_chat_share_snapshot
+Create Date: 2026-10-17
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "add_attachment_ref"
+down_revision = "add_chat_share_snapshot"
+branch_labels = None
+depends_on = None
+
+UPLOAD_NAME_RE = re.compile(r"^[a-f0-9]{32}(?:\.[a-z0-9]{1,12})?$")
+
+
+def _loads(raw):
+    try:
+        return json.loads(raw or "null")
+    except (TypeError, ValueError):
+        return None
+
+
+def _uploads(value, found: dict) -> dict:
+    if isinstance(value, list):
+        for item in value:
+            _uploads(item, found)
+    elif isinstance(value, dict):
+        for attachment_key in ("file", "image"):
+            attachment = value.get(attachment_key)
+            url_path = attachment.get("url_path") if isinstance(attachment, dict) else None
+            if isinstance(url_path, str) and url_path.startswith("/uploads/"):
+                filename = url_path.removeprefix("/uploads/")
+                if UPLOAD_NAME_RE.fullmatch(filename):
+                    found.setdefault(filename, attachment)
+        for item in value.values():
+            _uploads(item, found)
+    return found
+
+
+def _text_or_none(value, limit: int):
+    text = str(value or "").strip()
+    return text[:limit] or None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "attachment_ref",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("filename", sa.String(length=64), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("chat_id", sa.Integer(), nullable=False),
+        sa.Column("session_id", sa.String(length=100), nullable=False),
+        sa.Column("message_id", sa.String(length=200), nullable=False),
+        sa.Column("original_name", sa.String(length=255), nullable=True),
+        sa.Column("mime_type", sa.String(length=128), nullable=True),
+        sa.Column("is_public", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["chat_id"], ["user_chat_history.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "chat_id", "message_id", "filename", name="uq_attachment_ref_chat_message_file"
+        ),
+    )
+    op.create_index(
+        "ix_attachment_ref_filename_user", "attachment_ref", ["filename", "user_id"], unique=False
+    )
+    op.create_index("ix_attachment_ref_user_id", "attachment_ref", ["user_id"], unique=False)
+
+    # Only chats that mention an upload at all are parsed; rows come from the
+    # message graph, or from the legacy JSON column for chats never migrated to it.
+    connection = op.get_bind()
+    attachment_ref = sa.table(
+        "attachment_ref",
+        sa.column("filename"),
+        sa.column("user_id"),
+        sa.column("chat_id"),
+        sa.column("session_id"),
+        sa.column("message_id"),
+        sa.column("original_name"),
+        sa.column("mime_type"),
+        sa.column("is_public"),
+        sa.column("created_at"),
+    )
+    chats = connection.execute(
+        sa.text(
+            "SELECT c.id, c.user_id, c.session_id, c.messages_data, "
+            "CASE WHEN s.is_public THEN 1 ELSE 0 END AS is_public "
+            "FROM user_chat_history c LEFT JOIN chat_share s "
+            "ON s.user_id = c.user_id AND s.session_id = c.session_id "
+            "WHERE c.messages_data LIKE '%/uploads/%' OR EXISTS ("
+            "SELECT 1 FROM chat_message m WHERE m.chat_id = c.id "
+            "AND m.payload_data LIKE '%/uploads/%') ORDER BY c.id"
+        )
+    ).mappings()
+    now = datetime.utcnow()
+    for chat in chats.all():
+        rows = connection.execute(
+            sa.text("SELECT message_id, payload_data FROM chat_message WHERE chat_id = :chat_id"),
+            {"chat_id": chat["id"]},
+        ).all()
+        if rows:
+            messages = [(row.message_id, _loads(row.payload_data)) for row in rows]
+        else:
+            legacy = _loads(chat["messages_data"])
+            messages = [
+                (message.get("id"), message)
+                for message in (legacy if isinstance(legacy, list) else [])
+                if isinstance(message, dict) and message.get("id")
+            ]
+        values = [
+            {
+                "filename": filename,
+                "user_id": chat["user_id"],
+                "chat_id": chat["id"],
+                "session_id": chat["session_id"],
+                "message_id": str(message_id),
+                "original_name": _text_or_none(attachment.get("original_name"), 255),
+                "mime_type": _text_or_none(attachment.get("mime_type"), 128),
+                "is_public": bool(chat["is_public"]),
+                "created_at": now,
+            }
+            for message_id, message in messages
+            for filename, attachment in _uploads(message, {}).items()
+        ]
+        if values:
+            connection.execute(attachment_ref.insert(), values)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_attachment_ref_user_id", table_name="attachment_ref")
+    op.drop_index("ix_attachment_ref_filename_user", table_name="attachment_ref")
+    op.drop_table("attachment_ref")
@@ -0,0 +1,28 @@
+"""Persist the materialized active path of chat sessions.
+
+Revision ID: add_chat_active_path
+Revises: add_chat_revision
+Create Date: 2026-10-17
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "add_chat_active_path"
+down_revision = "add_chat_revision"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing sessions keep NULL and are read through the full graph until
+    # their next write stores a path.
+    with op.batch_alter_table("user_chat_history") as batch_op:
+        batch_op.add_column(sa.Column("active_path_data", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("user_chat_history") as batch_op:
+        batch_op.drop_column("active_path_data")
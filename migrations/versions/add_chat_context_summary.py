@@ -0,0 +1,28 @@
+"""Store rolling context summaries of long chat sessions.
+
+Revision ID: add_chat_context_summary
+Revises: add_chat_active_path
+Create Date: 2026-10-17
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "add_chat_context_summary"
+down_revision = "add_chat_active_path"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Summaries are built lazily the first time a session outgrows its model's
+    # context window, so existing rows keep NULL.
+    with op.batch_alter_table("user_chat_history") as batch_op:
+        batch_op.add_column(sa.Column("context_summary_data", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("user_chat_history") as batch_op:
+        batch_op.drop_column("context_summary_data")
@@ -0,0 +1,42 @@
+"""Background bulk session deletion jobs.
+
+Revision ID: add_chat_delete_job
+Revises: add_managed_file
+Create Date: 2026-10-17
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "add_chat_delete_job"
+down_revision = "add_managed_file"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chat_delete_job",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("public_id", sa.String(length=64), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("chat_ids_data", sa.Text(), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.Column("deleted", sa.Integer(), nullable=False),
+        sa.Column("error", sa.String(length=200), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_chat_delete_job_public_id", "chat_delete_job", ["public_id"], unique=True)
+    op.create_index("ix_chat_delete_job_user_id", "chat_delete_job", ["user_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chat_delete_job_user_id", table_name="chat_delete_job")
+    op.drop_index("ix_chat_delete_job_public_id", table_name="chat_delete_job")
+    op.drop_table("chat_delete_job")
@@ -0,0 +1,30 @@
+"""Track the chat revision that last changed each chat_message row.
+
+Revision ID: add_chat_message_revision
+Revises: add_chat_context_summary
+Create Date: 2026-10-17
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "add_chat_message_revision"
+down_revision = "add_chat_context_summary"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing rows predate every revision a client can have synced from, so 0
+    # is correct for them.
+    with op.batch_alter_table("chat_message") as batch_op:
+        batch_op.add_column(
+            sa.Column("revision", sa.Integer(), nullable=False, server_default=sa.text("0"))
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("chat_message") as batch_op:
+        batch_op.drop_column("revision")
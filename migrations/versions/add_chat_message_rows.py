@@ -0,0 +1,158 @@
+"""Store conversation graph nodes as chat_message rows.
+
+Revision ID: add_chat_message_rows
+Revises: add_apple_auth_security
+Create Date: 2026-10-17
+"""
+
+from __future__ import annotations
+
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "add_chat_message_rows"
+down_revision = "add_apple_auth_security"
+branch_labels = None
+depends_on = None
+
+
+def _graph_nodes(messages: list) -> list[dict] | None:
+    nodes = [dict(message) for message in messages if isinstance(message, dict)]
+    if any(not node.get("id") for node in nodes):
+        # Id-less legacy rows keep their JSON; the application assigns stable
+        # ids and migrates them lazily on the next write.
+        return None
+
+    if any("parent_id" in node for node in nodes):
+        valid_ids = {str(node["id"]) for node in nodes}
+        for node in nodes:
+            parent_id = node.get("parent_id")
+            if parent_id is not None and str(parent_id) not in valid_ids:
+                node["parent_id"] = None
+        return nodes
+
+    previous: dict | None = None
+    for node in nodes:
+        if previous is None:
+            node["parent_id"] = None
+        elif node.get("role") == previous.get("role"):
+            node["parent_id"] = previous.get("parent_id")
+            previous["is_active"] = False
+        else:
+            node["parent_id"] = previous.get("id")
+        node["is_active"] = True
+        previous = node
+    return nodes
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chat_message",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("chat_id", sa.Integer(), nullable=False),
+        sa.Column("message_id", sa.String(length=200), nullable=False),
+        sa.Column("parent_id", sa.String(length=200), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("role", sa.String(length=16), nullable=False, server_default="user"),
+        sa.Column("payload_data", sa.Text(), nullable=False, server_default="{}"),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.ForeignKeyConstraint(["chat_id"], ["user_chat_history.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("chat_id", "message_id", name="uq_chat_message_chat_message"),
+    )
+    op.create_index("ix_chat_message_chat_id", "chat_message", ["chat_id"], unique=False)
+    op.create_index(
+        "ix_chat_message_chat_parent", "chat_message", ["chat_id", "parent_id"], unique=False
+    )
+
+    connection = op.get_bind()
+    chat_message = sa.table(
+        "chat_message",
+        sa.column("chat_id", sa.Integer()),
+        sa.column("message_id", sa.String()),
+        sa.column("parent_id", sa.String()),
+        sa.column("is_active", sa.Boolean()),
+        sa.column("position", sa.Integer()),
+        sa.column("role", sa.String()),
+        sa.column("payload_data", sa.Text()),
+    )
+    chats = connection.execute(
+        sa.text(
+            "SELECT id, messages_data FROM user_chat_history "
+            "WHERE messages_data IS NOT NULL AND messages_data <> '[]'"
+        )
+    ).mappings()
+    for chat in chats.all():
+        try:
+            messages = json.loads(chat["messages_data"] or "[]")
+        except (TypeError, ValueError, json.JSONDecodeError):
+            continue
+        nodes = _graph_nodes(messages) if isinstance(messages, list) else None
+        if not nodes:
+            continue
+        rows = []
+        seen_ids: set[str] = set()
+        for position, node in enumerate(nodes):
+            message_id = str(node["id"])
+            if message_id in seen_ids:
+                continue
+            seen_ids.add(message_id)
+            rows.append(
+                {
+                    "chat_id": chat["id"],
+                    "message_id": message_id,
+                    "parent_id": node.get("parent_id"),
+                    "is_active": bool(node.get("is_active", True)),
+                    "position": position,
+                    "role": str(node.get("role") or "user")[:16],
+                    "payload_data": json.dumps(
+                        {
+                            key: value
+                            for key, value in node.items()
+                            if key not in {"id", "parent_id", "is_active"}
+                        },
+                        ensure_ascii=False,
+                    ),
+                }
+            )
+        op.bulk_insert(chat_message, rows)
+        connection.execute(
+            sa.text("UPDATE user_chat_history SET messages_data = '[]' WHERE id = :id"),
+            {"id": chat["id"]},
+        )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    chat_ids = [
+        row[0] for row in connection.execute(sa.text("SELECT DISTINCT chat_id FROM chat_message"))
+    ]
+    for chat_id in chat_ids:
+        rows = connection.execute(
+            sa.text(
+                "SELECT message_id, parent_id, is_active, payload_data FROM chat_message "
+                "WHERE chat_id = :chat_id ORDER BY position"
+            ),
+            {"chat_id": chat_id},
+        ).mappings()
+        messages = []
+        for row in rows.all():
+            try:
+                message = json.loads(row["payload_data"] or "{}")
+            except (TypeError, ValueError, json.JSONDecodeError):
+                message = {}
+            message["id"] = row["message_id"]
+            message["parent_id"] = row["parent_id"]
+            message["is_active"] = bool(row["is_active"])
+            messages.append(message)
+        connection.execute(
+            sa.text("UPDATE user_chat_history SET messages_data = :messages_data WHERE id = :id"),
+            {"messages_data": json.dumps(messages, ensure_ascii=False), "id": chat_id},
+        )
+    op.drop_index("ix_chat_message_chat_parent", table_name="chat_message")
+    op.drop_index("ix_chat_message_chat_id", table_name="chat_message")
+    op.drop_table("chat_message")
@@ -0,0 +1,26 @@
+"""Add an optimistic-concurrency revision counter to chat sessions.
+
+Revision ID: add_chat_revision
+Revises: add_chat_message_rows
+Create Date: 2026-10-17
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "add_chat_revision"
+down_revision = "add_chat_message_rows"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("user_chat_history") as batch_op:
+        batch_op.add_column(sa.Column("revision", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("user_chat_history") as batch_op:
+        batch_op.drop_column("revision")
@@ -0,0 +1,140 @@
+"""Full-text search documents for chat titles and message text.
+
+Revision ID: add_chat_search_index
+Revises: add_chat_message_revision
+Create Date: 2026-10-17
+"""
+
+from __future__ import annotations
+
+import json
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "add_chat_search_index"
+down_revision = "add_chat_message_revision"
+branch_labels = None
+depends_on = None
+
+SEARCH_BODY_MAX_CHARS = 200_000
+_THINK_BLOCK_RE = re.compile(r"<think(?:\s[^>]*)?>[\s\S]*?</think>", re.IGNORECASE)
+_CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+
+POSTGRES_DDL = (
+    "ALTER TABLE chat_search_document ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(body, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_chat_search_document_vector "
+    "ON chat_search_document USING gin (search_vector)",
+)
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chat_search_fts USING fts5("
+    "title, body, content='chat_search_document', content_rowid='chat_id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS chat_search_document_ai AFTER INSERT ON chat_search_document "
+    "BEGIN INSERT INTO chat_search_fts(rowid, title, body) "
+    "VALUES (new.chat_id, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS chat_search_document_ad AFTER DELETE ON chat_search_document "
+    "BEGIN INSERT INTO chat_search_fts(chat_search_fts, rowid, title, body) "
+    "VALUES ('delete', old.chat_id, old.title, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS chat_search_document_au AFTER UPDATE ON chat_search_document "
+    "BEGIN INSERT INTO chat_search_fts(chat_search_fts, rowid, title, body) "
+    "VALUES ('delete', old.chat_id, old.title, old.body); "
+    "INSERT INTO chat_search_fts(rowid, title, body) "
+    "VALUES (new.chat_id, new.title, new.body); END",
+)
+
+
+def _clean(value) -> str:
+    return _CONTROL_CHARS_RE.sub(" ", str(value or "")).strip()
+
+
+def _message_text(message) -> str:
+    parts = message.get("parts") if isinstance(message, dict) else None
+    if not isinstance(parts, list):
+        return ""
+    texts = [
+        part["text"]
+        for part in parts
+        if isinstance(part, dict) and isinstance(part.get("text"), str)
+    ]
+    return _clean(_THINK_BLOCK_RE.sub("", "\n".join(texts)))
+
+
+def _loads(raw):
+    try:
+        return json.loads(raw or "null")
+    except (TypeError, ValueError):
+        return None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chat_search_document",
+        sa.Column("chat_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.Text(), nullable=False, server_default=""),
+        sa.Column("body", sa.Text(), nullable=False, server_default=""),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["chat_id"], ["user_chat_history.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("chat_id"),
+    )
+    op.create_index(
+        "ix_chat_search_document_user_id", "chat_search_document", ["user_id"], unique=False
+    )
+
+    connection = op.get_bind()
+    dialect = connection.dialect.name
+    statements = ()
+    if dialect in {"postgresql", "postgres"}:
+        statements = POSTGRES_DDL
+    elif dialect == "sqlite":
+        statements = SQLITE_DDL
+    for statement in statements:
+        op.execute(statement)
+
+    document = sa.table(
+        "chat_search_document",
+        sa.column("chat_id", sa.Integer()),
+        sa.column("user_id", sa.Integer()),
+        sa.column("title", sa.Text()),
+        sa.column("body", sa.Text()),
+    )
+    chats = connection.execute(
+        sa.text("SELECT id, user_id, title, messages_data FROM user_chat_history ORDER BY id")
+    ).mappings()
+    for chat in chats.all():
+        payloads = connection.execute(
+            sa.text(
+                "SELECT payload_data FROM chat_message WHERE chat_id = :chat_id ORDER BY position"
+            ),
+            {"chat_id": chat["id"]},
+        ).scalars()
+        messages = [_loads(payload) for payload in payloads]
+        if not messages:
+            legacy = _loads(chat["messages_data"])
+            messages = legacy if isinstance(legacy, list) else []
+        body = "\n".join(text for text in map(_message_text, messages) if text)
+        connection.execute(
+            document.insert(),
+            {
+                "chat_id": chat["id"],
+                "user_id": chat["user_id"],
+                "title": _clean(chat["title"]),
+                "body": body[-SEARCH_BODY_MAX_CHARS:],
+            },
+        )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    if connection.dialect.name == "sqlite":
+        for trigger in ("ai", "ad", "au"):
+            op.execute(f"DROP TRIGGER IF EXISTS chat_search_document_{trigger}")
+        op.execute("DROP TABLE IF EXISTS chat_search_fts")
+    op.drop_index("ix_chat_search_document_user_id", table_name="chat_search_document")
+    op.drop_table("chat_search_document")
@@ -0,0 +1,103 @@
+"""Denormalized sidebar summary columns on user_chat_history.
+
+Revision ID: add_chat_session_summary
+Revises: add_chat_search_index
+Create Date: 2026-10-17
+"""
+
+from __future__ import annotations
+
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "add_chat_session_summary"
+down_revision = "add_chat_search_index"
+branch_labels = None
+depends_on = None
+
+SESSION_PREVIEW_CHARS = 60
+
+
+def _loads(raw):
+    try:
+        return json.loads(raw or "null")
+    except (TypeError, ValueError):
+        return None
+
+
+def _preview(message) -> str:
+    parts = message.get("parts") if isinstance(message, dict) else None
+    if parts and isinstance(parts, list) and isinstance(parts[0], dict):
+        return str(parts[0].get("text", ""))[:SESSION_PREVIEW_CHARS]
+    return ""
+
+
+def _has_attachments(messages) -> bool:
+    return any(
+        isinstance(part, dict)
+        and (isinstance(part.get("file"), dict) or isinstance(part.get("image"), dict))
+        for message in messages
+        if isinstance(message, dict)
+        for part in message.get("parts") or []
+    )
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("user_chat_history") as batch_op:
+        batch_op.add_column(sa.Column("last_message_preview", sa.String(length=120), nullable=True))
+        batch_op.add_column(sa.Column("message_count", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("last_activity_at", sa.DateTime(), nullable=True))
+        batch_op.add_column(
+            sa.Column("has_attachments", sa.Boolean(), nullable=False, server_default=sa.false())
+        )
+
+    # Chats with a stored active path are summarized here from that path's rows.
+    # The rest keep message_count NULL and are summarized by the application the
+    # first time they are listed.
+    connection = op.get_bind()
+    chats = connection.execute(
+        sa.text(
+            "SELECT id, active_path_data, updated_at FROM user_chat_history "
+            "WHERE active_path_data IS NOT NULL ORDER BY id"
+        )
+    ).mappings()
+    for chat in chats.all():
+        path = _loads(chat["active_path_data"])
+        if not isinstance(path, list):
+            continue
+        message_ids = [str(entry[0]) for entry in path if isinstance(entry, list) and entry]
+        payloads = {}
+        if message_ids:
+            rows = connection.execute(
+                sa.text(
+                    "SELECT message_id, payload_data FROM chat_message "
+                    "WHERE chat_id = :chat_id AND message_id IN :message_ids"
+                ).bindparams(sa.bindparam("message_ids", expanding=True)),
+                {"chat_id": chat["id"], "message_ids": message_ids},
+            )
+            payloads = {row.message_id: _loads(row.payload_data) for row in rows}
+        messages = [payloads.get(message_id) for message_id in message_ids]
+        connection.execute(
+            sa.text(
+                "UPDATE user_chat_history SET last_message_preview = :preview, "
+                "message_count = :message_count, last_activity_at = :last_activity_at, "
+                "has_attachments = :has_attachments WHERE id = :chat_id"
+            ),
+            {
+                "preview": _preview(messages[-1]) if messages else "",
+                "message_count": len(message_ids),
+                "last_activity_at": chat["updated_at"],
+                "has_attachments": _has_attachments(messages),
+                "chat_id": chat["id"],
+            },
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("user_chat_history") as batch_op:
+        batch_op.drop_column("has_attachments")
+        batch_op.drop_column("last_activity_at")
+        batch_op.drop_column("message_count")
+        batch_op.drop_column("last_message_preview")
@@ -0,0 +1,40 @@
+"""Pre-rendered public share snapshots.
+
+Revision ID: add_chat_share_snapshot
+Revises: add_listing_keyset_indexes
+Create Date: 2026-10-17
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "add_chat_share_snapshot"
+down_revision = "add_listing_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Snapshots are rendered on the first public view, so there is nothing to backfill.
+    op.create_table(
+        "chat_share_snapshot",
+        sa.Column("chat_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.String(length=64), nullable=False),
+        sa.Column("payload_data", sa.Text(), nullable=False),
+        sa.Column("html_data", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["chat_id"], ["user_chat_history.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("chat_id"),
+    )
+    op.create_index(
+        "ix_chat_share_snapshot_user_id", "chat_share_snapshot", ["user_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chat_share_snapshot_user_id", table_name="chat_share_snapshot")
+    op.drop_table("chat_share_snapshot")
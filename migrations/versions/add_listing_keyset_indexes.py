@@ -0,0 +1,47 @@
+"""Composite indexes for keyset pagination of the session, mind and admin listings.
+
+Revision ID: add_listing_keyset_indexes
+Revises: add_chat_session_summary
+Create Date: 2026-10-17
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "add_listing_keyset_indexes"
+down_revision = "add_chat_session_summary"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_user_chat_history_user_updated", "user_chat_history", ["user_id", "updated_at", "id"]),
+    (
+        "ix_mind_store_listing",
+        "mind",
+        ["visibility", "is_featured", "is_verified", "updated_at", "id"],
+    ),
+    ("ix_mind_user_updated", "mind", ["user_id", "updated_at", "id"]),
+    ("ix_mind_featured_updated", "mind", ["is_featured", "updated_at", "id"]),
+    ("ix_mind_pin_user_created", "mind_pin", ["user_id", "created_at", "id"]),
+)
+
+
+def upgrade() -> None:
+    # Keyset cursors compare on these timestamps, and a NULL would end a listing early.
+    op.execute(
+        "UPDATE user_chat_history SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) "
+        "WHERE updated_at IS NULL"
+    )
+    op.execute(
+        "UPDATE mind SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) "
+        "WHERE updated_at IS NULL"
+    )
+    op.execute("UPDATE mind_pin SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    for name, table, _columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,123 @@
+"""Reference counts of uploads and generated images.
+
+Revision ID: add_managed_file
+Revises: add_attachment_ref
+Create Date: 2026-10-17
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from collections import Counter
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+from werkzeug.utils import secure_filename
+
+revision = "add_managed_file"
+down_revision = "add_attachment_ref"
+branch_labels = None
+depends_on = None
+
+UPLOAD_NAME_RE = re.compile(r"^[a-f0-9]{32}(?:\.[a-z0-9]{1,12})?$")
+GENERATED_IMAGE_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+
+
+def _loads(raw):
+    try:
+        return json.loads(raw or "null")
+    except (TypeError, ValueError):
+        return None
+
+
+def _record(url_path, found: set) -> None:
+    if not isinstance(url_path, str):
+        return
+    path = url_path.split("?", 1)[0].split("#", 1)[0]
+    if path.startswith("/uploads/"):
+        filename = path.removeprefix("/uploads/")
+        if UPLOAD_NAME_RE.fullmatch(filename):
+            found.add(("uploads", filename))
+    elif path.startswith("/images/"):
+        filename = path.removeprefix("/images/")
+        if GENERATED_IMAGE_NAME_RE.fullmatch(filename) and secure_filename(filename) == filename:
+            found.add(("generated_images", filename))
+
+
+def _references(value, found: set) -> set:
+    if isinstance(value, list):
+        for item in value:
+            _references(item, found)
+    elif isinstance(value, dict):
+        _record(value.get("url_path"), found)
+        for attachment_key in ("file", "image"):
+            attachment = value.get(attachment_key)
+            if isinstance(attachment, dict):
+                _record(attachment.get("url_path"), found)
+        for item in value.values():
+            _references(item, found)
+    return found
+
+
+def upgrade() -> None:
+    op.create_table(
+        "managed_file",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=32), nullable=False),
+        sa.Column("filename", sa.String(length=128), nullable=False),
+        sa.Column("ref_count", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("released_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("kind", "filename", name="uq_managed_file_kind_filename"),
+    )
+    op.create_index("ix_managed_file_released_at", "managed_file", ["released_at"], unique=False)
+
+    # Every message counts each file it references once, as chat writes do.
+    connection = op.get_bind()
+    counts: Counter = Counter()
+    chats = connection.execute(
+        sa.text(
+            "SELECT c.id, c.messages_data FROM user_chat_history c "
+            "WHERE c.messages_data LIKE '%/uploads/%' OR c.messages_data LIKE '%/images/%' "
+            "OR EXISTS (SELECT 1 FROM chat_message m WHERE m.chat_id = c.id "
+            "AND (m.payload_data LIKE '%/uploads/%' OR m.payload_data LIKE '%/images/%')) "
+            "ORDER BY c.id"
+        )
+    ).mappings()
+    for chat in chats.all():
+        rows = connection.execute(
+            sa.text("SELECT payload_data FROM chat_message WHERE chat_id = :chat_id"),
+            {"chat_id": chat["id"]},
+        ).all()
+        if rows:
+            messages = [_loads(row.payload_data) for row in rows]
+        else:
+            legacy = _loads(chat["messages_data"])
+            messages = legacy if isinstance(legacy, list) else []
+        for message in messages:
+            counts.update(_references(message, set()))
+
+    if counts:
+        managed_file = sa.table(
+            "managed_file",
+            sa.column("kind"),
+            sa.column("filename"),
+            sa.column("ref_count"),
+            sa.column("created_at"),
+        )
+        now = datetime.utcnow()
+        connection.execute(
+            managed_file.insert(),
+            [
+                {"kind": kind, "filename": filename, "ref_count": count, "created_at": now}
+                for (kind, filename), count in sorted(counts.items())
+            ],
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_managed_file_released_at", table_name="managed_file")
+    op.drop_table("managed_file")
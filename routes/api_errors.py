@@ -8,6 +8,7 @@ from typing import Any, Callable, Optional
 from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.exceptions import BadRequest, HTTPException, RequestEntityTooLarge
 
+from services.session_locks import SessionLockTimeout
 from utils.input_validation import ValidationError
 from utils.responses import logger, make_error
 
@@ -54,6 +55,14 @@ def _map_exception(error: Exception, fallback_code: str) -> ApiError:
         return ApiError("File too large.", status=413, code="request_entity_too_large")
     if isinstance(error, BadRequest):
         return ApiError("Bad request", status=400, code="bad_request")
+    if isinstance(error, SessionLockTimeout):
+        # Another write to the same chat held its lock too long; the request is safe to repeat.
+        return ApiError(
+            "Chat is busy, try again",
+            status=503,
+            code="session_busy",
+            extra={"retry_after_seconds": 1},
+        )
     if isinstance(error, SQLAlchemyError):
         return ApiError("Database operation failed", status=500, code="database_error")
     return ApiError("Internal server error.", status=500, code=fallback_code)
@@ -15,6 +15,8 @@ from sqlalchemy import and_, func, or_, text
 
 from config import LOGS_FOLDER
 from routes.api_errors import ApiError, api_error_boundary, require_authenticated_user_id
+from routes.loaders import BatchLoader, request_loader
+from routes.pagination import KeysetOrder, paginate
 from utils.audit_log import AuditEvents, log_audit_event
 from utils.auth import (
     Mind,
@@ -34,6 +36,12 @@ from utils.responses import make_ok
 MAX_PAGE_SIZE = 100
 ADMIN_REASON_MAX_LENGTH = 280
 AUDIT_PREVIEW_LIMIT = 12
+ADMIN_USERS_ORDER = (KeysetOrder(User.id),)
+ADMIN_MINDS_ORDER = (
+    KeysetOrder(Mind.is_featured, descending=True),
+    KeysetOrder(Mind.updated_at, descending=True),
+    KeysetOrder(Mind.id, descending=True),
+)
 
 
 def _current_admin_user() -> User:
@@ -100,21 +108,22 @@ def _bool_from_payload(payload: dict[str, Any], key: str) -> bool | None:
     raise ApiError(f"{key} must be boolean", status=400, code="validation_error")
 
 
-def _pagination() -> tuple[int, int]:
-    page = max(1, request.args.get("page", default=1, type=int) or 1)
-    page_size = max(
-        1,
-        min(request.args.get("page_size", default=25, type=int) or 25, MAX_PAGE_SIZE),
+def _user_loader() -> BatchLoader:
+    return request_loader(
+        "admin:users",
+        lambda user_ids: {user.id: user for user in User.query.filter(User.id.in_(user_ids))},
+    )
+
+
+def _count_loader(model) -> BatchLoader:
+    return request_loader(
+        f"admin:{model.__tablename__}_counts",
+        lambda user_ids: _load_group_counts(model, user_ids),
+        default=0,
     )
-    return page, page_size
 
 
-def _serialize_user_for_admin(
-    user: User,
-    *,
-    chat_counts: dict[int, int] | None = None,
-    mind_counts: dict[int, int] | None = None,
-) -> dict[str, Any]:
+def _serialize_user_for_admin(user: User) -> dict[str, Any]:
     user_id = int(user.id)
     restriction = get_account_restriction(user)
     return {
@@ -134,13 +143,13 @@ def _serialize_user_for_admin(
         "blocked_until": user.blocked_until.isoformat() if user.blocked_until else None,
         "oauth_provider": user.oauth_provider,
         "created_at": user.created_at.isoformat() if user.created_at else None,
-        "mind_count": int((mind_counts or {}).get(user_id, 0)),
-        "chat_count": int((chat_counts or {}).get(user_id, 0)),
+        "mind_count": int(_count_loader(Mind).load(user_id)),
+        "chat_count": int(_count_loader(UserChatHistory).load(user_id)),
     }
 
 
 def _serialize_mind_for_admin(mind: Mind) -> dict[str, Any]:
-    owner = db.session.get(User, mind.user_id) if mind.user_id else None
+    owner = _user_loader().load(mind.user_id)
     return {
         "id": mind.id,
         "public_id": mind.public_id,
@@ -560,7 +569,6 @@ def register_admin_routes(api_bp):
     @api_error_boundary("admin_users_failed")
     def admin_users():
         _current_admin_user()
-        page, page_size = _pagination()
         status = (request.args.get("status") or "all").strip().lower()
         search = (request.args.get("q") or "").strip()[:100]
 
@@ -609,26 +617,22 @@ def register_admin_routes(api_bp):
         elif status != "all":
             raise ApiError("Invalid user status filter", status=400, code="invalid_status")
 
-        total = query.count()
-        users = query.order_by(User.id.asc()).offset((page - 1) * page_size).limit(page_size).all()
+        listing = paginate(
+            query,
+            ADMIN_USERS_ORDER,
+            scope="admin:users",
+            row_values=lambda user: (user.id,),
+            default_page_size=25,
+            max_page_size=MAX_PAGE_SIZE,
+        )
+        users = listing.rows
         user_ids = [int(user.id) for user in users]
-        mind_counts = _load_group_counts(Mind, user_ids)
-        chat_counts = _load_group_counts(UserChatHistory, user_ids)
+        _count_loader(Mind).prime(user_ids)
+        _count_loader(UserChatHistory).prime(user_ids)
         return make_ok(
             {
-                "users": [
-                    _serialize_user_for_admin(
-                        user,
-                        mind_counts=mind_counts,
-                        chat_counts=chat_counts,
-                    )
-                    for user in users
-                ],
-                "pagination": {
-                    "page": page,
-                    "page_size": page_size,
-                    "total": total,
-                },
+                "users": [_serialize_user_for_admin(user) for user in users],
+                "pagination": listing.fields(),
             }
         )
 
@@ -741,7 +745,6 @@ def register_admin_routes(api_bp):
     @api_error_boundary("admin_minds_failed")
     def admin_minds():
         _current_admin_user()
-        page, page_size = _pagination()
         status = (request.args.get("status") or "all").strip().lower()
         search = (request.args.get("q") or "").strip()[:100]
 
@@ -775,21 +778,19 @@ def register_admin_routes(api_bp):
         elif status != "all":
             raise ApiError("Invalid mind status filter", status=400, code="invalid_status")
 
-        total = query.count()
-        minds = (
-            query.order_by(Mind.is_featured.desc(), Mind.updated_at.desc(), Mind.id.desc())
-            .offset((page - 1) * page_size)
-            .limit(page_size)
-            .all()
+        listing = paginate(
+            query,
+            ADMIN_MINDS_ORDER,
+            scope="admin:minds",
+            row_values=lambda mind: (mind.is_featured, mind.updated_at, mind.id),
+            default_page_size=25,
+            max_page_size=MAX_PAGE_SIZE,
         )
+        _user_loader().prime(mind.user_id for mind in listing.rows)
         return make_ok(
             {
-                "minds": [_serialize_mind_for_admin(mind) for mind in minds],
-                "pagination": {
-                    "page": page,
-                    "page_size": page_size,
-                    "total": total,
-                },
+                "minds": [_serialize_mind_for_admin(mind) for mind in listing.rows],
+                "pagination": listing.fields(),
             }
         )
 
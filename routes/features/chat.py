@@ -6,6 +6,7 @@ import json
 import re
 import time
 import uuid
+from collections.abc import Callable
 from pathlib import Path
 from typing import Any, cast
 
@@ -19,37 +20,53 @@ from flask import (
     send_from_directory,
     session,
 )
-from sqlalchemy import and_
 from werkzeug.utils import secure_filename
 
 from ai_engine import get_model_function
 from ai_engine.registry import DEFAULT_MODEL_ID
-from config import ALLOW_GUEST_CHATS_SAVE, CHAT_MAX_VARIANTS_PER_TURN, UPLOAD_FOLDER
+from config import (
+    ALLOW_GUEST_CHATS_SAVE,
+    CHAT_GENERATION_MODE,
+    CHAT_MAX_VARIANTS_PER_TURN,
+    CHAT_STREAM_FLUSH_BYTES,
+    CHAT_STREAM_FLUSH_MS,
+    CHAT_STREAM_FLUSH_POLICIES,
+    UPLOAD_FOLDER,
+)
 from routes.api_errors import ApiError, api_error_boundary
 from routes.features.minds import resolve_bound_mind_context_for_chat, resolve_mind_context_for_chat
+from services.attachment_refs import uploaded_file_access
 from services.beatbox_tools import normalize_beatbox_state
 from services.canvas_tools import (
     find_canmore_marker,
     normalize_canvas_textdoc,
     process_canmore_calls,
 )
+from services.chat_frames import ChatFrameCoalescer, FlushPolicy
+from services.chat_generation import enqueue_chat_generation
 from services.chat_history import (
     _generate_guest_session_token,
     chat_file_exists,
+    chat_history_delta,
     conversation_context_for_operation,
     has_valid_guest_session_token,
     load_chat_graph,
     load_chat_history,
     normalize_message,
+    parse_history_since,
     persist_chat_operation,
     resolve_session_identifier,
 )
+from services.chat_streams import ChatStreamWriter, RedisChatStreamJournal, get_chat_stream_journal
+from services.context_window import build_context_window
 from services.files import (
     handle_file_upload,
+    remove_stored_upload,
     restore_stored_file_for_model,
     validate_chat_uploads,
 )
 from services.model_access import can_user_access_model, get_model_stage, model_exists
+from services.session_locks import SessionLockTimeout
 from services.translation import TranslationUnavailableError, translate_text
 from services.voice import TTS_MAX_CHARS, synthesize_text_segments
 from services.web_search import (
@@ -62,8 +79,15 @@ from services.web_search import (
     run_web_search,
     web_search_requested,
 )
-from utils.auth import ChatShare, UserChatHistory, UserSettings
+from utils import json_codec
+from utils.auth import UserChatHistory, UserSettings
 from utils.input_validation import InputValidator, ValidationError
+from utils.observability import (
+    CHAT_GENERATION_JOBS_TOTAL,
+    CHAT_GENERATIONS_DEDUPLICATED_TOTAL,
+    CHAT_STREAM_REPLAYED_EVENTS_TOTAL,
+    CHAT_STREAM_RESUMES_TOTAL,
+)
 from utils.privacy import SERVICE_IMPROVEMENT_SETTING_KEY
 from utils.rate_limiting import RateLimiter, anonymous_rate_limit, rate_limit
 from utils.responses import logger, make_ok
@@ -82,6 +106,8 @@ ANONYMOUS_TRANSLATION_MAX_CHARS = 2000
 CHAT_OPERATIONS = {"send", "regenerate", "edit"}
 CHAT_MESSAGE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,120}$")
 CANMORE_STREAM_HOLDBACK_CHARS = 32
+CHAT_STREAM_HEARTBEAT_SECONDS = 15.0
+CHAT_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,100}$")
 CHAT_REQUEST_FIELDS = frozenset(
     {
         "assistant_message_id",
@@ -97,6 +123,7 @@ CHAT_REQUEST_FIELDS = frozenset(
         "operation",
         "expected_user_id",
         "expected_guest",
+        "history_since",
         "request_id",
         "session_id",
         "target_message_id",
@@ -119,60 +146,6 @@ def _resolve_db_user_id() -> int | None:
         return None
 
 
-def _find_uploaded_file_reference(value: Any, url_path: str) -> dict[str, Any] | None:
-    if isinstance(value, list):
-        for item in value:
-            if reference := _find_uploaded_file_reference(item, url_path):
-                return reference
-        return None
-    if not isinstance(value, dict):
-        return None
-
-    for attachment_key in ("file", "image"):
-        attachment = value.get(attachment_key)
-        if isinstance(attachment, dict) and attachment.get("url_path") == url_path:
-            return attachment
-    for item in value.values():
-        if reference := _find_uploaded_file_reference(item, url_path):
-            return reference
-    return None
-
-
-def _chat_uploaded_file_reference(chat: UserChatHistory, url_path: str) -> dict[str, Any] | None:
-    return _find_uploaded_file_reference(chat.get_messages(), url_path)
-
-
-def _uploaded_file_access(filename: str, user_id: int | None) -> tuple[str, dict[str, Any]] | None:
-    url_path = f"/uploads/{filename}"
-    if user_id is not None:
-        owner_candidates = UserChatHistory.query.filter(
-            UserChatHistory.user_id == user_id,
-            UserChatHistory.messages_data.contains(url_path),
-        ).all()
-        for chat in owner_candidates:
-            if reference := _chat_uploaded_file_reference(chat, url_path):
-                return "owner", reference
-
-    public_candidates = (
-        UserChatHistory.query.join(
-            ChatShare,
-            and_(
-                ChatShare.user_id == UserChatHistory.user_id,
-                ChatShare.session_id == UserChatHistory.session_id,
-            ),
-        )
-        .filter(
-            ChatShare.is_public.is_(True),
-            UserChatHistory.messages_data.contains(url_path),
-        )
-        .all()
-    )
-    for chat in public_candidates:
-        if reference := _chat_uploaded_file_reference(chat, url_path):
-            return "public", reference
-    return None
-
-
 def _resolve_chat_mind_context(
     requested_mind_id: str | None,
     session_id: str,
@@ -246,6 +219,27 @@ def _validated_message_id(value: Any, *, required: bool = False) -> str | None:
     return text
 
 
+def _history_since(value: Any) -> int | str | None:
+    try:
+        return parse_history_since(value)
+    except ValueError as exc:
+        raise ApiError("Invalid history cursor", status=400, code=str(exc)) from exc
+
+
+def _final_history_fields(
+    history: list[dict], session_id: str, user_id: int | None, since: int | str | None
+) -> dict[str, Any]:
+    # Clients that pass the revision they already hold get only the changed
+    # tail of the active branch instead of the whole conversation.
+    if since is None or user_id is None or not history:
+        return {"history": history}
+    chat = UserChatHistory.query.filter_by(user_id=user_id, session_id=session_id).first()
+    if chat is None:
+        return {"history": history}
+    delta = chat_history_delta(chat, since)
+    return {"history_delta": delta, "revision": delta["revision"]}
+
+
 def _stored_message_text(message: dict[str, Any] | None) -> str:
     if not isinstance(message, dict):
         return ""
@@ -274,7 +268,7 @@ def _cleanup_temporary_uploads(user_data: dict[str, Any]) -> None:
         try:
             path = Path(str(file_info["path"])).resolve()
             if path.parent == upload_root and path.is_file():
-                path.unlink()
+                remove_stored_upload(path)
         except OSError:
             logger.warning("Could not remove a temporary chat upload", exc_info=True)
 
@@ -443,7 +437,7 @@ def process_request_data() -> tuple[str, dict[str, Any], str]:
 
     if "meta" in user_data and isinstance(user_data["meta"], str):
         try:
-            user_data["meta"] = json.loads(user_data["meta"])
+            user_data["meta"] = json_codec.loads(user_data["meta"])
         except json.JSONDecodeError:
             user_data["meta"] = {}
 
@@ -592,7 +586,108 @@ def _merge_web_sources(
 
 
 def _stream_event(payload: dict[str, Any]) -> str:
-    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    return f"data: {json_codec.dumps(payload)}\n\n"
+
+
+def _numbered_stream_event(seq: int, event: str) -> str:
+    return f"id: {seq}\n{event}"
+
+
+def _chat_stream_owner(db_user_id: int | None) -> str:
+    if db_user_id is not None:
+        return f"user:{db_user_id}"
+    owner = session.get("chat_stream_owner")
+    if not isinstance(owner, str) or not owner:
+        owner = uuid.uuid4().hex
+        session["chat_stream_owner"] = owner
+    return f"guest:{owner}"
+
+
+def _open_chat_stream_journal(request_id: str, db_user_id: int | None) -> ChatStreamWriter | None:
+    journal = get_chat_stream_journal()
+    if journal is None or not request_id:
+        return None
+    try:
+        return journal.open(request_id, _chat_stream_owner(db_user_id))
+    except Exception:
+        logger.warning("Chat stream journal unavailable; stream is not resumable", exc_info=True)
+        return None
+
+
+def _journaled_stream(events, writer: ChatStreamWriter):
+    try:
+        for event in events:
+            yield _numbered_stream_event(writer.append(event), event)
+    except GeneratorExit:
+        if writer.cancelled(refresh=True):
+            # Stopped by the user: end generation now and keep the interrupted delivery.
+            events.close()
+            raise
+        # Otherwise the connection dropped: finish the generation into the journal so a
+        # resume can replay it and the answer is persisted whole. A cancel that arrives
+        # meanwhile still stops it through the generator's own check.
+        for event in events:
+            writer.append(event)
+        raise
+    finally:
+        writer.close()
+
+
+def _relay_chat_stream(journal, request_id: str, after: int, *, resumed: bool = True):
+    while True:
+        events, state = journal.read(request_id, after, CHAT_STREAM_HEARTBEAT_SECONDS)
+        if events:
+            if resumed:
+                CHAT_STREAM_REPLAYED_EVENTS_TOTAL.inc(len(events))
+            for seq, event in events:
+                after = seq
+                yield _numbered_stream_event(seq, event)
+            continue
+        if state == "failed":
+            yield _stream_event({"error": "stream_failed"})
+        if state != "open":
+            return
+        yield ": keep-alive\n\n"
+
+
+def _stream_flush_policy() -> dict[str, int]:
+    client_type = "mobile" if "Mobile" in request.headers.get("User-Agent", "") else "desktop"
+    interval_ms, max_bytes = CHAT_STREAM_FLUSH_POLICIES.get(
+        client_type, (CHAT_STREAM_FLUSH_MS, CHAT_STREAM_FLUSH_BYTES)
+    )
+    return {"flush_interval_ms": interval_ms, "flush_max_bytes": max_bytes}
+
+
+def _running_chat_stream(request_id: str, db_user_id: int | None):
+    """Relay of an earlier attempt of ``request_id`` that is still generating or done."""
+    journal = get_chat_stream_journal()
+    if journal is None or not request_id:
+        return None
+    try:
+        if journal.owner(request_id) != _chat_stream_owner(db_user_id):
+            return None
+        state = journal.status(request_id)
+        if state == "failed":
+            # Its writer died without finishing: let this attempt generate again.
+            journal.discard(request_id)
+            return None
+    except Exception:
+        logger.warning("Chat stream journal unavailable for deduplication", exc_info=True)
+        return None
+    if state is None:
+        return None
+    CHAT_GENERATIONS_DEDUPLICATED_TOTAL.inc()
+    return _relay_chat_stream(journal, request_id, 0, resumed=False)
+
+
+def _chat_stream_response(events, request_id: str, session_token: str | None = None) -> Response:
+    response = Response(events, mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    response.headers["X-Chat-Request-Id"] = request_id
+    if session_token:
+        response.headers["X-Chat-Session-Token"] = session_token
+    return response
 
 
 def _build_model_message_for_history(
@@ -819,7 +914,7 @@ def _resolve_history(
         return history_field
     if isinstance(history_field, str) and history_field.strip():
         try:
-            return json.loads(history_field)
+            return json_codec.loads(history_field)
         except json.JSONDecodeError:
             return []
     guest_file_access_allowed = db_user_id is None and has_valid_guest_session_token(
@@ -841,215 +936,297 @@ def _allow_guest_file_persistence(resolved_session_id: str, db_user_id: int | No
     return not chat_file_exists(resolved_session_id)
 
 
-def _stream_chat_response(
-    model_name: str,
+def _chat_answer_events(
     model_func,
+    *,
+    model_name: str,
     db_user_id: int | None,
     user_data: dict,
     resolved_session_id: str,
-    original_user_message: str,
     user_message_for_history: dict | None,
     allow_guest_file_persistence: bool,
     temporary_chat: bool,
     mind_context: dict[str, Any] | None,
     newly_uploaded_files: list[dict[str, Any]],
+    flush_interval_ms: int,
+    flush_max_bytes: int,
+    cancelled: Callable[[], bool] | None = None,
 ):
-    captured_app = cast(Flask, cast(Any, current_app)._get_current_object())
+    full_response = ""
+    internal_reply_parts: list[str] = []
+    streamed_response = ""
+    pending_reply_buffer = ""
+    suppress_canmore_output = False
+    final_data: dict[str, Any] = {}
+    aggregated_sources: list[dict[str, Any]] = []
+    current_canvas_textdoc = normalize_canvas_textdoc(user_data.get("canvas_textdoc"))
+    stream_completed = False
+    persisted = False
+    frames = ChatFrameCoalescer(
+        _stream_event, FlushPolicy(interval_ms=flush_interval_ms, max_bytes=flush_max_bytes)
+    )
 
-    def stream_generator():
-        with captured_app.app_context():
-            full_response = ""
-            internal_reply_parts: list[str] = []
-            streamed_response = ""
-            pending_reply_buffer = ""
-            suppress_canmore_output = False
-            final_data: dict[str, Any] = {}
-            aggregated_sources: list[dict[str, Any]] = []
-            current_canvas_textdoc = normalize_canvas_textdoc(user_data.get("canvas_textdoc"))
-            stream_completed = False
-            persisted = False
-
-            def stream_reply_text(chunk_text: str):
-                nonlocal pending_reply_buffer, streamed_response, suppress_canmore_output
-                if not chunk_text:
-                    return
-
-                pending_reply_buffer += chunk_text
-                if suppress_canmore_output:
-                    return
-
-                marker_index = find_canmore_marker(pending_reply_buffer)
-                if marker_index >= 0:
-                    visible_text = pending_reply_buffer[:marker_index]
-                    pending_reply_buffer = pending_reply_buffer[marker_index:]
-                    suppress_canmore_output = True
-                    if visible_text:
-                        streamed_response += visible_text
-                        yield _stream_event({"reply_part": visible_text})
-                    return
-
-                flush_length = max(0, len(pending_reply_buffer) - CANMORE_STREAM_HOLDBACK_CHARS)
-                if flush_length <= 0:
-                    return
-
-                visible_text = pending_reply_buffer[:flush_length]
-                pending_reply_buffer = pending_reply_buffer[flush_length:]
+    def stream_reply_text(chunk_text: str):
+        nonlocal pending_reply_buffer, streamed_response, suppress_canmore_output
+        if not chunk_text:
+            return
+
+        pending_reply_buffer += chunk_text
+        if suppress_canmore_output:
+            return
+
+        marker_index = find_canmore_marker(pending_reply_buffer)
+        if marker_index >= 0:
+            visible_text = pending_reply_buffer[:marker_index]
+            pending_reply_buffer = pending_reply_buffer[marker_index:]
+            suppress_canmore_output = True
+            if visible_text:
                 streamed_response += visible_text
-                yield _stream_event({"reply_part": visible_text})
-
-            def persist_delivery(delivery_status: str) -> list[dict]:
-                nonlocal persisted
-                if temporary_chat or persisted:
-                    return []
-                reply_text = (
-                    str(final_data["reply"])
-                    if "reply" in final_data
-                    else str(full_response or streamed_response or "")
-                )
-                model_message = _build_model_message_for_history(
-                    reply_text,
-                    final_data.get("images"),
-                    final_data.get("sources"),
-                    python_artifacts=final_data.get("python_artifacts"),
-                    github_tool=final_data.get("github_tool"),
-                    canvas_textdoc=final_data.get("canvas_textdoc"),
-                    canvas_updates=final_data.get("canvas_updates"),
-                    request_id=user_data.get("request_id"),
-                    delivery_status=delivery_status,
-                    message_id=user_data.get("assistant_message_id"),
-                )
-                history = persist_chat_operation(
-                    resolved_session_id,
-                    operation=str(user_data.get("operation") or "send"),
-                    target_message_id=user_data.get("target_message_id"),
-                    parent_message_id=user_data.get("parent_message_id"),
-                    user_message=user_message_for_history,
-                    model_message=model_message,
-                    model_name=model_name,
-                    user_id=db_user_id,
-                    allow_guest_file_persistence=allow_guest_file_persistence,
-                    mind_id=mind_context.get("id") if mind_context else None,
-                )
-                persisted = True
-                return history
+                yield from frames.push({"reply_part": visible_text})
+            return
 
-            try:
-                yield _stream_event({"status": "generating_text", "message": "Готовлю ответ..."})
-
-                for chunk in model_func(db_user_id, user_data):
-                    if isinstance(chunk, dict):
-                        if "thinking_update" in chunk:
-                            yield _stream_event({"thinking_update": chunk["thinking_update"]})
-                            continue
-
-                        if "internal_reply_part" in chunk:
-                            internal_reply_parts.append(str(chunk.get("internal_reply_part") or ""))
-                            continue
-
-                        if "python_artifacts" in chunk:
-                            existing_artifacts = final_data.get("python_artifacts")
-                            final_data["python_artifacts"] = [
-                                *(
-                                    existing_artifacts
-                                    if isinstance(existing_artifacts, list)
-                                    else []
-                                ),
-                                *(
-                                    chunk.get("python_artifacts")
-                                    if isinstance(chunk.get("python_artifacts"), list)
-                                    else []
-                                ),
-                            ][:10]
-                            continue
-
-                        if "canvas_update" in chunk:
-                            yield _stream_event({"canvas_update": chunk["canvas_update"]})
-                            final_data.update(
-                                {k: v for k, v in chunk.items() if k != "canvas_update"}
-                            )
-                            continue
-
-                        if "widget_update" in chunk:
-                            yield _stream_event({"widget_update": chunk["widget_update"]})
-                            final_data.update(
-                                {k: v for k, v in chunk.items() if k != "widget_update"}
-                            )
-                            continue
-
-                        if "reply_part" in chunk:
-                            chunk_str = str(chunk.get("reply_part") or "")
-                            full_response += chunk_str
-                            yield from stream_reply_text(chunk_str)
-                            final_data.update({k: v for k, v in chunk.items() if k != "reply_part"})
-                            continue
-
-                        if any(
-                            key in chunk for key in ("status", "images", "thinkingTime", "sources")
-                        ):
-                            stream_chunk = chunk
-                            if "sources" in chunk:
-                                aggregated_sources = _merge_web_sources(
-                                    aggregated_sources,
-                                    chunk.get("sources"),
-                                )
-                                stream_chunk = {**chunk, "sources": aggregated_sources}
-                            yield _stream_event(stream_chunk)
-                            final_data.update(stream_chunk)
-                            continue
-
-                        final_data.update(chunk)
-                        continue
-
-                    chunk_str = str(chunk)
+        flush_length = max(0, len(pending_reply_buffer) - CANMORE_STREAM_HOLDBACK_CHARS)
+        if flush_length <= 0:
+            return
+
+        visible_text = pending_reply_buffer[:flush_length]
+        pending_reply_buffer = pending_reply_buffer[flush_length:]
+        streamed_response += visible_text
+        yield from frames.push({"reply_part": visible_text})
+
+    def persist_delivery(delivery_status: str) -> list[dict]:
+        nonlocal persisted
+        if temporary_chat or persisted:
+            return []
+        reply_text = (
+            str(final_data["reply"])
+            if "reply" in final_data
+            else str(full_response or streamed_response or "")
+        )
+        model_message = _build_model_message_for_history(
+            reply_text,
+            final_data.get("images"),
+            final_data.get("sources"),
+            python_artifacts=final_data.get("python_artifacts"),
+            github_tool=final_data.get("github_tool"),
+            canvas_textdoc=final_data.get("canvas_textdoc"),
+            canvas_updates=final_data.get("canvas_updates"),
+            request_id=user_data.get("request_id"),
+            delivery_status=delivery_status,
+            message_id=user_data.get("assistant_message_id"),
+        )
+        history = persist_chat_operation(
+            resolved_session_id,
+            operation=str(user_data.get("operation") or "send"),
+            target_message_id=user_data.get("target_message_id"),
+            parent_message_id=user_data.get("parent_message_id"),
+            user_message=user_message_for_history,
+            model_message=model_message,
+            model_name=model_name,
+            user_id=db_user_id,
+            allow_guest_file_persistence=allow_guest_file_persistence,
+            mind_id=mind_context.get("id") if mind_context else None,
+        )
+        persisted = True
+        return history
+
+    try:
+        yield from frames.push({"status": "generating_text", "message": "Готовлю ответ..."})
+
+        model_chunks = model_func(db_user_id, user_data)
+        for chunk in model_chunks:
+            if cancelled is not None and cancelled():
+                model_chunks.close()
+                return
+            if isinstance(chunk, dict):
+                if "thinking_update" in chunk:
+                    yield from frames.push({"thinking_update": chunk["thinking_update"]})
+                    continue
+
+                if "internal_reply_part" in chunk:
+                    internal_reply_parts.append(str(chunk.get("internal_reply_part") or ""))
+                    continue
+
+                if "python_artifacts" in chunk:
+                    existing_artifacts = final_data.get("python_artifacts")
+                    final_data["python_artifacts"] = [
+                        *(existing_artifacts if isinstance(existing_artifacts, list) else []),
+                        *(
+                            chunk.get("python_artifacts")
+                            if isinstance(chunk.get("python_artifacts"), list)
+                            else []
+                        ),
+                    ][:10]
+                    continue
+
+                if "canvas_update" in chunk:
+                    yield from frames.push({"canvas_update": chunk["canvas_update"]})
+                    final_data.update({k: v for k, v in chunk.items() if k != "canvas_update"})
+                    continue
+
+                if "widget_update" in chunk:
+                    yield from frames.push({"widget_update": chunk["widget_update"]})
+                    final_data.update({k: v for k, v in chunk.items() if k != "widget_update"})
+                    continue
+
+                if "reply_part" in chunk:
+                    chunk_str = str(chunk.get("reply_part") or "")
                     full_response += chunk_str
                     yield from stream_reply_text(chunk_str)
+                    final_data.update({k: v for k, v in chunk.items() if k != "reply_part"})
+                    continue
+
+                if any(key in chunk for key in ("status", "images", "thinkingTime", "sources")):
+                    stream_chunk = chunk
+                    if "sources" in chunk:
+                        aggregated_sources = _merge_web_sources(
+                            aggregated_sources,
+                            chunk.get("sources"),
+                        )
+                        stream_chunk = {**chunk, "sources": aggregated_sources}
+                    yield from frames.push(stream_chunk)
+                    final_data.update(stream_chunk)
+                    continue
+
+                final_data.update(chunk)
+                continue
 
-                if not suppress_canmore_output and pending_reply_buffer:
-                    streamed_response += pending_reply_buffer
-                    yield _stream_event({"reply_part": pending_reply_buffer})
-
-                canvas_result = process_canmore_calls(full_response, current_canvas_textdoc)
-                if canvas_result.updates:
-                    final_data["canvas_updates"] = canvas_result.updates
-                    final_data["canvas_textdoc"] = canvas_result.textdoc
-                    for canvas_update in canvas_result.updates:
-                        yield _stream_event({"canvas_update": canvas_update})
-
-                final_data["reply"] = "".join(internal_reply_parts) + canvas_result.reply
-                final_data["request_id"] = user_data.get("request_id")
-                final_data["delivery_status"] = "complete"
-                final_data["sessionId"] = resolved_session_id
-                final_data["uploaded_files"] = [] if temporary_chat else user_data.get("files", [])
-                stream_completed = True
-                final_data["history"] = persist_delivery("complete")
-                if allow_guest_file_persistence and not temporary_chat:
-                    final_data["session_token"] = _generate_guest_session_token(
-                        resolved_session_id, int(time.time())
-                    )
-                yield _stream_event(final_data)
+            chunk_str = str(chunk)
+            full_response += chunk_str
+            yield from stream_reply_text(chunk_str)
+
+        if not suppress_canmore_output and pending_reply_buffer:
+            streamed_response += pending_reply_buffer
+            yield from frames.push({"reply_part": pending_reply_buffer})
+
+        canvas_result = process_canmore_calls(full_response, current_canvas_textdoc)
+        if canvas_result.updates:
+            final_data["canvas_updates"] = canvas_result.updates
+            final_data["canvas_textdoc"] = canvas_result.textdoc
+            for canvas_update in canvas_result.updates:
+                yield from frames.push({"canvas_update": canvas_update})
+
+        final_data["reply"] = "".join(internal_reply_parts) + canvas_result.reply
+        final_data["request_id"] = user_data.get("request_id")
+        final_data["delivery_status"] = "complete"
+        final_data["sessionId"] = resolved_session_id
+        final_data["uploaded_files"] = [] if temporary_chat else user_data.get("files", [])
+        stream_completed = True
+        final_data.update(
+            _final_history_fields(
+                persist_delivery("complete"),
+                resolved_session_id,
+                db_user_id,
+                user_data.get("history_since"),
+            )
+        )
+        if allow_guest_file_persistence and not temporary_chat:
+            final_data["session_token"] = _generate_guest_session_token(
+                resolved_session_id, int(time.time())
+            )
+        yield from frames.push(final_data)
 
+    except SessionLockTimeout:
+        logger.warning("Chat '%s' stayed locked while saving the answer", resolved_session_id)
+        yield from frames.push({"error": "session_busy", "retry_after_seconds": 1})
+    except Exception as exc:
+        logger.error("Stream error for '%s': %s", model_name, exc, exc_info=True)
+        yield from frames.push({"error": "stream_failed"})
+
+    finally:
+        if not temporary_chat and not persisted:
+            try:
+                persist_delivery("complete" if stream_completed else "interrupted")
             except Exception as exc:
-                logger.error("Stream error for '%s': %s", model_name, exc, exc_info=True)
-                yield _stream_event({"error": "stream_failed"})
-
-            finally:
-                if not temporary_chat and not persisted:
-                    try:
-                        persist_delivery("complete" if stream_completed else "interrupted")
-                    except Exception as exc:
-                        logger.exception("Failed to persist chat operation: %s", exc)
-                if temporary_chat or not persisted:
-                    _cleanup_temporary_uploads({"files": newly_uploaded_files})
-
-    response = Response(stream_generator(), mimetype="text/event-stream")
-    response.headers["Cache-Control"] = "no-cache"
-    response.headers["X-Accel-Buffering"] = "no"
-    response.headers["X-Chat-Request-Id"] = str(user_data.get("request_id") or "")
-    if allow_guest_file_persistence and not temporary_chat:
-        response.headers["X-Chat-Session-Token"] = _generate_guest_session_token(
-            resolved_session_id, int(time.time())
-        )
-    return response
+                logger.exception("Failed to persist chat operation: %s", exc)
+        if temporary_chat or not persisted:
+            _cleanup_temporary_uploads({"files": newly_uploaded_files})
+
+
+def _enqueue_chat_answer(answer: dict[str, Any], model_func) -> bool:
+    if CHAT_GENERATION_MODE != "worker" or not inspect.isgeneratorfunction(model_func):
+        return False
+    journal = get_chat_stream_journal()
+    if not isinstance(journal, RedisChatStreamJournal):
+        # A worker can only reach the request through a journal both processes share.
+        CHAT_GENERATION_JOBS_TOTAL.labels(result="inline_fallback").inc()
+        return False
+    enqueued = enqueue_chat_generation(answer)
+    if enqueued:
+        journal.hand_off(str(answer["user_data"].get("request_id") or ""))
+    CHAT_GENERATION_JOBS_TOTAL.labels(result="enqueued" if enqueued else "inline_fallback").inc()
+    return enqueued
+
+
+def run_chat_generation_job(answer: dict[str, Any]) -> None:
+    """Worker side of ``CHAT_GENERATION_MODE=worker``; expects an app context."""
+    request_id = str(answer["user_data"].get("request_id") or "")
+    journal = get_chat_stream_journal()
+    if not isinstance(journal, RedisChatStreamJournal) or journal.owner(request_id) is None:
+        logger.error("Chat generation job %s has no shared stream journal", request_id)
+        return
+    model_func = get_model_function(answer["model_name"])
+    writer = journal.writer(request_id)
+    try:
+        if not model_func:
+            writer.append(_stream_event({"error": "stream_failed"}))
+            return
+        for event in _chat_answer_events(model_func, cancelled=writer.cancelled, **answer):
+            writer.append(event)
+    finally:
+        writer.close()
+
+
+def _stream_chat_response(
+    model_name: str,
+    model_func,
+    db_user_id: int | None,
+    user_data: dict,
+    resolved_session_id: str,
+    original_user_message: str,
+    user_message_for_history: dict | None,
+    allow_guest_file_persistence: bool,
+    temporary_chat: bool,
+    mind_context: dict[str, Any] | None,
+    newly_uploaded_files: list[dict[str, Any]],
+):
+    captured_app = cast(Flask, cast(Any, current_app)._get_current_object())
+    answer = {
+        "model_name": model_name,
+        "db_user_id": db_user_id,
+        "user_data": user_data,
+        "resolved_session_id": resolved_session_id,
+        "user_message_for_history": user_message_for_history,
+        "allow_guest_file_persistence": allow_guest_file_persistence,
+        "temporary_chat": temporary_chat,
+        "mind_context": mind_context,
+        "newly_uploaded_files": newly_uploaded_files,
+        **_stream_flush_policy(),
+    }
+
+    def stream_generator(cancelled=None):
+        with captured_app.app_context():
+            yield from _chat_answer_events(model_func, cancelled=cancelled, **answer)
+
+    request_id = str(user_data.get("request_id") or "")
+    session_token = (
+        _generate_guest_session_token(resolved_session_id, int(time.time()))
+        if allow_guest_file_persistence and not temporary_chat
+        else None
+    )
+    journal_writer = _open_chat_stream_journal(request_id, db_user_id)
+    if journal_writer is None:
+        # Lost the race against a concurrent attempt of this request_id.
+        running = _running_chat_stream(request_id, db_user_id)
+        if running is not None:
+            _cleanup_temporary_uploads({"files": newly_uploaded_files})
+            return _chat_stream_response(running, request_id, session_token)
+        events = stream_generator()
+    elif _enqueue_chat_answer(answer, model_func):
+        events = _relay_chat_stream(get_chat_stream_journal(), request_id, 0, resumed=False)
+    else:
+        events = _journaled_stream(stream_generator(journal_writer.cancelled), journal_writer)
+    return _chat_stream_response(events, request_id, session_token)
 
 
 def _maybe_return_direct_image(model_output):
@@ -1068,7 +1245,7 @@ def register_chat_routes(api_bp):
         session_identifier, user_data, model_name = process_request_data()
         db_user_id = _resolve_db_user_id()
         raw_request_id = str(user_data.get("request_id") or uuid.uuid4().hex).strip()
-        if not re.fullmatch(r"[A-Za-z0-9_-]{8,100}", raw_request_id):
+        if not CHAT_REQUEST_ID_RE.fullmatch(raw_request_id):
             raise ApiError("Invalid request ID", status=400, code="invalid_request_id")
         user_data["request_id"] = raw_request_id
 
@@ -1105,6 +1282,7 @@ def register_chat_routes(api_bp):
             _validated_message_id(user_data.get("assistant_message_id")) or f"a_{uuid.uuid4().hex}"
         )
         temporary_chat = _coerce_bool(user_data.get("temporary_chat"))
+        history_since = _history_since(user_data.get("history_since"))
         allow_guest_file_persistence = _allow_guest_file_persistence(
             resolved_session_id, db_user_id
         )
@@ -1130,18 +1308,24 @@ def register_chat_routes(api_bp):
                     resolved_session_id, int(time.time())
                 )
             return make_ok(previous_delivery)
+        running_stream = _running_chat_stream(raw_request_id, db_user_id)
+        if running_stream is not None:
+            return _chat_stream_response(
+                running_stream,
+                raw_request_id,
+                (
+                    _generate_guest_session_token(resolved_session_id, int(time.time()))
+                    if allow_guest_file_persistence and not temporary_chat
+                    else None
+                ),
+            )
 
         if not temporary_chat:
-            existing_message_ids = {
-                str(message.get("id"))
-                for message in persisted_graph
-                if isinstance(message, dict) and message.get("id")
-            }
             incoming_message_ids = [assistant_message_id]
             if operation in {"send", "edit"}:
                 incoming_message_ids.append(user_message_id)
             if len(set(incoming_message_ids)) != len(incoming_message_ids) or any(
-                message_id in existing_message_ids for message_id in incoming_message_ids
+                message_id in persisted_graph.by_id for message_id in incoming_message_ids
             ):
                 raise ApiError(
                     "Message ID already exists",
@@ -1150,17 +1334,12 @@ def register_chat_routes(api_bp):
                 )
 
         parent_message_id: str | None = None
-        target_message = next(
-            (message for message in persisted_graph if message.get("id") == target_message_id),
-            None,
-        )
+        target_message = persisted_graph.get(target_message_id)
         if operation in {"regenerate", "edit"} and target_message:
-            sibling_count = sum(
-                1
-                for message in persisted_graph
-                if message.get("parent_id") == target_message.get("parent_id")
-            )
-            if sibling_count >= CHAT_MAX_VARIANTS_PER_TURN:
+            if (
+                persisted_graph.sibling_count(target_message.get("parent_id"))
+                >= CHAT_MAX_VARIANTS_PER_TURN
+            ):
                 raise ApiError(
                     "Conversation version limit reached",
                     status=409,
@@ -1197,14 +1376,7 @@ def register_chat_routes(api_bp):
         original_user_message = str(user_data.get("message") or "")
         inherited_attachment_parts: list[dict[str, Any]] = []
         if operation == "regenerate" and not temporary_chat:
-            parent_user = next(
-                (
-                    message
-                    for message in persisted_graph
-                    if message.get("id") == (target_message or {}).get("parent_id")
-                ),
-                None,
-            )
+            parent_user = persisted_graph.get((target_message or {}).get("parent_id"))
             if not parent_user:
                 raise ApiError(
                     "Regeneration source not found",
@@ -1255,10 +1427,20 @@ def register_chat_routes(api_bp):
 
         user_data["message"] = original_user_message
 
-        user_data["history"] = history
+        user_data["history"] = build_context_window(
+            history,
+            model_name,
+            session_id=(
+                resolved_session_id
+                if not temporary_chat and (db_user_id is not None or allow_guest_file_persistence)
+                else None
+            ),
+            user_id=db_user_id,
+        )
         user_data["history_is_canonical"] = not temporary_chat
         user_data["privacy"] = _load_privacy_controls(db_user_id)
         user_data["temporary_chat"] = temporary_chat
+        user_data["history_since"] = history_since
         user_data["autoWebSearch"] = _db_auto_web_search_enabled(db_user_id)
 
         user_message_parts = (
@@ -1379,10 +1561,55 @@ def register_chat_routes(api_bp):
         response_data["uploaded_files"] = [] if temporary_chat else user_data.get("files", [])
         response_data["request_id"] = raw_request_id
         response_data["delivery_status"] = "complete"
-        response_data["history"] = canonical_history
+        response_data.update(
+            _final_history_fields(canonical_history, resolved_session_id, db_user_id, history_since)
+        )
 
         return make_ok(response_data)
 
+    @api_bp.route("/chat/stream/<request_id>", methods=["GET"])
+    @api_error_boundary("chat_stream_resume_failed")
+    def resume_chat_stream(request_id: str):
+        journal = get_chat_stream_journal()
+        if (
+            journal is None
+            or not CHAT_REQUEST_ID_RE.fullmatch(request_id)
+            or journal.owner(request_id) != _chat_stream_owner(_resolve_db_user_id())
+        ):
+            CHAT_STREAM_RESUMES_TOTAL.labels(result="not_found").inc()
+            raise ApiError("Chat stream not found", status=404, code="stream_not_found")
+        raw_last_event_id = (
+            request.headers.get("Last-Event-ID") or request.args.get("last_event_id") or "0"
+        )
+        try:
+            after = max(0, int(raw_last_event_id))
+        except ValueError as exc:
+            raise ApiError(
+                "Invalid Last-Event-ID", status=400, code="invalid_last_event_id"
+            ) from exc
+        first_seq = journal.first_seq(request_id)
+        if first_seq is not None and after < first_seq - 1:
+            CHAT_STREAM_RESUMES_TOTAL.labels(result="expired").inc()
+            raise ApiError(
+                "Chat stream events are no longer available", status=410, code="stream_expired"
+            )
+
+        CHAT_STREAM_RESUMES_TOTAL.labels(result="resumed").inc()
+        return _chat_stream_response(_relay_chat_stream(journal, request_id, after), request_id)
+
+    @api_bp.route("/chat/stream/<request_id>/cancel", methods=["POST"])
+    @api_error_boundary("chat_stream_cancel_failed")
+    def cancel_chat_stream(request_id: str):
+        journal = get_chat_stream_journal()
+        if (
+            journal is None
+            or not CHAT_REQUEST_ID_RE.fullmatch(request_id)
+            or journal.owner(request_id) != _chat_stream_owner(_resolve_db_user_id())
+        ):
+            raise ApiError("Chat stream not found", status=404, code="stream_not_found")
+        journal.cancel(request_id)
+        return make_ok({"request_id": request_id, "cancelled": True})
+
     @api_bp.route("/translate", methods=["POST"])
     @anonymous_rate_limit(anonymous_translation_limiter)
     @rate_limit(translation_limiter)
@@ -1446,14 +1673,13 @@ def register_chat_routes(api_bp):
         safe_name = secure_filename(filename)
         if safe_name != filename or not PUBLIC_UPLOAD_NAME_RE.fullmatch(safe_name):
             raise ApiError("Not found", status=404, code="not_found")
-        access_and_reference = _uploaded_file_access(safe_name, _resolve_db_user_id())
-        if access_and_reference is None:
+        access = uploaded_file_access(safe_name, _resolve_db_user_id())
+        if access is None:
             raise ApiError("Not found", status=404, code="not_found")
 
-        _access, attachment = access_and_reference
         extension = Path(safe_name).suffix.lower().lstrip(".")
         as_attachment = extension not in {"gif", "jpeg", "jpg", "png", "webp"}
-        original_name = str(attachment.get("original_name") or "").replace("\\", "/")
+        original_name = str(access.original_name or "").replace("\\", "/")
         download_name = Path(original_name).name.replace("\r", "").replace("\n", "")[:255]
         response = send_from_directory(
             str(current_app.config["UPLOAD_FOLDER"]),
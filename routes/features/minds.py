@@ -3,12 +3,14 @@ from __future__ import annotations
 import re
 import secrets
 from datetime import datetime
-from typing import Any
+from typing import Any, Iterable
 
 from flask import request, session
 from sqlalchemy import or_
 
 from routes.api_errors import ApiError, api_error_boundary, require_authenticated_user_id
+from routes.loaders import BatchLoader, request_loader
+from routes.pagination import KeysetOrder, paginate
 from utils.auth import Mind, MindPin, UserChatHistory, db
 from utils.rate_limiting import api_limiter, rate_limit
 from utils.responses import make_ok
@@ -28,6 +30,17 @@ MIND_CATEGORIES = [
 ]
 MIND_CATEGORY_IDS = {category["id"] for category in MIND_CATEGORIES}
 MIND_VISIBILITIES = {"private", "link", "store"}
+STORE_MINDS_ORDER = (
+    KeysetOrder(Mind.is_featured, descending=True),
+    KeysetOrder(Mind.is_verified, descending=True),
+    KeysetOrder(Mind.updated_at, descending=True),
+    KeysetOrder(Mind.id, descending=True),
+)
+OWN_MINDS_ORDER = (
+    KeysetOrder(Mind.updated_at, descending=True),
+    KeysetOrder(Mind.id, descending=True),
+)
+PINNED_MINDS_ORDER = (KeysetOrder(MindPin.created_at), KeysetOrder(MindPin.id))
 
 
 def _viewer_id() -> int | None:
@@ -161,35 +174,51 @@ def _get_mind_or_404(public_id: str, viewer_id: int | None = None) -> Mind:
     return mind
 
 
-def _pinned_mind_ids(viewer_id: int | None, mind_ids: list[int]) -> set[int]:
-    if viewer_id is None or not mind_ids:
-        return set()
-    pins = MindPin.query.filter(
-        MindPin.user_id == viewer_id,
-        MindPin.mind_id.in_(mind_ids),
-    ).all()
-    return {pin.mind_id for pin in pins}
+def _load_minds(mind_ids: list[int]) -> dict[int, Mind]:
+    return {mind.id: mind for mind in Mind.query.filter(Mind.id.in_(mind_ids)).all()}
+
+
+def mind_loader() -> BatchLoader:
+    return request_loader("minds", _load_minds)
+
+
+def pinned_mind_loader(viewer_id: int | None) -> BatchLoader:
+    def load_pins(mind_ids: list[int]) -> dict[int, bool]:
+        if viewer_id is None:
+            return {}
+        pins = (
+            db.session.query(MindPin.mind_id)
+            .filter(MindPin.user_id == viewer_id, MindPin.mind_id.in_(mind_ids))
+            .all()
+        )
+        return {mind_id: True for (mind_id,) in pins}
+
+    return request_loader(f"mind_pins:{viewer_id}", load_pins, default=False)
+
+
+def prime_session_minds(mind_ids: Iterable[int | None], viewer_id: int | None) -> None:
+    """Queue the minds of a page of chats so ``serialize_mind_for_session`` batches them."""
+    mind_ids = [mind_id for mind_id in mind_ids if mind_id]
+    mind_loader().prime(mind_ids)
+    pinned_mind_loader(viewer_id).prime(mind_ids)
 
 
 def _serialize_minds(minds: list[Mind], viewer_id: int | None) -> list[dict[str, Any]]:
-    pinned_ids = _pinned_mind_ids(viewer_id, [mind.id for mind in minds])
-    return [mind.to_dict(viewer_id=viewer_id, pinned=mind.id in pinned_ids) for mind in minds]
+    pins = pinned_mind_loader(viewer_id).prime(mind.id for mind in minds)
+    return [mind.to_dict(viewer_id=viewer_id, pinned=pins.load(mind.id)) for mind in minds]
 
 
 def serialize_mind_for_session(mind_id: int | None, viewer_id: int | None) -> dict[str, Any] | None:
     if not mind_id:
         return None
 
-    mind = db.session.get(Mind, mind_id)
+    mind = mind_loader().load(mind_id)
     if not mind or not _can_view_mind(mind, viewer_id):
         return None
     if mind.is_banned:
         return None
 
-    pinned = bool(
-        viewer_id is not None
-        and MindPin.query.filter_by(user_id=viewer_id, mind_id=mind.id).first()
-    )
+    pinned = pinned_mind_loader(viewer_id).load(mind.id)
     return mind.to_dict(viewer_id=viewer_id, pinned=pinned)
 
 
@@ -338,33 +367,24 @@ def register_mind_routes(api_bp):
         query = _apply_category(query, request.args.get("category", ""))
         query = _apply_search(query, request.args.get("q", ""))
 
-        if mine:
-            query = query.order_by(Mind.updated_at.desc(), Mind.created_at.desc())
-        else:
-            query = query.order_by(
-                Mind.is_featured.desc(),
-                Mind.is_verified.desc(),
-                Mind.updated_at.desc(),
-                Mind.created_at.desc(),
-            )
-
-        page = max(1, request.args.get("page", default=1, type=int) or 1)
         requested_page_size = request.args.get(
             "page_size",
             default=request.args.get("limit", default=60, type=int),
             type=int,
         )
-        page_size = max(1, min(requested_page_size or 60, 100))
-        total = query.count()
-        minds = query.offset((page - 1) * page_size).limit(page_size).all()
+        order = OWN_MINDS_ORDER if mine else STORE_MINDS_ORDER
+        listing = paginate(
+            query,
+            order,
+            scope="minds:mine" if mine else "minds:store",
+            row_values=lambda mind: [getattr(mind, item.column.key) for item in order],
+            page_size=max(1, min(requested_page_size or 60, 100)),
+        )
         return make_ok(
             {
-                "minds": _serialize_minds(minds, viewer_id),
+                "minds": _serialize_minds(listing.rows, viewer_id),
                 "categories": MIND_CATEGORIES,
-                "page": page,
-                "page_size": page_size,
-                "total": total,
-                "has_more": page * page_size < total,
+                **listing.fields(),
             }
         )
 
@@ -372,30 +392,23 @@ def register_mind_routes(api_bp):
     @api_error_boundary("mind_pins_failed")
     def list_pinned_minds():
         viewer_id = require_authenticated_user_id()
-        page = max(1, request.args.get("page", default=1, type=int) or 1)
-        page_size = max(
-            1,
-            min(request.args.get("page_size", default=60, type=int) or 60, 100),
-        )
         query = (
-            db.session.query(Mind, MindPin.created_at)
+            db.session.query(Mind, MindPin.created_at, MindPin.id)
             .join(MindPin, MindPin.mind_id == Mind.id)
             .filter(MindPin.user_id == viewer_id)
             .filter(Mind.is_banned.is_(False))
-            .order_by(MindPin.created_at.asc())
         )
-        total = query.count()
-        rows = query.offset((page - 1) * page_size).limit(page_size).all()
-        minds = [mind for mind, _created_at in rows if _can_view_mind(mind, viewer_id)]
-        return make_ok(
-            {
-                "minds": _serialize_minds(minds, viewer_id),
-                "page": page,
-                "page_size": page_size,
-                "total": total,
-                "has_more": page * page_size < total,
-            }
+        listing = paginate(
+            query,
+            PINNED_MINDS_ORDER,
+            scope="minds:pinned",
+            row_values=lambda row: (row[1], row[2]),
+            default_page_size=60,
         )
+        minds = [
+            mind for mind, _created_at, _pin_id in listing.rows if _can_view_mind(mind, viewer_id)
+        ]
+        return make_ok({"minds": _serialize_minds(minds, viewer_id), **listing.fields()})
 
     @api_bp.route("/api/minds", methods=["POST"])
     @rate_limit(api_limiter, "Too many mind changes. Please wait.")
@@ -1,52 +1,88 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import re
+import time
 import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable
 
-from flask import request, session
-from sqlalchemy import and_, or_
+from flask import current_app, request, session
+from sqlalchemy import and_
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import defer
 from werkzeug.utils import secure_filename
 
 from config import ALLOW_GUEST_CHATS_SAVE
 from routes.api_errors import ApiError, api_error_boundary, require_authenticated_user_id
-from routes.features.minds import get_mind_for_session_binding, serialize_mind_for_session
+from routes.features.minds import (
+    get_mind_for_session_binding,
+    prime_session_minds,
+    serialize_mind_for_session,
+)
+from routes.features.share import public_share_payload
+from routes.pagination import KeysetOrder, decode_cursor, encode_cursor, paginate
 from services.attachment_lifecycle import (
     collect_managed_references,
-    delete_unreferenced_managed_files,
+    count_managed_references,
+    mark_managed_files_released,
+    release_managed_files,
 )
+from services.attachment_refs import clear_upload_access_cache
 from services.canvas_tools import MAX_TEXTDOC_CONTENT_LENGTH
 from services.chat_history import (
     _verify_guest_session_token,
     build_share_url,
     chat_file_exists,
+    chat_history_delta,
     delete_guest_chat_file,
+    ensure_session_summaries,
     has_valid_guest_session_token,
     load_chat_history,
+    materialize_chat_history,
     materialize_conversation_history,
+    parse_history_since,
+    public_history,
     read_chat_file,
     read_chat_file_secure,
     resolve_session_identifier,
     save_canvas_textdoc_to_history,
     select_conversation_variant,
+    session_preview,
     write_chat_file,
 )
+from services.chat_search import (
+    chat_search_ranking,
+    chat_search_snippet,
+    filter_chat_search,
+    search_backend,
+    set_search_title,
+    snippet_segments,
+)
+from services.session_bulk_delete import (
+    SESSION_BULK_DELETE_INLINE_LIMIT,
+    SESSION_BULK_DELETE_MAX_IDS,
+    SESSION_BULK_DELETE_SOURCES,
+    delete_chats,
+    find_delete_job,
+    select_chats,
+    serialize_delete_job,
+    start_delete_job,
+)
+from services.session_locks import session_lock
+from services.share_snapshots import get_share_snapshot, share_source_for
+from utils import json_codec
 from utils.auth import ChatShare, UserChatHistory, db
 from utils.input_validation import InputValidator, ValidationError
+from utils.observability import SESSION_SEARCH_DURATION
 from utils.responses import make_ok
 
 MESSAGE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,120}$")
-
-
-def _safe_session_preview(messages: list) -> str:
-    if not messages:
-        return ""
-    last = messages[-1]
-    parts = last.get("parts", [])
-    if parts and isinstance(parts[0], dict):
-        return str(parts[0].get("text", ""))[:60]
-    return ""
+SESSION_LISTING_ORDER = (
+    KeysetOrder(UserChatHistory.updated_at, descending=True),
+    KeysetOrder(UserChatHistory.id, descending=True),
+)
 
 
 def _session_timestamp(chat: UserChatHistory) -> float:
@@ -63,19 +99,57 @@ def _session_mind_payload(chat: UserChatHistory | None, viewer_id: int | None) -
     return serialize_mind_for_session(chat.mind_id, viewer_id)
 
 
-def _public_history(history: list[dict]) -> list[dict]:
-    hidden_fields = {
-        "variants",
-        "current_variant_index",
-        "parent_id",
-        "is_active",
-        "request_id",
-        "delivery_status",
-    }
-    return [
-        {key: value for key, value in message.items() if key not in hidden_fields}
-        for message in history
-    ]
+def _history_etag(*components: Any) -> str:
+    digest = hashlib.sha256(json_codec.dumps(list(components), default=str).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def _conditional_history_response(etag: str, build_payload: Callable[[], dict]):
+    # API responses stay no-store, so the web client keeps the last body and its
+    # ETag itself (apiService.getSessionHistory) and revalidates with If-None-Match;
+    # the payload is only built when the validator no longer matches.
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response, _status = make_ok(build_payload())
+    response.set_etag(etag)
+    return response
+
+
+def _history_since_arg() -> int | str | None:
+    try:
+        return parse_history_since(request.args.get("since"))
+    except ValueError as exc:
+        raise ApiError("Invalid history cursor", status=400, code=str(exc)) from exc
+
+
+def _bulk_delete_cutoff(value: Any) -> datetime | None:
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError as exc:
+        raise ApiError(
+            "Invalid updated_before timestamp", status=400, code="invalid_cutoff"
+        ) from exc
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _stored_history_fields(
+    chat: UserChatHistory, since: int | str | None, *, public_view: bool = False
+) -> dict:
+    if since is None:
+        history = materialize_chat_history(chat)
+        return {
+            "history": public_history(history) if public_view else history,
+            "revision": chat.revision or 0,
+        }
+    delta = chat_history_delta(chat, since)
+    if public_view:
+        delta["messages"] = public_history(delta["messages"])
+    return {"history_delta": delta, "revision": delta["revision"]}
 
 
 def _parse_guest_tokens_header() -> dict[str, str]:
@@ -85,7 +159,7 @@ def _parse_guest_tokens_header() -> dict[str, str]:
     if len(raw_tokens) > 16384:
         raise ApiError("Guest token map too large", status=400, code="invalid_guest_tokens")
     try:
-        parsed = json.loads(raw_tokens)
+        parsed = json_codec.loads(raw_tokens)
     except json.JSONDecodeError as exc:
         raise ApiError("Invalid guest token map", status=400, code="invalid_guest_tokens") from exc
     if not isinstance(parsed, dict):
@@ -150,6 +224,7 @@ def register_session_routes(api_bp):
                 db_user_id = int(session.get("user_id"))
         except (TypeError, ValueError):
             db_user_id = None
+        since = _history_since_arg()
 
         is_public = bool(share_entry and share_entry.is_public)
         is_owner = bool(db_user_id and share_entry and share_entry.user_id == db_user_id)
@@ -163,26 +238,44 @@ def register_session_routes(api_bp):
                 if resolved_session_id
                 else None
             )
-            history = (
-                materialize_conversation_history(chat.get_messages())
-                if chat
-                else load_chat_history(resolved_session_id)
-            )
+            shared_fields = {
+                "session_id": resolved_session_id,
+                "title": chat.title if chat else None,
+                "mind": _session_mind_payload(chat, db_user_id),
+                "is_public": True,
+                "is_owner": is_owner,
+                "public_id": share_entry.public_id if share_entry else None,
+                "share_url": build_share_url(share_entry.public_id) if share_entry else None,
+                "read_only": not is_owner,
+            }
+            if chat:
+                etag = _history_etag("shared", chat.id, chat.revision, shared_fields, since)
+                if not is_owner and since is None:
+                    # Non-owners read the stored public snapshot instead of the graph.
+                    def build_shared_payload():
+                        snapshot = get_share_snapshot(
+                            share_source_for(share_entry, chat), public_share_payload
+                        )
+                        return {
+                            **shared_fields,
+                            "history": snapshot.payload["history"],
+                            "revision": snapshot.payload["revision"],
+                        }
+
+                    return _conditional_history_response(etag, build_shared_payload)
+                return _conditional_history_response(
+                    etag,
+                    lambda: {
+                        **shared_fields,
+                        **_stored_history_fields(chat, since, public_view=not is_owner),
+                    },
+                )
+            history = load_chat_history(resolved_session_id)
             if not is_owner:
-                history = _public_history(history)
-            title = chat.title if chat else None
-            return make_ok(
-                {
-                    "session_id": resolved_session_id,
-                    "history": history,
-                    "title": title,
-                    "mind": _session_mind_payload(chat, db_user_id),
-                    "is_public": True,
-                    "is_owner": is_owner,
-                    "public_id": share_entry.public_id if share_entry else None,
-                    "share_url": build_share_url(share_entry.public_id) if share_entry else None,
-                    "read_only": not is_owner,
-                }
+                history = public_history(history)
+            shared_fields["history"] = history
+            return _conditional_history_response(
+                _history_etag("shared", shared_fields), lambda: shared_fields
             )
 
         if db_user_id is not None:
@@ -190,15 +283,16 @@ def register_session_routes(api_bp):
                 user_id=db_user_id, session_id=resolved_session_id
             ).first()
             if chat:
-                return make_ok(
-                    {
-                        "session_id": resolved_session_id,
-                        "history": materialize_conversation_history(chat.get_messages()),
-                        "title": chat.title,
-                        "mind": _session_mind_payload(chat, db_user_id),
-                        "is_public": False,
-                        "is_owner": True,
-                    }
+                owner_fields = {
+                    "session_id": resolved_session_id,
+                    "title": chat.title,
+                    "mind": _session_mind_payload(chat, db_user_id),
+                    "is_public": False,
+                    "is_owner": True,
+                }
+                etag = _history_etag("owner", chat.id, chat.revision, owner_fields, since)
+                return _conditional_history_response(
+                    etag, lambda: {**owner_fields, **_stored_history_fields(chat, since)}
                 )
 
         if db_user_id is not None:
@@ -213,20 +307,23 @@ def register_session_routes(api_bp):
         if not has_valid_guest_session_token(safe_session_id):
             raise ApiError("Authentication required", status=401, code="auth_required")
 
+        # Guest chats carry no revision, so they always return the full history;
+        # the ETag is taken over the payload and still saves the transfer.
         data = read_chat_file_secure(safe_session_id, require_auth=True)
         history = materialize_conversation_history(
             data.get("history", []) if isinstance(data, dict) else []
         )
         title = data.get("title") if isinstance(data, dict) else None
-        return make_ok(
-            {
-                "session_id": resolved_session_id,
-                "history": history,
-                "title": title,
-                "mind": None,
-                "is_public": False,
-                "is_owner": False,
-            }
+        guest_fields = {
+            "session_id": resolved_session_id,
+            "history": history,
+            "title": title,
+            "mind": None,
+            "is_public": False,
+            "is_owner": False,
+        }
+        return _conditional_history_response(
+            _history_etag("guest", guest_fields), lambda: guest_fields
         )
 
     @api_bp.route("/sessions", methods=["GET"])
@@ -236,12 +333,11 @@ def register_session_routes(api_bp):
         db_user_id = None
         page = max(1, request.args.get("page", default=1, type=int) or 1)
         page_size = max(1, min(request.args.get("page_size", default=50, type=int) or 50, 100))
+        pagination: dict[str, Any] = {}
         search_query = str(request.args.get("q") or "").strip()[:120]
         source_filter = str(request.args.get("source") or "all").strip().lower()
         if source_filter not in {"all", "web", "telegram"}:
             raise ApiError("Invalid source filter", status=400, code="invalid_source_filter")
-        total = 0
-        has_more = False
 
         if "user_id" in session:
             try:
@@ -259,51 +355,63 @@ def register_session_routes(api_bp):
                     ),
                 )
                 .filter(UserChatHistory.user_id == db_user_id)
+                .options(
+                    defer(UserChatHistory.messages_data),
+                    defer(UserChatHistory.active_path_data),
+                    defer(UserChatHistory.source_context_data),
+                )
             )
+            search_backend_name = search_backend() if search_query else None
             if search_query:
-                escaped_query = (
-                    search_query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
-                )
-                search_pattern = f"%{escaped_query}%"
-                base_query = base_query.filter(
-                    or_(
-                        UserChatHistory.title.ilike(search_pattern, escape="\\"),
-                        UserChatHistory.messages_data.ilike(search_pattern, escape="\\"),
-                    )
-                )
+                base_query = filter_chat_search(base_query, search_query, search_backend_name)
             if source_filter == "web":
                 base_query = base_query.filter(UserChatHistory.source == "web")
             elif source_filter == "telegram":
                 base_query = base_query.filter(UserChatHistory.source.like("telegram\\_%", escape="\\"))
-            total = base_query.count()
-            has_more = (page * page_size) < total
-            rows = (
-                base_query.order_by(
-                    UserChatHistory.updated_at.desc(), UserChatHistory.created_at.desc()
-                )
-                .offset((page - 1) * page_size)
-                .limit(page_size)
-                .all()
+            search_started = time.perf_counter()
+            ranking = []
+            snippet_column = None
+            if search_query:
+                ranking = chat_search_ranking(search_query, search_backend_name)
+                snippet_column = chat_search_snippet(search_query, search_backend_name)
+            if snippet_column is not None:
+                base_query = base_query.add_columns(snippet_column)
+            listing = paginate(
+                base_query,
+                SESSION_LISTING_ORDER,
+                scope="sessions",
+                row_values=lambda row: (row[0].updated_at, row[0].id),
+                page_size=page_size,
+                ranking=ranking,
             )
+            rows = listing.rows
+            pagination = listing.fields()
+            if search_query:
+                SESSION_SEARCH_DURATION.labels(backend=search_backend_name).observe(
+                    time.perf_counter() - search_started
+                )
+            ensure_session_summaries([row[0] for row in rows])
+            prime_session_minds((row[0].mind_id for row in rows), db_user_id)
             seen_session_ids: set[str] = set()
-            for chat, public_id, is_public in rows:
+            for chat, public_id, is_public, *search_fields in rows:
                 if chat.session_id in seen_session_ids:
                     continue
                 seen_session_ids.add(chat.session_id)
-                sessions.append(
-                    {
-                        "session_id": chat.session_id,
-                        "last_updated": _session_timestamp(chat),
-                        "title": chat.title or "Новый чат",
-                        "source": chat.source or "web",
-                        "last_message": _safe_session_preview(
-                            materialize_conversation_history(chat.get_messages())
-                        ),
-                        "is_public": bool(is_public),
-                        "public_id": public_id,
-                        "mind": _session_mind_payload(chat, db_user_id),
-                    }
-                )
+                item = {
+                    "session_id": chat.session_id,
+                    "last_updated": _session_timestamp(chat),
+                    "title": chat.title or "Новый чат",
+                    "source": chat.source or "web",
+                    "last_message": chat.last_message_preview or "",
+                    "message_count": chat.message_count or 0,
+                    "has_attachments": bool(chat.has_attachments),
+                    "is_public": bool(is_public),
+                    "public_id": public_id,
+                    "mind": _session_mind_payload(chat, db_user_id),
+                }
+                if search_fields:
+                    item["snippet"] = snippet_segments(search_fields[0])
+                sessions.append(item)
 
         request_ids = request.args.get("ids")
         if not db_user_id and request_ids and ALLOW_GUEST_CHATS_SAVE:
@@ -329,7 +437,7 @@ def register_session_routes(api_bp):
                         "last_updated": data.get("last_updated", 0),
                         "title": data.get("title", "Новый чат"),
                         "source": "web",
-                        "last_message": _safe_session_preview(history),
+                        "last_message": session_preview(history),
                     }
                 )
 
@@ -345,21 +453,24 @@ def register_session_routes(api_bp):
             if source_filter == "telegram":
                 sessions = []
             sessions.sort(key=lambda item: item.get("last_updated", 0), reverse=True)
+            # Guest lists are at most 100 local files, so their cursor is just a page number.
+            cursor = str(request.args.get("cursor") or "").strip()
+            if cursor:
+                page, _values = decode_cursor("sessions:guest", cursor, None)
             total = len(sessions)
             start = (page - 1) * page_size
             end = start + page_size
-            has_more = end < total
-            sessions = sessions[start:end]
-
-        return make_ok(
-            {
-                "sessions": sessions,
+            pagination = {
                 "page": page,
                 "page_size": page_size,
                 "total": total,
-                "has_more": has_more,
+                "total_capped": False,
+                "has_more": end < total,
+                "next_cursor": encode_cursor("sessions:guest", page + 1) if end < total else None,
             }
-        )
+            sessions = sessions[start:end]
+
+        return make_ok({"sessions": sessions, **pagination})
 
     @api_bp.route("/sessions/<session_id>/branch", methods=["PUT"])
     @api_error_boundary("session_branch_failed")
@@ -428,6 +539,7 @@ def register_session_routes(api_bp):
         if existing:
             return make_ok({"session_id": existing.session_id})
         chat = UserChatHistory(user_id=db_user_id, session_id=session_id, title=title)
+        set_search_title(chat, title)
         db.session.add(chat)
         try:
             db.session.commit()
@@ -494,11 +606,13 @@ def register_session_routes(api_bp):
 
         raw_user_id = session.get("user_id")
         if isinstance(raw_user_id, int):
-            updated = UserChatHistory.query.filter_by(
+            chat = UserChatHistory.query.filter_by(
                 user_id=raw_user_id, session_id=resolved_session_id
-            ).update({"title": title}, synchronize_session=False)
-            if not updated:
+            ).first()
+            if not chat:
                 raise ApiError("Chat not found", status=404, code="not_found")
+            chat.title = title
+            set_search_title(chat, title)
             db.session.commit()
         else:
             safe_session_id = secure_filename(str(resolved_session_id))
@@ -508,11 +622,12 @@ def register_session_routes(api_bp):
                 or not has_valid_guest_session_token(safe_session_id)
             ):
                 raise ApiError("Authentication required", status=401, code="auth_required")
-            chat_data = read_chat_file_secure(safe_session_id, require_auth=True)
-            if not chat_data:
-                raise ApiError("Chat not found", status=404, code="not_found")
-            chat_data["title"] = title
-            write_chat_file(safe_session_id, chat_data)
+            with session_lock(safe_session_id):
+                chat_data = read_chat_file_secure(safe_session_id, require_auth=True)
+                if not chat_data:
+                    raise ApiError("Chat not found", status=404, code="not_found")
+                chat_data["title"] = title
+                write_chat_file(safe_session_id, chat_data)
         return make_ok({"session_id": resolved_session_id, "title": title})
 
     @api_bp.route("/sessions/<session_id>", methods=["DELETE"])
@@ -527,13 +642,13 @@ def register_session_routes(api_bp):
             ).first()
             if not chat:
                 raise ApiError("Chat not found", status=404, code="not_found")
-            managed_references = collect_managed_references(chat.get_messages())
+            release_managed_files(count_managed_references(chat.get_messages()))
             db.session.delete(chat)
             ChatShare.query.filter_by(user_id=raw_user_id, session_id=session_id).delete(
                 synchronize_session=False
             )
             db.session.commit()
-            delete_unreferenced_managed_files(managed_references)
+            clear_upload_access_cache()
             log_audit_event(AuditEvents.DELETE_CHAT, {"session_id": session_id}, raw_user_id)
             return "", 204
 
@@ -548,5 +663,61 @@ def register_session_routes(api_bp):
         managed_references = collect_managed_references(guest_chat_data)
         if not delete_guest_chat_file(safe_session_id):
             raise ApiError("Chat not found", status=404, code="not_found")
-        delete_unreferenced_managed_files(managed_references)
+        mark_managed_files_released(managed_references)
         return "", 204
+
+    @api_bp.route("/sessions/bulk-delete", methods=["POST"])
+    @api_error_boundary("session_bulk_delete_failed")
+    def bulk_delete_sessions():
+        from utils.audit_log import AuditEvents, log_audit_event
+
+        raw_user_id = session.get("user_id")
+        if not isinstance(raw_user_id, int):
+            raise ApiError("Authentication required", status=401, code="auth_required")
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            raise ApiError("Invalid JSON payload", status=400, code="invalid_json")
+
+        session_ids = data.get("session_ids")
+        if session_ids is not None:
+            if (
+                not isinstance(session_ids, list)
+                or len(session_ids) > SESSION_BULK_DELETE_MAX_IDS
+                or not all(isinstance(item, str) and 0 < len(item) <= 100 for item in session_ids)
+            ):
+                raise ApiError(
+                    f"session_ids must be a list of up to {SESSION_BULK_DELETE_MAX_IDS} ids",
+                    status=400,
+                    code="invalid_session_ids",
+                )
+        updated_before = _bulk_delete_cutoff(data.get("updated_before"))
+        source = data.get("source")
+        if source is not None and source not in SESSION_BULK_DELETE_SOURCES:
+            raise ApiError("Unsupported source filter", status=400, code="invalid_source")
+        if session_ids is None and updated_before is None and source is None:
+            raise ApiError(
+                "Select sessions by session_ids, updated_before or source",
+                status=400,
+                code="missing_selector",
+            )
+
+        chats = select_chats(
+            raw_user_id, session_ids=session_ids, updated_before=updated_before, source=source
+        )
+        if len(chats) > SESSION_BULK_DELETE_INLINE_LIMIT:
+            job = start_delete_job(raw_user_id, chats)
+            log_audit_event(
+                AuditEvents.DELETE_CHAT, {"bulk": True, "job_id": job.public_id}, raw_user_id
+            )
+            return make_ok(serialize_delete_job(job), status=202)
+        deleted = delete_chats(raw_user_id, chats)
+        log_audit_event(AuditEvents.DELETE_CHAT, {"bulk": True, "count": deleted}, raw_user_id)
+        return make_ok({"status": "completed", "total": len(chats), "deleted": deleted})
+
+    @api_bp.route("/sessions/bulk-delete/<job_id>", methods=["GET"])
+    @api_error_boundary("session_bulk_delete_status_failed")
+    def bulk_delete_sessions_status(job_id):
+        job = find_delete_job(require_authenticated_user_id(), str(job_id)[:64])
+        if job is None:
+            raise ApiError("Job not found", status=404, code="not_found")
+        return make_ok(serialize_delete_job(job))
@@ -1,17 +1,98 @@
 from __future__ import annotations
 
+import hashlib
+import re
 import uuid
 from datetime import datetime
 
-from flask import request
+from flask import current_app, request
 
 from routes.api_errors import ApiError, api_error_boundary, require_authenticated_user_id
-from services.chat_history import build_share_url, resolve_session_identifier
+from routes.features.minds import serialize_mind_for_session
+from services.attachment_refs import set_chat_attachments_public
+from services.chat_history import (
+    build_share_url,
+    materialize_chat_history,
+    public_history,
+    resolve_session_identifier,
+)
+from services.share_snapshots import (
+    drop_share_snapshot,
+    get_share_snapshot,
+    inject_share_html,
+    load_share_source,
+    share_cache_control,
+)
 from utils.auth import ChatShare, UserChatHistory, db
+from utils.observability import SHARE_SNAPSHOT_REQUESTS_TOTAL
 from utils.responses import make_ok
 
+PUBLIC_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+def public_share_payload(share: ChatShare, chat: UserChatHistory) -> dict:
+    """Viewer-independent public view of a shared chat, as stored in its snapshot."""
+    return {
+        "session_id": share.session_id,
+        "title": chat.title,
+        "mind": serialize_mind_for_session(chat.mind_id, None),
+        "is_public": True,
+        "is_owner": False,
+        "public_id": share.public_id,
+        "read_only": True,
+        "history": public_history(materialize_chat_history(chat)),
+        "revision": chat.revision or 0,
+    }
+
+
+def _share_source_or_404(public_id: str):
+    source = load_share_source(public_id) if PUBLIC_ID_RE.fullmatch(public_id) else None
+    if source is None:
+        raise ApiError("Chat not found", status=404, code="not_found")
+    return source
+
+
+def share_page_response(public_id: str, index_path: str):
+    """``/c/<public_id>`` with the snapshot rendered into the SPA shell, or None."""
+    source = load_share_source(public_id) if PUBLIC_ID_RE.fullmatch(public_id) else None
+    if source is None:
+        return None
+    with open(index_path, encoding="utf-8") as index_file:
+        index_html = index_file.read()
+    shell = hashlib.sha256(index_html.encode("utf-8")).hexdigest()[:12]
+    etag = f"{source.version}-{shell}"
+    if request.if_none_match.contains(etag):
+        SHARE_SNAPSHOT_REQUESTS_TOTAL.labels(result="not_modified").inc()
+        response = current_app.response_class(status=304)
+    else:
+        snapshot = get_share_snapshot(source, public_share_payload)
+        if snapshot.html is None:
+            return None
+        page = inject_share_html(index_html, snapshot.html, snapshot.payload.get("title"))
+        response = current_app.response_class(page, mimetype="text/html")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = share_cache_control()
+    return response
+
 
 def register_share_routes(api_bp):
+    @api_bp.route("/api/share/<public_id>", methods=["GET"])
+    @api_error_boundary("share_snapshot_failed")
+    def get_public_share(public_id):
+        source = _share_source_or_404(public_id)
+        etag = source.version
+        if request.if_none_match.contains(etag):
+            SHARE_SNAPSHOT_REQUESTS_TOTAL.labels(result="not_modified").inc()
+            response = current_app.response_class(status=304)
+        else:
+            snapshot = get_share_snapshot(source, public_share_payload)
+            response, _status = make_ok(
+                {**snapshot.payload, "share_url": build_share_url(public_id)}
+            )
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = share_cache_control()
+        return response
+
     @api_bp.route("/sessions/<session_id>/share", methods=["POST"])
     @api_error_boundary("share_update_failed")
     def share_session(session_id):
@@ -45,6 +126,9 @@ def register_share_routes(api_bp):
         else:
             share_entry.is_public = make_public
             share_entry.updated_at = datetime.utcnow()
+        set_chat_attachments_public(chat.id, make_public)
+        if not make_public:
+            drop_share_snapshot(chat.id)
 
         db.session.commit()
         log_audit_event(
@@ -23,8 +23,10 @@ from config import (
     OPERATIONAL_ENDPOINT_ALLOWED_NETWORKS,
     PUBLIC_METRICS_ENABLED,
     PUBLIC_OPENAPI_ENABLED,
+    SHARE_SNAPSHOT_HTML,
 )
 from routes.api_errors import ApiError, api_error_boundary
+from routes.features.share import share_page_response
 from services.model_access import list_accessible_models
 from utils.auth import db
 from utils.observability import export_prometheus_metrics
@@ -159,6 +161,17 @@ def register_system_routes(api_bp):
 
     @api_bp.route("/c/<path:anything>")
     def spa_chat_route(anything):
+        index_path = os.path.join(current_app.static_folder or "", "index.html")
+        if SHARE_SNAPSHOT_HTML and os.path.isfile(index_path):
+            try:
+                response = share_page_response(anything, index_path)
+            except Exception as exc:
+                # The plain SPA shell still renders the chat, just without first paint.
+                logger.warning("Could not render share snapshot page: %s", exc)
+                db.session.rollback()
+                response = None
+            if response is not None:
+                return response
         return send_from_directory(current_app.static_folder, "index.html")
 
     @api_bp.route("/openapi.json", methods=["GET"])
@@ -0,0 +1,66 @@
+"""Request-scoped batch loaders for route serializers.
+
+Serializers that look up a related row per item (a chat's mind, a mind's owner)
+ask a loader instead of the session. Keys primed for a page, or requested while
+nothing is cached yet, are resolved together with one ``IN`` query, and results
+are cached for the rest of the request so repeated keys never hit the database.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Hashable, Iterable
+
+from flask import g, has_app_context
+
+# Bound on the size of one IN list; larger batches are fetched in chunks.
+LOADER_BATCH_SIZE = 500
+_MISSING = object()
+
+
+class BatchLoader:
+    def __init__(self, fetch: Callable[[list], dict], default: Any = None):
+        self._fetch = fetch
+        self._default = default
+        self._cache: dict[Hashable, Any] = {}
+        self._pending: dict[Hashable, None] = {}
+
+    def prime(self, keys: Iterable[Hashable]) -> BatchLoader:
+        for key in keys:
+            if key is not None and key not in self._cache:
+                self._pending[key] = None
+        return self
+
+    def load(self, key: Hashable) -> Any:
+        if key is None:
+            return self._default
+        value = self._cache.get(key, _MISSING)
+        if value is _MISSING:
+            self._pending[key] = None
+            self._dispatch()
+            value = self._cache[key]
+        return value
+
+    def load_many(self, keys: Iterable[Hashable]) -> list[Any]:
+        keys = list(keys)
+        self.prime(keys)
+        return [self.load(key) for key in keys]
+
+    def _dispatch(self) -> None:
+        keys = list(self._pending)
+        self._pending.clear()
+        for start in range(0, len(keys), LOADER_BATCH_SIZE):
+            chunk = keys[start : start + LOADER_BATCH_SIZE]
+            found = self._fetch(chunk)
+            for key in chunk:
+                self._cache[key] = found.get(key, self._default)
+
+
+def request_loader(name: str, fetch: Callable[[list], dict], default: Any = None) -> BatchLoader:
+    """Return the loader called ``name`` for the current request, creating it on first use."""
+    if not has_app_context():
+        return BatchLoader(fetch, default)
+    loaders = g.setdefault("_remind_batch_loaders", {})
+    loader = loaders.get(name)
+    if loader is None:
+        loader = loaders[name] = BatchLoader(fetch, default)
+    return loader
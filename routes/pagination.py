@@ -0,0 +1,187 @@
+"""Keyset (cursor) pagination for the listing endpoints.
+
+A listing orders by a fixed tuple of columns that ends in a unique one. The
+cursor carries the last row's values for those columns, so the next page is an
+index range scan starting after that row instead of an OFFSET over every row
+before it. Listings that order by a computed score (ranked search) cannot seek
+on it and keep OFFSET inside the cursor instead.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Sequence
+
+from flask import current_app, request
+from itsdangerous import BadData, URLSafeSerializer
+from sqlalchemy import and_, func, literal_column, or_, tuple_
+
+from routes.api_errors import ApiError
+
+# ``include_total=1`` counts at most this many rows; larger listings report the
+# cap with ``total_capped`` set instead of paying for an exact count.
+KEYSET_TOTAL_CAP = 1000
+_DATETIME_TAG = "$dt"
+
+
+@dataclass(frozen=True)
+class KeysetOrder:
+    column: Any
+    descending: bool = False
+
+    def clause(self):
+        return self.column.desc() if self.descending else self.column.asc()
+
+
+@dataclass
+class KeysetPage:
+    rows: list
+    page: int
+    page_size: int
+    has_more: bool
+    next_cursor: str | None
+    total: int | None = None
+    total_capped: bool = False
+
+    def fields(self) -> dict[str, Any]:
+        data: dict[str, Any] = {
+            "page": self.page,
+            "page_size": self.page_size,
+            "has_more": self.has_more,
+            "next_cursor": self.next_cursor,
+        }
+        if self.total is not None:
+            data["total"] = self.total
+            data["total_capped"] = self.total_capped
+        return data
+
+
+def _serializer(scope: str) -> URLSafeSerializer:
+    return URLSafeSerializer(current_app.secret_key, salt=f"remind-keyset:{scope}")
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {_DATETIME_TAG: value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return datetime.fromisoformat(str(value[_DATETIME_TAG]))
+    return value
+
+
+def encode_cursor(scope: str, page: int, values: Sequence[Any] | None = None) -> str:
+    payload: dict[str, Any] = {"p": page}
+    if values is not None:
+        payload["k"] = [_encode_value(value) for value in values]
+    return _serializer(scope).dumps(payload)
+
+
+def decode_cursor(scope: str, token: str, key_length: int | None) -> tuple[int, list | None]:
+    try:
+        payload = _serializer(scope).loads(token)
+        page = int(payload["p"])
+        values = payload.get("k")
+        if key_length is None:
+            values = None
+        elif not isinstance(values, list) or len(values) != key_length:
+            raise ValueError("cursor key does not match listing")
+        else:
+            values = [_decode_value(value) for value in values]
+    except (BadData, KeyError, TypeError, ValueError) as exc:
+        raise ApiError("Invalid pagination cursor", status=400, code="invalid_cursor") from exc
+    return max(2, page), values
+
+
+def keyset_after(order: Sequence[KeysetOrder], values: Sequence[Any]):
+    """Condition selecting the rows that sort strictly after ``values``."""
+    if len({item.descending for item in order}) == 1:
+        columns = tuple_(*(item.column for item in order))
+        bound = tuple_(*values)
+        return columns < bound if order[0].descending else columns > bound
+
+    clauses = []
+    for index, item in enumerate(order):
+        value = values[index]
+        step = item.column < value if item.descending else item.column > value
+        clauses.append(
+            and_(*(order[i].column == values[i] for i in range(index)), step) if index else step
+        )
+    return or_(*clauses)
+
+
+def _page_size(default: int, maximum: int) -> int:
+    requested = request.args.get("page_size", default=default, type=int)
+    return max(1, min(requested or default, maximum))
+
+
+def _include_total() -> bool:
+    return (request.args.get("include_total") or "").lower() in {"1", "true", "yes"}
+
+
+def capped_total(query, cap: int = KEYSET_TOTAL_CAP) -> tuple[int, bool]:
+    limited = query.order_by(None).with_entities(literal_column("1")).limit(cap + 1).subquery()
+    count = query.session.query(func.count()).select_from(limited).scalar() or 0
+    return min(count, cap), count > cap
+
+
+def paginate(
+    query,
+    order: Sequence[KeysetOrder],
+    *,
+    scope: str,
+    row_values: Callable[[Any], Sequence[Any]],
+    default_page_size: int = 50,
+    max_page_size: int = 100,
+    page_size: int | None = None,
+    ranking: Sequence[Any] = (),
+) -> KeysetPage:
+    """Fetch one page of ``query`` ordered by ``ranking`` and then ``order``.
+
+    ``?cursor=`` seeks past the previous page. ``?page=`` without a cursor is the
+    legacy OFFSET mode and still returns an exact ``total``; keyset pages only
+    count when ``?include_total=1`` asks for it, capped at ``KEYSET_TOTAL_CAP``.
+    """
+    if page_size is None:
+        page_size = _page_size(default_page_size, max_page_size)
+    token = (request.args.get("cursor") or "").strip()
+    ordered = query.order_by(*ranking, *(item.clause() for item in order))
+
+    total = None
+    total_capped = False
+    offset = 0
+    if token:
+        page, values = decode_cursor(scope, token, None if ranking else len(order))
+        if ranking:
+            offset = (page - 1) * page_size
+        else:
+            ordered = ordered.filter(keyset_after(order, values))
+    else:
+        page = max(1, request.args.get("page", default=1, type=int) or 1)
+        offset = (page - 1) * page_size
+        if "page" in request.args:
+            total = query.order_by(None).with_entities(func.count()).scalar() or 0
+    if total is None and _include_total():
+        total, total_capped = capped_total(query)
+
+    if offset:
+        ordered = ordered.offset(offset)
+    rows = ordered.limit(page_size + 1).all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = None
+    if has_more:
+        next_values = None if ranking else list(row_values(rows[-1]))
+        next_cursor = encode_cursor(scope, page + 1, next_values)
+    return KeysetPage(
+        rows=rows,
+        page=page,
+        page_size=page_size,
+        has_more=has_more,
+        next_cursor=next_cursor,
+        total=total,
+        total_capped=total_capped,
+    )
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""CPU per streamed chat answer with and without SSE frame coalescing.
+
+Usage: python3 scripts/benchmark_chat_stream_frames.py [--chunks 3000] [--chunk-chars 4] \
+           [--chunk-interval-ms 2] [--policies 0:4096,30:4096,80:8192] [--repeat 5]
+
+A synthetic fast model streams ``--chunks`` reply deltas ``--chunk-interval-ms`` apart,
+with a thinking block up front. The simulated clock means no sleeping. Every policy
+(``<interval_ms>:<max_bytes>``, ``0`` = one frame per chunk) frames the answer through
+``ChatFrameCoalescer``, encodes it like ``/chat`` does, and writes each frame to
+``/dev/null`` with its own ``write`` call, as the WSGI server does per yielded frame.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services.chat_frames import ChatFrameCoalescer, FlushPolicy  # noqa: E402
+from utils import json_codec  # noqa: E402
+
+
+def encode(payload: dict) -> str:
+    return f"data: {json_codec.dumps(payload)}\n\n"
+
+
+def synthetic_answer(chunks: int, chunk_chars: int) -> list[dict]:
+    thinking = [
+        {"thinking_update": {"id": "think_1", "status": "streaming", "contentDelta": "hmm "}}
+        for _ in range(max(1, chunks // 10))
+    ]
+    thinking.append({"thinking_update": {"id": "think_1", "status": "complete"}})
+    reply = [{"reply_part": "слово "[:chunk_chars].ljust(chunk_chars)} for _ in range(chunks)]
+    return [{"status": "generating_text"}, *thinking, *reply, {"reply": "", "request_id": "r"}]
+
+
+def stream_answer(payloads: list[dict], policy: FlushPolicy, interval: float, sink: int):
+    now = [0.0]
+    coalescer = ChatFrameCoalescer(encode, policy, clock=lambda: now[0])
+    frames = written = 0
+    for payload in payloads:
+        now[0] += interval
+        for frame in coalescer.push(payload):
+            frames += 1
+            written += os.write(sink, frame.encode("utf-8"))
+    for frame in coalescer.flush():
+        frames += 1
+        written += os.write(sink, frame.encode("utf-8"))
+    return frames, written
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark SSE frame coalescing policies.")
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--chunk-chars", type=int, default=4)
+    parser.add_argument("--chunk-interval-ms", type=float, default=2.0)
+    parser.add_argument("--policies", default="0:4096,30:4096,80:8192")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payloads = synthetic_answer(args.chunks, args.chunk_chars)
+    policies = []
+    for raw_policy in args.policies.split(","):
+        raw_interval, _sep, raw_bytes = raw_policy.partition(":")
+        policies.append(
+            FlushPolicy(interval_ms=int(raw_interval), max_bytes=int(raw_bytes or 4096))
+        )
+
+    print(
+        f"{len(payloads)} payloads per answer, {args.chunk_interval_ms:g} ms apart, "
+        f"encoder {json_codec.BACKEND}"
+    )
+    print(f"{'policy':>12} {'frames':>8} {'bytes':>9} {'cpu ms/answer':>14}")
+    baseline = None
+    with open(os.devnull, "wb") as devnull:
+        sink = devnull.fileno()
+        for policy in policies:
+            frames = written = 0
+            started = time.process_time()
+            for _ in range(max(1, args.repeat)):
+                frames, written = stream_answer(
+                    payloads, policy, args.chunk_interval_ms / 1000, sink
+                )
+            cpu_ms = (time.process_time() - started) * 1000 / max(1, args.repeat)
+            baseline = baseline or cpu_ms
+            label = f"{policy.interval_ms}ms/{policy.max_bytes}B" if policy.enabled else "off"
+            print(
+                f"{label:>12} {frames:>8} {written:>9} {cpu_ms:>11.2f}"
+                f"  ({cpu_ms / baseline:.2f}x)"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
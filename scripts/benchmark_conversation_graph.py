@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for ConversationGraph on synthetic branched conversations.
+
+Usage: python3 scripts/benchmark_conversation_graph.py [--sizes 1000,2500,5000,10000]
+
+Every turn gets ``--variants`` sibling model replies, so variant switches at the
+deepest turn walk the full active path. Per-node timings that stay flat as the
+graph grows show the operations scale near-linearly.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services.chat_history import (  # noqa: E402
+    ConversationGraph,
+    _apply_chat_operation,
+    _select_variant_in_graph,
+)
+
+
+def build_messages(node_count: int, variants: int) -> list[dict]:
+    messages: list[dict] = []
+    parent_id: str | None = None
+    turn = 0
+    while len(messages) < node_count:
+        user_id = f"u{turn}"
+        messages.append(
+            {
+                "id": user_id,
+                "role": "user",
+                "parts": [{"text": f"question {turn}"}],
+                "parent_id": parent_id,
+                "is_active": True,
+                "timestamp": turn,
+            }
+        )
+        for variant in range(variants):
+            messages.append(
+                {
+                    "id": f"m{turn}_{variant}",
+                    "role": "model",
+                    "parts": [{"text": f"answer {turn}.{variant}"}],
+                    "parent_id": user_id,
+                    "is_active": variant == variants - 1,
+                    "timestamp": turn,
+                }
+            )
+        parent_id = f"m{turn}_{variants - 1}"
+        turn += 1
+    return messages
+
+
+def _timed(callback, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        callback()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(node_count: int, variants: int, repeat: int) -> dict[str, float]:
+    messages = build_messages(node_count, variants)
+    graph = ConversationGraph.from_messages(messages)
+    last_turn = sum(1 for message in messages if message["role"] == "user") - 1
+    deep_variant = f"m{last_turn}_0"
+    deep_model = f"m{last_turn}_{variants - 1}"
+    counter = iter(range(10**9))
+
+    def regenerate() -> None:
+        _apply_chat_operation(
+            graph,
+            operation="regenerate",
+            target_message_id=deep_model,
+            parent_message_id=None,
+            user_message=None,
+            model_message={"id": f"bench_{next(counter)}", "role": "model", "parts": []},
+        )
+
+    return {
+        "nodes": len(graph),
+        "load": _timed(lambda: ConversationGraph.from_messages(messages), repeat),
+        "materialize": _timed(lambda: ConversationGraph(graph.nodes).materialize(), repeat),
+        "select_variant": _timed(lambda: _select_variant_in_graph(graph, deep_variant), repeat),
+        "regenerate": _timed(regenerate, 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ConversationGraph operations.")
+    parser.add_argument("--sizes", default="1000,2500,5000,10000")
+    parser.add_argument("--variants", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    columns = ("load", "materialize", "select_variant", "regenerate")
+    print(f"{'nodes':>8} " + " ".join(f"{name + ' ms':>18}" for name in columns))
+    for size in (int(value) for value in args.sizes.split(",") if value.strip()):
+        result = run(size, max(1, args.variants), max(1, args.repeat))
+        cells = []
+        for name in columns:
+            millis = result[name] * 1000
+            cells.append(f"{millis:9.2f} ({millis * 1000 / result['nodes']:5.2f}us/n)")
+        print(f"{int(result['nodes']):>8} " + " ".join(f"{cell:>18}" for cell in cells))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
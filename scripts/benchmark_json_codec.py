@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Per-turn JSON CPU cost: stdlib ``json`` versus ``utils.json_codec``.
+
+Usage: python3 scripts/benchmark_json_codec.py [--frames 400] [--history 200] [--repeat 5]
+
+One synthetic turn streams ``--frames`` SSE chunks, serializes a tool result,
+hashes the legacy message signatures of a ``--history``-message chat, and packs,
+stores and re-reads that history the way the guest store and ``chat_message``
+rows do. Each step is timed with both encoders so the savings can be read per
+call site and per turn.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils import json_codec  # noqa: E402
+
+
+class _Stdlib:
+    @staticmethod
+    def dumps(value, *, sort_keys=False, default=None):
+        return json.dumps(value, ensure_ascii=False, sort_keys=sort_keys, default=default)
+
+    loads = staticmethod(json.loads)
+
+
+def build_history(size: int) -> list[dict]:
+    history = []
+    for index in range(size):
+        role = "user" if index % 2 == 0 else "model"
+        message = {
+            "id": f"msg_{index:06d}",
+            "role": role,
+            "parts": [{"text": f"Сообщение {index}: " + "lorem ipsum dolor sit amet " * 20}],
+            "parent_id": f"msg_{index - 1:06d}" if index else None,
+            "is_active": True,
+            "timestamp": 1_700_000_000 + index,
+        }
+        if role == "model":
+            message["sources"] = [
+                {
+                    "title": f"Source {n}",
+                    "url": f"https://example.com/{index}/{n}",
+                    "snippet": "x" * 160,
+                }
+                for n in range(6)
+            ]
+            message["tool_calls"] = [{"name": "web_search", "arguments": {"query": f"q{index}"}}]
+        history.append(message)
+    return history
+
+
+def run_turn(codec, history: list[dict], frames: int) -> dict[str, float]:
+    timings: dict[str, float] = {}
+
+    started = time.perf_counter()
+    for index in range(frames):
+        f"data: {codec.dumps({'type': 'chunk', 'text': f'токен {index} ', 'index': index})}\n\n"
+    timings["sse_frames"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    codec.dumps({"security": "untrusted", "results": history[-10:]}, default=str)
+    timings["tool_output"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for message in history:
+        for part in message["parts"]:
+            codec.dumps(part, sort_keys=True)
+    timings["signatures"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rows = [codec.dumps(message) for message in history]
+    timings["payload_write"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for row in rows:
+        codec.loads(row)
+    timings["payload_read"] = time.perf_counter() - started
+    return timings
+
+
+def _best(codec, history: list[dict], frames: int, repeat: int) -> dict[str, float]:
+    best: dict[str, float] = {}
+    for _ in range(repeat):
+        for name, seconds in run_turn(codec, history, frames).items():
+            best[name] = min(best.get(name, float("inf")), seconds)
+    best["turn"] = sum(best.values())
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the JSON codec on a chat turn.")
+    parser.add_argument("--frames", type=int, default=400)
+    parser.add_argument("--history", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    history = build_history(max(1, args.history))
+    frames = max(1, args.frames)
+    repeat = max(1, args.repeat)
+    baseline = _best(_Stdlib, history, frames, repeat)
+    current = _best(json_codec, history, frames, repeat)
+
+    print(f"backend: {json_codec.BACKEND}")
+    print(f"{'step':<14} {'stdlib ms':>10} {'codec ms':>10} {'speedup':>8}")
+    for name, seconds in baseline.items():
+        fast = current[name]
+        speedup = seconds / fast if fast else float("inf")
+        print(f"{name:<14} {seconds * 1000:10.3f} {fast * 1000:10.3f} {speedup:7.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Compare stored payload size and encode/decode time of the storage codec.
+
+Usage: python3 scripts/benchmark_storage_codec.py [--repeat 20]
+
+The baseline is today's ``json.dumps(message, ensure_ascii=False)``; the codec
+column is ``pack_message_payload``/``unpack_message_payload`` as used by
+``chat_message`` rows and the guest store.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.storage_codec import (  # noqa: E402
+    pack_message_payload,
+    unpack_message_payload,
+    zstandard,
+)
+
+_WORDS = [
+    "".join(
+        random.Random(seed).choices(string.ascii_lowercase, k=random.Random(seed).randint(2, 9))
+    )
+    for seed in range(2000)
+] + ["привет", "данные", "функция", "результат", "значение"]
+
+
+def _text(rng: random.Random, length: int) -> str:
+    words: list[str] = []
+    size = 0
+    while size < length:
+        word = rng.choice(_WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)[:length]
+
+
+def sample_messages() -> dict[str, dict]:
+    rng = random.Random(7)
+    plain = {"role": "model", "parts": [{"text": _text(rng, 1500)}], "timestamp": 1}
+    sources = dict(
+        plain,
+        sources=[
+            {
+                "title": _text(rng, 60),
+                "url": f"https://example.com/{index}",
+                "snippet": _text(rng, 400),
+            }
+            for index in range(12)
+        ],
+    )
+    canvas = dict(
+        plain,
+        canvas_textdoc={
+            "id": "doc1",
+            "name": "report.md",
+            "type": "document",
+            "content": _text(rng, 240_000),
+        },
+        canvas_updates=[{"textdoc": {"id": "doc1", "content": _text(rng, 20_000)}}],
+    )
+    return {"plain reply": plain, "web sources": sources, "240k canvas": canvas}
+
+
+def _best(callback, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        callback()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the storage codec.")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    repeat = max(1, args.repeat)
+
+    print(f"codec: {'zstd' if zstandard is not None else 'zlib'}")
+    print(
+        f"{'payload':<14}{'json bytes':>12}{'codec bytes':>13}{'ratio':>7}"
+        f"{'json enc ms':>13}{'codec enc ms':>14}{'json dec ms':>13}{'codec dec ms':>14}"
+    )
+    for name, message in sample_messages().items():
+        baseline = json.dumps(message, ensure_ascii=False)
+        packed = pack_message_payload(message)
+        assert unpack_message_payload(packed) == message
+        baseline_size = len(baseline.encode("utf-8"))
+        packed_size = len(packed.encode("utf-8"))
+        timings = [
+            _best(lambda message=message: json.dumps(message, ensure_ascii=False), repeat),
+            _best(lambda message=message: pack_message_payload(message), repeat),
+            _best(lambda baseline=baseline: json.loads(baseline), repeat),
+            _best(lambda packed=packed: unpack_message_payload(packed), repeat),
+        ]
+        print(
+            f"{name:<14}{baseline_size:>12}{packed_size:>13}{baseline_size / packed_size:>7.1f}"
+            + "".join(
+                f"{value * 1000:>{width}.3f}"
+                for value, width in zip(timings, (13, 14, 13, 14), strict=True)
+            )
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
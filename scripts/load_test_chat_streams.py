@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Open many concurrent ``/chat`` SSE streams and report how many the server sustains.
+
+Usage: python3 scripts/load_test_chat_streams.py --url http://127.0.0.1:5000 \
+           --streams 300 --cookie "remind_session=<admin session>"
+
+The default ``echo_stream`` model sleeps between chunks like a provider stream
+and is available to admins only, so pass the session cookie of an admin account.
+Streams are temporary chats and are not persisted. With the ``gthread`` worker
+concurrency tops out at ``workers * threads``; with ``GUNICORN_WORKER_CLASS=gevent``
+the peak should approach ``--streams``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/124.0 Safari/537.36"
+)
+
+
+class StreamCounter:
+    def __init__(self) -> None:
+        self.open = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> None:
+        with self._lock:
+            self.open += 1
+            self.peak = max(self.peak, self.open)
+
+    def __exit__(self, *_exc) -> None:
+        with self._lock:
+            self.open -= 1
+
+
+def run_stream(args: argparse.Namespace, index: int, counter: StreamCounter) -> dict:
+    http = requests.Session()
+    http.headers["User-Agent"] = USER_AGENT
+    for pair in filter(None, (item.strip() for item in args.cookie.split(";"))):
+        name, _sep, value = pair.partition("=")
+        http.cookies.set(name, value, domain=urlparse(args.url).hostname)
+    started = time.perf_counter()
+    try:
+        # Any GET issues the CSRF token (header and cookie) for this client.
+        csrf_token = http.get(f"{args.url}/api/models", timeout=args.timeout).headers.get(
+            "X-CSRF-Token", ""
+        )
+        payload = {
+            "message": "x" * args.message_chars,
+            "model": args.model,
+            "session_id": f"load_{index}_{uuid.uuid4().hex[:12]}",
+            "temporary_chat": True,
+        }
+        first_event = None
+        events = 0
+        with http.post(
+            f"{args.url}/chat",
+            json=payload,
+            headers={"X-CSRF-Token": csrf_token, "Accept": "text/event-stream"},
+            stream=True,
+            timeout=args.timeout,
+        ) as response:
+            if response.status_code != 200:
+                return {"ok": False, "error": f"HTTP {response.status_code}"}
+            with counter:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    events += 1
+                    if first_event is None:
+                        first_event = time.perf_counter() - started
+        return {
+            "ok": events > 0,
+            "first_event": first_event,
+            "duration": time.perf_counter() - started,
+            "error": None if events else "no events",
+        }
+    except requests.RequestException as exc:
+        return {"ok": False, "error": type(exc).__name__}
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test concurrent chat SSE streams.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--streams", type=int, default=300)
+    parser.add_argument("--model", default="echo_stream")
+    parser.add_argument("--message-chars", type=int, default=2000)
+    parser.add_argument("--cookie", default="")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+    args.url = args.url.rstrip("/")
+
+    counter = StreamCounter()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.streams)) as executor:
+        results = list(
+            executor.map(lambda index: run_stream(args, index, counter), range(args.streams))
+        )
+    elapsed = time.perf_counter() - started
+
+    completed = [result for result in results if result["ok"]]
+    errors: dict[str, int] = {}
+    for result in results:
+        if not result["ok"]:
+            errors[result["error"]] = errors.get(result["error"], 0) + 1
+    first_events = [result["first_event"] for result in completed]
+    durations = [result["duration"] for result in completed]
+    print(f"streams          {args.streams}")
+    print(f"completed        {len(completed)}")
+    print(f"peak concurrent  {counter.peak}")
+    print(f"wall time        {elapsed:.2f}s")
+    if completed:
+        print(
+            f"first event      p50 {statistics.median(first_events):.3f}s"
+            f"  p95 {_percentile(first_events, 0.95):.3f}s"
+        )
+        print(
+            f"stream duration  p50 {statistics.median(durations):.3f}s"
+            f"  p95 {_percentile(durations, 0.95):.3f}s"
+        )
+    for error, count in sorted(errors.items()):
+        print(f"failed           {count} x {error}")
+    return 0 if len(completed) == args.streams else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Eagerly re-encode stored chat message payloads with the current storage codec.
+
+Rows are otherwise migrated lazily when their payload is next rewritten.
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from app_factory import create_app
+from utils.auth import ChatMessage, db
+from utils.storage_codec import pack_message_payload, unpack_message_payload
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Re-encode chat_message payloads.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    batch_size = max(1, args.batch_size)
+
+    app = create_app()
+    scanned = rewritten = 0
+    with app.app_context():
+        last_id = 0
+        while True:
+            rows = (
+                ChatMessage.query.filter(ChatMessage.id > last_id)
+                .order_by(ChatMessage.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            for row in rows:
+                scanned += 1
+                packed = pack_message_payload(unpack_message_payload(row.payload_data))
+                if packed != row.payload_data:
+                    row.payload_data = packed
+                    rewritten += 1
+            last_id = rows[-1].id
+            db.session.commit()
+            db.session.expunge_all()
+
+    print(f"Scanned {scanned} chat messages, rewrote {rewritten}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
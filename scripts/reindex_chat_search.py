@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Build or refresh the full-text search documents of every signed-in user's chat.
+
+Chats are otherwise indexed on their next write, so run this once after
+deploying the search index on a database that already holds chats.
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from sqlalchemy import text
+
+from app_factory import create_app
+from services.chat_search import index_chat, search_backend
+from utils.auth import UserChatHistory, db
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Reindex chat search documents.")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    batch_size = max(1, args.batch_size)
+
+    app = create_app()
+    indexed = 0
+    with app.app_context():
+        last_id = 0
+        while True:
+            chats = (
+                UserChatHistory.query.filter(UserChatHistory.id > last_id)
+                .order_by(UserChatHistory.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not chats:
+                break
+            for chat in chats:
+                index_chat(chat)
+                indexed += 1
+            last_id = chats[-1].id
+            db.session.commit()
+            db.session.expunge_all()
+        if search_backend() == "sqlite":
+            with db.engine.begin() as connection:
+                connection.execute(
+                    text("INSERT INTO chat_search_fts(chat_search_fts) VALUES ('rebuild')")
+                )
+
+    print(f"Indexed {indexed} chats")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
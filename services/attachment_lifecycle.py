@@ -1,14 +1,36 @@
+"""Reference counting and garbage collection of uploads and generated images.
+
+Signed-in chats count references per message in ``managed_file``: chat writes
+retain the files their new messages point to and chat deletions release them,
+in the same transaction. Guest sessions record theirs in the guest chat store.
+A file whose count stays at zero for ``ATTACHMENT_GC_GRACE_SECONDS`` and that no
+guest session references is deleted by ``sweep_managed_files``, which the Celery
+beat schedule runs every ``ATTACHMENT_GC_INTERVAL_SECONDS``.
+"""
+
 from __future__ import annotations
 
-import json
 import re
+from collections import Counter
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable
 
 from flask import current_app, has_app_context
+from sqlalchemy import case
+from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
 
-from config import CHATS_FOLDER, CREATE_IMAGE_FOLDER, UPLOAD_FOLDER
+from config import (
+    ATTACHMENT_GC_BATCH_SIZE,
+    ATTACHMENT_GC_GRACE_SECONDS,
+    CHATS_FOLDER,
+    CREATE_IMAGE_FOLDER,
+    UPLOAD_FOLDER,
+)
+from services.files import remove_stored_upload
+from utils.auth import ManagedFile, db
+from utils.observability import MANAGED_FILES_DELETED_TOTAL
 from utils.responses import logger
 
 UPLOAD_NAME_RE = re.compile(r"^[a-f0-9]{32}(?:\.[a-z0-9]{1,12})?$")
@@ -74,63 +96,171 @@ def _configured_path(key: str, fallback: Path) -> Path:
     return Path(fallback)
 
 
-def _database_references(url_path: str) -> bool:
-    if not has_app_context():
-        # Without a database context, deletion cannot be proven safe.
-        return True
-    from utils.auth import UserChatHistory
+def count_managed_references(messages: Iterable[Any]) -> Counter[tuple[str, str]]:
+    """References of each message to each managed file, summed over ``messages``."""
+    counts: Counter[tuple[str, str]] = Counter()
+    for message in messages or []:
+        for kind, filenames in collect_managed_references(message).items():
+            counts.update((kind, filename) for filename in filenames)
+    return counts
 
-    return bool(
-        UserChatHistory.query.filter(UserChatHistory.messages_data.contains(url_path)).first()
-    )
+
+def references_from_counts(counts: Counter[tuple[str, str]]) -> ManagedReferences:
+    references = _empty_references()
+    for kind, filename in counts:
+        references.setdefault(kind, set()).add(filename)
+    return references
 
 
-def _guest_file_references(
-    kind: str,
-    filename: str,
-    *,
-    chats_folder: Path,
+def _adjust_ref_count(kind: str, filename: str, delta: int) -> None:
+    row = ManagedFile.query.filter_by(kind=kind, filename=filename)
+    if delta > 0:
+        values = {"ref_count": ManagedFile.ref_count + delta, "released_at": None}
+    else:
+        released = ManagedFile.ref_count <= -delta
+        values = {
+            "ref_count": case((released, 0), else_=ManagedFile.ref_count + delta),
+            "released_at": case((released, datetime.utcnow()), else_=ManagedFile.released_at),
+        }
+    if row.update(values, synchronize_session=False):
+        return
+    try:
+        # A savepoint keeps a concurrent first reference from failing the chat write.
+        with db.session.begin_nested():
+            db.session.add(
+                ManagedFile(
+                    kind=kind,
+                    filename=filename,
+                    ref_count=max(0, delta),
+                    released_at=None if delta > 0 else datetime.utcnow(),
+                )
+            )
+    except IntegrityError:
+        row.update(values, synchronize_session=False)
+
+
+def retain_managed_files(counts: Counter[tuple[str, str]]) -> None:
+    """Count new references in the current transaction."""
+    for (kind, filename), count in sorted(counts.items()):
+        if count > 0:
+            _adjust_ref_count(kind, filename, count)
+
+
+def release_managed_files(counts: Counter[tuple[str, str]]) -> None:
+    """Drop references in the current transaction; files reaching zero become collectable."""
+    for (kind, filename), count in sorted(counts.items()):
+        if count > 0:
+            _adjust_ref_count(kind, filename, -count)
+
+
+def mark_managed_files_released(references: ManagedReferences) -> None:
+    """Queue files a guest session stopped referencing for the next sweep.
+
+    Guest references live in another database, so they only stamp files that no
+    signed-in chat counts; the sweep re-checks the guest store before deleting.
+    """
+    for kind, filenames in references.items():
+        for filename in sorted(filenames):
+            _adjust_ref_count(kind, filename, 0)
+    db.session.commit()
+
+
+def _managed_roots() -> dict[str, Path]:
+    return {
+        "uploads": _configured_path("UPLOAD_FOLDER", UPLOAD_FOLDER),
+        "generated_images": _configured_path("CREATE_IMAGE_FOLDER", CREATE_IMAGE_FOLDER),
+    }
+
+
+def _delete_managed_file(
+    row_id: int, kind: str, filename: str, roots: dict[str, Path], guest_store
 ) -> bool:
-    for chat_path in chats_folder.glob("*.json"):
-        try:
-            payload = json.loads(chat_path.read_text(encoding="utf-8"))
-        except (OSError, UnicodeError, json.JSONDecodeError):
-            continue
-        if filename in collect_managed_references(payload)[kind]:
+    if guest_store.references_file(kind, filename):
+        # A guest session still uses it; its deletion will release the file again.
+        ManagedFile.query.filter_by(id=row_id, ref_count=0).update(
+            {"released_at": None}, synchronize_session=False
+        )
+        db.session.commit()
+        return False
+    # Dropping the zero-count row first means a reference added meanwhile keeps
+    # the file: it re-creates the row and the delete below matches nothing.
+    deleted = ManagedFile.query.filter_by(id=row_id, ref_count=0).delete(synchronize_session=False)
+    db.session.commit()
+    if not deleted or kind not in roots:
+        return False
+    root = roots[kind].resolve()
+    target = (root / filename).resolve()
+    if target.parent != root:
+        return False
+    try:
+        if target.is_file():
+            if kind == "uploads":
+                remove_stored_upload(target)
+            else:
+                target.unlink()
+            MANAGED_FILES_DELETED_TOTAL.labels(kind=kind).inc()
             return True
+    except OSError:
+        logger.warning("Could not remove an unreferenced chat asset", exc_info=True)
     return False
 
 
+def sweep_managed_files(
+    *,
+    grace_seconds: int = ATTACHMENT_GC_GRACE_SECONDS,
+    batch_size: int = ATTACHMENT_GC_BATCH_SIZE,
+    chats_folder: Path | None = None,
+) -> dict[str, int]:
+    """Delete one batch of files unreferenced for longer than ``grace_seconds``."""
+    from services.guest_chat_store import get_guest_chat_store
+
+    cutoff = datetime.utcnow() - timedelta(seconds=max(0, grace_seconds))
+    rows = (
+        db.session.query(ManagedFile.id, ManagedFile.kind, ManagedFile.filename)
+        .filter(ManagedFile.ref_count == 0, ManagedFile.released_at <= cutoff)
+        .order_by(ManagedFile.released_at, ManagedFile.id)
+        .limit(max(1, batch_size))
+        .all()
+    )
+    roots = _managed_roots()
+    guest_store = get_guest_chat_store(
+        Path(chats_folder or _configured_path("CHATS_FOLDER", CHATS_FOLDER))
+    )
+    deleted = {"uploads": 0, "generated_images": 0}
+    for row_id, kind, filename in rows:
+        if _delete_managed_file(row_id, kind, filename, roots, guest_store):
+            deleted[kind] += 1
+    return {"scanned": len(rows), **deleted}
+
+
 def delete_unreferenced_managed_files(
     references: ManagedReferences,
     *,
     chats_folder: Path | None = None,
 ) -> dict[str, int]:
-    roots = {
-        "uploads": _configured_path("UPLOAD_FOLDER", UPLOAD_FOLDER),
-        "generated_images": _configured_path("CREATE_IMAGE_FOLDER", CREATE_IMAGE_FOLDER),
-    }
-    prefixes = {"uploads": "/uploads/", "generated_images": "/images/"}
-    guest_root = Path(chats_folder or _configured_path("CHATS_FOLDER", CHATS_FOLDER))
-    deleted = {"uploads": 0, "generated_images": 0}
+    """Delete ``references`` right away when nothing counts them any more.
+
+    Privacy erasure uses this instead of waiting for the grace period; the
+    callers have already released the erased chats' references.
+    """
+    from services.guest_chat_store import get_guest_chat_store
 
+    roots = _managed_roots()
+    guest_store = get_guest_chat_store(
+        Path(chats_folder or _configured_path("CHATS_FOLDER", CHATS_FOLDER))
+    )
+    deleted = {"uploads": 0, "generated_images": 0}
     for kind, filenames in references.items():
         if kind not in roots:
             continue
-        root = roots[kind].resolve()
-        for filename in filenames:
-            url_path = f"{prefixes[kind]}{filename}"
-            if _database_references(url_path) or _guest_file_references(
-                kind, filename, chats_folder=guest_root
+        for filename in sorted(filenames):
+            row = ManagedFile.query.filter_by(kind=kind, filename=filename).first()
+            if row is None:
+                row = ManagedFile(kind=kind, filename=filename, ref_count=0)
+                db.session.add(row)
+                db.session.flush()
+            if row.ref_count == 0 and _delete_managed_file(
+                row.id, kind, filename, roots, guest_store
             ):
-                continue
-            target = (root / filename).resolve()
-            if target.parent != root:
-                continue
-            try:
-                if target.is_file():
-                    target.unlink()
-                    deleted[kind] += 1
-            except OSError:
-                logger.warning("Could not remove an unreferenced chat asset", exc_info=True)
+                deleted[kind] += 1
     return deleted
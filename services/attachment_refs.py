@@ -0,0 +1,179 @@
+"""Index of the uploads referenced by signed-in users' chats.
+
+Every chat write refreshes the chat's ``attachment_ref`` rows from the ``file``
+and ``image`` attachments of its messages, and ``is_public`` follows the chat's
+share. Authorizing ``/uploads/<name>`` is then one indexed lookup by file name
+instead of a substring scan over every chat; granted decisions are reused per
+user for ``UPLOAD_ACCESS_CACHE_SECONDS``. Unsharing or deleting chats clears the
+cache of the worker that did it; other workers may keep serving a revoked grant
+until their entry expires.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import case, or_
+
+from config import UPLOAD_ACCESS_CACHE_SECONDS
+from services.attachment_lifecycle import UPLOAD_NAME_RE
+from utils.auth import AttachmentRef, ChatShare, UserChatHistory, db
+
+UPLOAD_URL_PREFIX = "/uploads/"
+UPLOAD_ACCESS_CACHE_MAX_ENTRIES = 4096
+
+
+@dataclass(frozen=True)
+class UploadAccess:
+    access: str
+    original_name: str | None
+
+
+_access_cache: dict[tuple[int | None, str], tuple[float, UploadAccess]] = {}
+_access_cache_lock = threading.Lock()
+
+
+def _upload_filename(attachment: dict[str, Any]) -> str | None:
+    url_path = attachment.get("url_path")
+    if not isinstance(url_path, str) or not url_path.startswith(UPLOAD_URL_PREFIX):
+        return None
+    filename = url_path.removeprefix(UPLOAD_URL_PREFIX)
+    return filename if UPLOAD_NAME_RE.fullmatch(filename) else None
+
+
+def message_uploads(message: Any) -> dict[str, dict[str, Any]]:
+    """``/uploads/`` attachments anywhere in ``message``, keyed by file name."""
+    found: dict[str, dict[str, Any]] = {}
+
+    def visit(value: Any) -> None:
+        if isinstance(value, list):
+            for item in value:
+                visit(item)
+            return
+        if not isinstance(value, dict):
+            return
+        for attachment_key in ("file", "image"):
+            attachment = value.get(attachment_key)
+            if isinstance(attachment, dict):
+                filename = _upload_filename(attachment)
+                if filename and filename not in found:
+                    found[filename] = attachment
+        for item in value.values():
+            visit(item)
+
+    visit(message)
+    return found
+
+
+def _chat_is_public(chat: UserChatHistory) -> bool:
+    return (
+        db.session.query(ChatShare.id)
+        .filter_by(user_id=chat.user_id, session_id=chat.session_id, is_public=True)
+        .first()
+        is not None
+    )
+
+
+def _text_or_none(value: Any, limit: int) -> str | None:
+    text = str(value or "").strip()
+    return text[:limit] or None
+
+
+def index_chat_attachments(chat: UserChatHistory, messages: list[Any] | None = None) -> None:
+    """Sync ``chat``'s attachment refs with every node of its graph, in the current transaction."""
+    if messages is None:
+        messages = chat.get_messages()
+    wanted: dict[tuple[str, str], dict[str, Any]] = {}
+    for message in messages:
+        if not isinstance(message, dict) or not message.get("id"):
+            continue
+        message_id = str(message["id"])
+        for filename, attachment in message_uploads(message).items():
+            wanted[(message_id, filename)] = attachment
+
+    existing = {(ref.message_id, ref.filename): ref for ref in chat.attachment_refs}
+    for key, ref in existing.items():
+        if key not in wanted:
+            chat.attachment_refs.remove(ref)
+    is_public = None
+    for (message_id, filename), attachment in wanted.items():
+        if (message_id, filename) in existing:
+            continue
+        if is_public is None:
+            is_public = _chat_is_public(chat)
+        chat.attachment_refs.append(
+            AttachmentRef(
+                filename=filename,
+                user_id=chat.user_id,
+                session_id=chat.session_id,
+                message_id=message_id,
+                original_name=_text_or_none(attachment.get("original_name"), 255),
+                mime_type=_text_or_none(attachment.get("mime_type"), 128),
+                is_public=is_public,
+            )
+        )
+
+
+def set_chat_attachments_public(chat_id: int, is_public: bool) -> None:
+    AttachmentRef.query.filter_by(chat_id=chat_id).update(
+        {"is_public": bool(is_public)}, synchronize_session=False
+    )
+    if not is_public:
+        clear_upload_access_cache()
+
+
+def clear_upload_access_cache() -> None:
+    with _access_cache_lock:
+        _access_cache.clear()
+
+
+def _cached_access(key: tuple[int | None, str]) -> UploadAccess | None:
+    with _access_cache_lock:
+        entry = _access_cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del _access_cache[key]
+            return None
+        return entry[1]
+
+
+def _remember_access(key: tuple[int | None, str], access: UploadAccess) -> None:
+    with _access_cache_lock:
+        if len(_access_cache) >= UPLOAD_ACCESS_CACHE_MAX_ENTRIES:
+            _access_cache.clear()
+        _access_cache[key] = (time.monotonic() + UPLOAD_ACCESS_CACHE_SECONDS, access)
+
+
+def uploaded_file_access(filename: str, user_id: int | None) -> UploadAccess | None:
+    """Whether ``user_id`` (or anyone, through a public share) may read an upload.
+
+    Only grants are cached, so a file becomes readable as soon as the chat
+    write that references it commits.
+    """
+    key = (user_id, filename)
+    if UPLOAD_ACCESS_CACHE_SECONDS and (cached := _cached_access(key)):
+        return cached
+
+    query = db.session.query(AttachmentRef.user_id, AttachmentRef.original_name).filter(
+        AttachmentRef.filename == filename
+    )
+    if user_id is None:
+        query = query.filter(AttachmentRef.is_public.is_(True))
+    else:
+        query = query.filter(
+            or_(AttachmentRef.user_id == user_id, AttachmentRef.is_public.is_(True))
+        ).order_by(case((AttachmentRef.user_id == user_id, 0), else_=1))
+    row = query.first()
+    if row is None:
+        return None
+    access = UploadAccess(
+        access="owner" if user_id is not None and row.user_id == user_id else "public",
+        original_name=row.original_name,
+    )
+    if UPLOAD_ACCESS_CACHE_SECONDS:
+        _remember_access(key, access)
+    return access
@@ -0,0 +1,121 @@
+"""Coalescing of ``/chat`` SSE payloads into fewer frames.
+
+Fast models deliver an answer as thousands of small chunks; framing each one costs a
+JSON encode and a socket write. ``ChatFrameCoalescer`` merges consecutive
+``reply_part`` texts, and consecutive ``thinking_update`` deltas of the same block,
+into one frame. A merged run goes out once ``max_bytes`` of text is pending or
+``interval_ms`` have passed since the previous frame. Any other payload first
+flushes the pending run, so events keep their order.
+
+There is no timer: the window is checked when the next payload arrives, which makes
+the first chunk after a quiet period go out at once. A run held in the window waits
+at most until the provider's next chunk or the end of the answer. ``interval_ms=0``
+disables coalescing.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True)
+class FlushPolicy:
+    interval_ms: int = 30
+    max_bytes: int = 4096
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval_ms > 0
+
+
+class ChatFrameCoalescer:
+    def __init__(
+        self,
+        encode: Callable[[dict[str, Any]], str],
+        policy: FlushPolicy,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._encode = encode
+        self._policy = policy
+        self._clock = clock
+        self._interval = policy.interval_ms / 1000
+        self._pending: dict[str, Any] | None = None
+        self._pending_parts: list[str] = []
+        self._pending_bytes = 0
+        self._last_flush = float("-inf")
+
+    def push(self, payload: dict[str, Any]) -> Iterator[str]:
+        """Frames that are due after ``payload``; may be none while a run is held."""
+        if not self._policy.enabled:
+            yield self._encode(payload)
+            return
+        delta = self._mergeable_delta(payload)
+        if delta is None:
+            yield from self.flush()
+            self._last_flush = self._clock()
+            yield self._encode(payload)
+            return
+        if self._pending is not None and not self._continues_run(payload):
+            yield from self.flush()
+        now = self._clock()
+        if self._pending is None and now - self._last_flush >= self._interval:
+            # Slow stream or first chunk after a pause: nothing to merge with.
+            self._last_flush = now
+            yield self._encode(payload)
+            return
+        if self._pending is None:
+            self._pending = payload
+        elif "thinking_update" in payload:
+            # Later updates of a block carry its final status and close time.
+            self._pending = {
+                "thinking_update": {
+                    **self._pending["thinking_update"],
+                    **payload["thinking_update"],
+                }
+            }
+        self._pending_parts.append(delta)
+        self._pending_bytes += len(delta.encode("utf-8"))
+        if (
+            self._pending_bytes >= self._policy.max_bytes
+            or now - self._last_flush >= self._interval
+        ):
+            yield from self.flush()
+
+    def flush(self) -> Iterator[str]:
+        if self._pending is None:
+            return
+        payload, text = self._pending, "".join(self._pending_parts)
+        self._pending, self._pending_parts, self._pending_bytes = None, [], 0
+        self._last_flush = self._clock()
+        if "reply_part" in payload:
+            yield self._encode({"reply_part": text})
+        else:
+            yield self._encode(
+                {"thinking_update": {**payload["thinking_update"], "contentDelta": text}}
+            )
+
+    @staticmethod
+    def _mergeable_delta(payload: dict[str, Any]) -> str | None:
+        if len(payload) != 1:
+            return None
+        if isinstance(payload.get("reply_part"), str):
+            return payload["reply_part"]
+        update = payload.get("thinking_update")
+        if isinstance(update, dict) and update.get("id"):
+            delta = update.get("contentDelta")
+            return delta if isinstance(delta, str) else ""
+        return None
+
+    def _continues_run(self, payload: dict[str, Any]) -> bool:
+        pending = self._pending or {}
+        if "reply_part" in payload:
+            return "reply_part" in pending
+        return (
+            "thinking_update" in pending
+            and pending["thinking_update"].get("id") == payload["thinking_update"].get("id")
+            and pending["thinking_update"].get("status") != "complete"
+        )
@@ -0,0 +1,51 @@
+"""Hand streamed ``/chat`` turns to the Celery worker pool.
+
+With ``CHAT_GENERATION_MODE=worker`` the web request validates the turn, opens its
+chat stream journal and enqueues a ``chat.generate`` job. A worker runs the model,
+persists the answer and appends every SSE event to the shared journal, which the
+request - or a resume on any other node - relays. Generation therefore outlives web
+worker restarts and deploys, and web nodes scale apart from generation capacity.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any
+
+from config import CELERY_BROKER_URL, CHAT_GENERATION_QUEUE, CHAT_STREAM_TTL_SECONDS
+from utils.responses import logger
+
+CHAT_GENERATION_TASK = "chat.generate"
+
+_client = None
+_client_guard = threading.Lock()
+
+
+def _celery_client():
+    global _client
+    if _client is None:
+        with _client_guard:
+            if _client is None:
+                from celery import Celery
+
+                # Publish-only client: jobs report through the chat stream journal,
+                # so no result backend is involved.
+                _client = Celery("remind", broker=CELERY_BROKER_URL)
+    return _client
+
+
+def enqueue_chat_generation(job: dict[str, Any]) -> bool:
+    """Queue ``job`` for a worker; ``False`` when the broker does not accept it."""
+    try:
+        _celery_client().send_task(
+            CHAT_GENERATION_TASK,
+            args=[job],
+            queue=CHAT_GENERATION_QUEUE,
+            # A job nobody picked up before its journal expired has no reader left.
+            expires=CHAT_STREAM_TTL_SECONDS,
+            retry=False,
+        )
+    except Exception:
+        logger.warning("Chat generation job could not be enqueued", exc_info=True)
+        return False
+    return True
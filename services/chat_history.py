@@ -1,19 +1,19 @@
 import base64
 import hashlib
 import hmac
-import json
-import os
 import re
-import threading
 import time
 import uuid
-import weakref
+from collections.abc import Sequence
 from datetime import datetime
 from typing import Any, Optional
 from urllib.parse import urlparse
 
 from flask import has_request_context, request, session
+from sqlalchemy import and_, or_
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
 from werkzeug.utils import secure_filename
 
 from config import (
@@ -21,15 +21,26 @@ from config import (
     ALLOWED_HOSTS,
     BACKEND_URL,
     CHAT_MAX_VARIANTS_PER_TURN,
-    CHATS_FOLDER,
+    CHAT_WRITE_MAX_ATTEMPTS,
     SECRET_KEY,
 )
+from services.attachment_lifecycle import count_managed_references, retain_managed_files
+from services.attachment_refs import index_chat_attachments
 from services.canvas_tools import normalize_canvas_textdoc
-from utils.auth import ChatShare, UserChatHistory, db
+from services.chat_search import index_chat
+from services.guest_chat_store import get_guest_chat_store
+from services.session_locks import current_fencing_token, session_lock
+from utils import json_codec
+from utils.auth import ChatMessage, ChatShare, UserChatHistory, db
+from utils.observability import (
+    CHAT_WRITE_CONFLICTS_TOTAL,
+    CHAT_WRITE_EXHAUSTED_TOTAL,
+    observe_chat_write,
+)
 from utils.responses import logger
 
-SESSION_LOCKS: weakref.WeakValueDictionary[str, threading.Lock] = weakref.WeakValueDictionary()
-SESSION_LOCKS_GUARD = threading.Lock()
+MESSAGE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,120}$")
+SESSION_PREVIEW_CHARS = 60
 
 
 def _is_allowed_hostname(hostname: Optional[str]) -> bool:
@@ -65,43 +76,30 @@ def _get_public_base_url() -> str:
     return ""
 
 
-def _acquire_session_lock(safe_session_id: str) -> threading.Lock:
-    with SESSION_LOCKS_GUARD:
-        lock = SESSION_LOCKS.get(safe_session_id)
-        if lock is None:
-            lock = threading.Lock()
-            SESSION_LOCKS[safe_session_id] = lock
-        return lock
+def _acquire_session_lock(safe_session_id: str):
+    return session_lock(safe_session_id)
 
 
 def read_chat_file(safe_session_id: str) -> dict:
-    chat_file_path = CHATS_FOLDER / f"{safe_session_id}.json"
-    if not chat_file_path.exists():
-        return {}
-
     try:
-        with open(chat_file_path, "r", encoding="utf-8") as file_obj:
-            return json.load(file_obj)
+        return get_guest_chat_store().read(safe_session_id)
     except Exception:
+        logger.warning("Could not read a guest chat", exc_info=True)
         return {}
 
 
 def chat_file_exists(session_id: str) -> bool:
     safe_session_id = secure_filename(str(session_id))
-    return bool(safe_session_id and (CHATS_FOLDER / f"{safe_session_id}.json").is_file())
+    return bool(safe_session_id and get_guest_chat_store().exists(safe_session_id))
 
 
 def delete_guest_chat_file(session_id: str) -> bool:
     safe_session_id = secure_filename(str(session_id))
     if not safe_session_id:
         return False
-    path = CHATS_FOLDER / f"{safe_session_id}.json"
     lock = _acquire_session_lock(safe_session_id)
     with lock:
-        if not path.exists():
-            return False
-        path.unlink()
-        return True
+        return get_guest_chat_store().delete(safe_session_id)
 
 
 def _generate_guest_session_token(session_id: str, timestamp: int) -> str:
@@ -190,26 +188,31 @@ def resolve_session_identifier(session_identifier: str):
     return resolved_session_id, share_entry
 
 
+def public_history(history: list[dict]) -> list[dict]:
+    """History as shown to viewers of a public share: no branch or delivery metadata."""
+    hidden_fields = {
+        "variants",
+        "current_variant_index",
+        "parent_id",
+        "is_active",
+        "request_id",
+        "delivery_status",
+    }
+    return [
+        {key: value for key, value in message.items() if key not in hidden_fields}
+        for message in history
+    ]
+
+
 def build_share_url(public_id: str) -> str:
     base = _get_public_base_url()
     return f"{base}/c/{public_id}" if base else f"/c/{public_id}"
 
 
 def write_chat_file(safe_session_id: str, data: dict) -> None:
-    CHATS_FOLDER.mkdir(parents=True, exist_ok=True)
-    chat_file_path = CHATS_FOLDER / f"{safe_session_id}.json"
-    tmp_path = CHATS_FOLDER / f"{safe_session_id}.json.tmp"
-
-    try:
-        with open(tmp_path, "w", encoding="utf-8") as file_obj:
-            json.dump(data, file_obj, ensure_ascii=False, indent=2)
-        os.replace(str(tmp_path), str(chat_file_path))
-    finally:
-        if tmp_path.exists():
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
+    get_guest_chat_store().write(
+        safe_session_id, data, fence=current_fencing_token(safe_session_id)
+    )
 
 
 def replace_canvas_textdoc_in_messages(messages: list, value: Any) -> tuple[list, dict | None]:
@@ -296,36 +299,42 @@ def save_canvas_textdoc_to_history(
     lock = _acquire_session_lock(safe_session_id)
     with lock:
         if user_id is not None:
-            for _attempt in range(3):
+            for attempt in range(1, CHAT_WRITE_MAX_ATTEMPTS + 1):
                 chat = UserChatHistory.query.filter_by(
                     user_id=user_id, session_id=session_id
                 ).first()
                 if not chat:
                     return None
-                previous_messages_data = chat.messages_data
-                messages, textdoc = replace_canvas_textdoc_in_messages(chat.get_messages(), value)
+                graph, rows_by_id = _load_persisted_graph(chat)
+                messages, textdoc = replace_canvas_textdoc_in_messages(graph.nodes, value)
                 if not textdoc:
                     return None
-                updated = (
-                    UserChatHistory.query.filter_by(id=chat.id)
-                    .filter(UserChatHistory.messages_data == previous_messages_data)
-                    .update(
-                        {
-                            "messages_data": json.dumps(messages, ensure_ascii=False),
-                            "updated_at": datetime.utcnow(),
-                        },
-                        synchronize_session=False,
-                    )
-                )
-                if updated != 1:
+                values = {
+                    "updated_at": datetime.utcnow(),
+                    "active_path_data": _active_path_json(graph),
+                }
+                if not _claim_chat_write(chat, values, "canvas"):
                     db.session.rollback()
                     continue
                 try:
+                    _sync_chat_rows(
+                        chat,
+                        rows_by_id,
+                        messages,
+                        revision=(chat.revision or 0) + 1,
+                        changed_ids={
+                            str(message.get("id"))
+                            for message, previous in zip(messages, graph, strict=True)
+                            if message is not previous
+                        },
+                    )
                     db.session.commit()
                 except Exception:
                     db.session.rollback()
                     raise
+                observe_chat_write("canvas", attempt)
                 return textdoc
+            CHAT_WRITE_EXHAUSTED_TOTAL.labels(operation="canvas").inc()
             raise RuntimeError("chat_concurrent_update")
 
         if not guest_file:
@@ -399,57 +408,156 @@ def normalize_message(msg: Any) -> dict:
         }
 
 
-def ensure_conversation_graph(messages: list[Any]) -> list[dict]:
-    raw_messages = []
-    for index, message in enumerate(messages):
-        if not isinstance(message, dict):
-            continue
-        candidate = dict(message)
-        if not candidate.get("id"):
-            fingerprint = hashlib.sha256(
-                f"{index}:{_message_signature(candidate)}".encode("utf-8")
-            ).hexdigest()[:20]
-            candidate["id"] = f"legacy_{fingerprint}"
-        raw_messages.append(candidate)
-    graph_already_present = any("parent_id" in message for message in raw_messages)
-    normalized = [normalize_message(message) for message in raw_messages]
-    if not normalized:
-        return []
+class ConversationGraph(Sequence):
+    """Normalized conversation nodes indexed by id and by parent.
+
+    Built once per load. Branch operations go through the indexes, so sibling
+    lookups, variant switches and active-path walks never rescan every node.
+    """
+
+    def __init__(self, nodes: list[dict]) -> None:
+        self.nodes = nodes
+        self.by_id: dict[str, dict] = {}
+        self.children: dict[str | None, list[dict]] = {}
+        for node in nodes:
+            self.by_id[node["id"]] = node
+            self.children.setdefault(node.get("parent_id"), []).append(node)
+        self._active_path: list[tuple[dict, int]] | None = None
+
+    @classmethod
+    def from_messages(cls, messages: Any) -> "ConversationGraph":
+        if isinstance(messages, cls):
+            return messages
+        raw_messages = []
+        for index, message in enumerate(messages or []):
+            if not isinstance(message, dict):
+                continue
+            candidate = dict(message)
+            if not candidate.get("id"):
+                fingerprint = hashlib.sha256(
+                    f"{index}:{_message_signature(candidate)}".encode("utf-8")
+                ).hexdigest()[:20]
+                candidate["id"] = f"legacy_{fingerprint}"
+            raw_messages.append(candidate)
+        graph_already_present = any("parent_id" in message for message in raw_messages)
+        normalized = [normalize_message(message) for message in raw_messages]
+
+        if graph_already_present:
+            valid_ids = {message["id"] for message in normalized}
+            for message in normalized:
+                parent_id = message.get("parent_id")
+                if parent_id is not None and parent_id not in valid_ids:
+                    message["parent_id"] = None
+        else:
+            previous: dict | None = None
+            for message in normalized:
+                if previous is None:
+                    message["parent_id"] = None
+                elif message.get("role") == previous.get("role"):
+                    message["parent_id"] = previous.get("parent_id")
+                    previous["is_active"] = False
+                else:
+                    message["parent_id"] = previous.get("id")
+                message["is_active"] = True
+                previous = message
 
-    if graph_already_present:
-        valid_ids = {message["id"] for message in normalized}
-        for message in normalized:
-            parent_id = message.get("parent_id")
-            if parent_id is not None and parent_id not in valid_ids:
-                message["parent_id"] = None
-        _ensure_single_active_sibling(normalized)
-        return normalized
+        graph = cls(normalized)
+        graph.ensure_single_active_sibling()
+        return graph
 
-    previous: dict | None = None
-    for message in normalized:
-        if previous is None:
-            message["parent_id"] = None
-        elif message.get("role") == previous.get("role"):
-            message["parent_id"] = previous.get("parent_id")
-            previous["is_active"] = False
-        else:
-            message["parent_id"] = previous.get("id")
-        message["is_active"] = True
-        previous = message
+    def __getitem__(self, index):
+        return self.nodes[index]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def get(self, message_id: str | None) -> dict | None:
+        return self.by_id.get(message_id) if message_id is not None else None
+
+    def siblings(self, parent_id: str | None) -> list[dict]:
+        return self.children.get(parent_id, [])
+
+    def sibling_count(self, parent_id: str | None) -> int:
+        return len(self.children.get(parent_id, ()))
 
-    _ensure_single_active_sibling(normalized)
-    return normalized
+    @staticmethod
+    def _active_index(siblings: list[dict]) -> int:
+        for index in range(len(siblings) - 1, -1, -1):
+            if siblings[index].get("is_active"):
+                return index
+        return len(siblings) - 1
 
+    def ensure_single_active_sibling(self) -> None:
+        for siblings in self.children.values():
+            selected = siblings[self._active_index(siblings)]
+            for message in siblings:
+                message["is_active"] = message is selected
+        self._active_path = None
 
-def _ensure_single_active_sibling(messages: list[dict]) -> None:
-    sibling_groups: dict[str | None, list[dict]] = {}
-    for message in messages:
-        sibling_groups.setdefault(message.get("parent_id"), []).append(message)
-    for siblings in sibling_groups.values():
-        active = [message for message in siblings if message.get("is_active")]
-        selected = active[-1] if active else siblings[-1]
-        for message in siblings:
-            message["is_active"] = message is selected
+    def deactivate_siblings(self, parent_id: str | None) -> None:
+        for message in self.children.get(parent_id, ()):
+            message["is_active"] = False
+        self._active_path = None
+
+    def activate_ancestry(self, message_id: str | None) -> None:
+        current = self.get(message_id)
+        visited: set[str] = set()
+        while current and current.get("id") not in visited:
+            visited.add(str(current.get("id")))
+            parent_id = current.get("parent_id")
+            self.deactivate_siblings(parent_id)
+            current["is_active"] = True
+            current = self.get(parent_id)
+
+    def append(self, node: dict) -> None:
+        self.nodes.append(node)
+        self.by_id[node["id"]] = node
+        self.children.setdefault(node.get("parent_id"), []).append(node)
+        self._active_path = None
+
+    def active_path(self) -> list[tuple[dict, int]]:
+        """Active nodes from the root with each node's index among its siblings."""
+        if self._active_path is None:
+            path: list[tuple[dict, int]] = []
+            parent_id: str | None = None
+            visited: set[str] = set()
+            while parent_id in self.children:
+                siblings = self.children[parent_id]
+                current_index = self._active_index(siblings)
+                selected = siblings[current_index]
+                message_id = str(selected.get("id") or "")
+                if not message_id or message_id in visited:
+                    break
+                visited.add(message_id)
+                path.append((selected, current_index))
+                parent_id = message_id
+            self._active_path = path
+        return self._active_path
+
+    def active_path_index(self) -> list[list]:
+        return [
+            [selected["id"], current_index, len(self.children[selected.get("parent_id")])]
+            for selected, current_index in self.active_path()
+        ]
+
+    def active_leaf_id(self) -> str | None:
+        path = self.active_path()
+        return path[-1][0]["id"] if path else None
+
+    def materialize(self) -> list[dict]:
+        history: list[dict] = []
+        for selected, current_index in self.active_path():
+            materialized = dict(selected)
+            siblings = self.children[selected.get("parent_id")]
+            if len(siblings) > 1:
+                materialized["variants"] = [_variant_payload(sibling) for sibling in siblings]
+                materialized["current_variant_index"] = current_index
+            history.append(materialized)
+        return history
+
+
+def ensure_conversation_graph(messages: list[Any]) -> list[dict]:
+    return ConversationGraph.from_messages(messages).nodes
 
 
 def _variant_payload(message: dict) -> dict:
@@ -461,49 +569,13 @@ def _variant_payload(message: dict) -> dict:
 
 
 def materialize_conversation_history(messages: list[Any]) -> list[dict]:
-    graph = ensure_conversation_graph(messages)
-    if not graph:
-        return []
-
-    sibling_groups: dict[str | None, list[dict]] = {}
-    for message in graph:
-        sibling_groups.setdefault(message.get("parent_id"), []).append(message)
-
-    history: list[dict] = []
-    parent_id: str | None = None
-    visited: set[str] = set()
-    while parent_id in sibling_groups:
-        siblings = sibling_groups[parent_id]
-        current_index = next(
-            (
-                index
-                for index in range(len(siblings) - 1, -1, -1)
-                if siblings[index].get("is_active")
-            ),
-            len(siblings) - 1,
-        )
-        selected = siblings[current_index]
-        message_id = str(selected.get("id") or "")
-        if not message_id or message_id in visited:
-            break
-        visited.add(message_id)
-        materialized = dict(selected)
-        if len(siblings) > 1:
-            materialized["variants"] = [_variant_payload(sibling) for sibling in siblings]
-            materialized["current_variant_index"] = current_index
-        history.append(materialized)
-        parent_id = message_id
-    return history
-
-
-def _active_path_graph(messages: list[Any]) -> list[dict]:
-    return [dict(message) for message in materialize_conversation_history(messages)]
+    return ConversationGraph.from_messages(messages).materialize()
 
 
 def conversation_context_for_operation(
     messages: list[Any], operation: str, target_message_id: str | None
 ) -> tuple[list[dict], str | None]:
-    path = _active_path_graph(messages)
+    path = materialize_conversation_history(messages)
     if operation == "send":
         return [normalize_message(message) for message in path], path[-1]["id"] if path else None
 
@@ -548,7 +620,7 @@ def _message_signature(msg: dict) -> str:
                 elif "url_path" in part:
                     pieces.append(str(part.get("url_path")))
                 else:
-                    pieces.append(json.dumps(part, sort_keys=True, ensure_ascii=False))
+                    pieces.append(json_codec.dumps(part, sort_keys=True))
             else:
                 pieces.append(str(part))
 
@@ -611,56 +683,342 @@ def load_chat_history(
     allow_file_fallback: bool = False,
     require_guest_token: bool = False,
 ) -> list:
+    safe_session_id = secure_filename(str(session_id))
+    if not safe_session_id:
+        return []
+
+    if user_id and isinstance(user_id, int):
+        chat = UserChatHistory.query.filter_by(user_id=user_id, session_id=session_id).first()
+        if chat:
+            return materialize_chat_history(chat)
+
+    if not allow_file_fallback:
+        return []
+
+    data = read_chat_file_secure(safe_session_id, require_auth=require_guest_token)
     return materialize_conversation_history(
-        load_chat_graph(
-            session_id,
-            user_id,
-            allow_file_fallback=allow_file_fallback,
-            require_guest_token=require_guest_token,
+        data.get("history", []) if isinstance(data, dict) else []
+    )
+
+
+def _active_path_filter(chat: UserChatHistory, path: list[tuple[str, int, int]], start: int = 0):
+    # Path nodes from ``start`` on plus every sibling of their branched turns.
+    path_ids = [message_id for message_id, _index, _count in path]
+    branched_parents = {
+        path_ids[position - 1] if position else None
+        for position in range(start, len(path))
+        if path[position][2] > 1
+    }
+    conditions = [ChatMessage.message_id.in_(path_ids[start:])]
+    parent_ids = [parent_id for parent_id in branched_parents if parent_id is not None]
+    if parent_ids:
+        conditions.append(ChatMessage.parent_id.in_(parent_ids))
+    if None in branched_parents:
+        conditions.append(ChatMessage.parent_id.is_(None))
+    return (
+        set(path_ids[start:]),
+        branched_parents,
+        and_(ChatMessage.chat_id == chat.id, or_(*conditions)),
+    )
+
+
+def _active_path_rows(
+    chat: UserChatHistory, path: list[tuple[str, int, int]], start: int = 0
+) -> list[ChatMessage]:
+    wanted, branched_parents, condition = _active_path_filter(chat, path, start)
+    if "message_rows" not in sa_inspect(chat).unloaded:
+        return [
+            row
+            for row in chat.message_rows
+            if row.message_id in wanted or row.parent_id in branched_parents
+        ]
+    return ChatMessage.query.filter(condition).order_by(ChatMessage.position).all()
+
+
+def materialize_chat_history(chat: UserChatHistory, start: int = 0) -> list[dict]:
+    """Active branch of a stored chat, read through its persisted active path.
+
+    Only the path nodes and the siblings of branched turns are fetched. Chats
+    without a usable path fall back to walking the full graph. ``start`` skips
+    the first path entries without decoding them.
+    """
+    path = chat.get_active_path()
+    if path is None or chat.id is None:
+        return _load_persisted_graph(chat)[0].materialize()[start:]
+    if len(path) <= start:
+        return []
+
+    nodes: dict[str, dict] = {}
+    children: dict[str | None, list[dict]] = {}
+    for row in _active_path_rows(chat, path, start):
+        node = normalize_message(row.to_message())
+        nodes[row.message_id] = node
+        children.setdefault(node.get("parent_id"), []).append(node)
+
+    history: list[dict] = []
+    for message_id, current_index, variant_count in path[start:]:
+        node = nodes.get(message_id)
+        if node is None:
+            return _load_persisted_graph(chat)[0].materialize()[start:]
+        materialized = dict(node)
+        if variant_count > 1:
+            siblings = children.get(node.get("parent_id"), [])
+            if len(siblings) != variant_count or siblings[current_index] is not node:
+                return _load_persisted_graph(chat)[0].materialize()[start:]
+            materialized["variants"] = [_variant_payload(sibling) for sibling in siblings]
+            materialized["current_variant_index"] = current_index
+        history.append(materialized)
+    return history
+
+
+def parse_history_since(value: Any) -> int | str | None:
+    """Validate a ``since`` cursor: a chat revision or a message id."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+        return value
+    if isinstance(value, str):
+        if value.isdigit() and len(value) <= 18:
+            return int(value)
+        if MESSAGE_ID_RE.fullmatch(value):
+            return value
+    raise ValueError("invalid_history_since")
+
+
+def chat_history_delta(chat: UserChatHistory, since: int | str) -> dict:
+    """Changes to the active branch after ``since``.
+
+    The client keeps its first ``offset`` entries, drops anything past ``length``
+    and replaces the rest with ``messages``. A turn counts as changed when its
+    node or any sibling variant was written after the cursor revision, which
+    covers new messages, regenerations, payload updates and variant switches.
+    A message-id cursor also returns every entry after that message.
+    """
+    revision = chat.revision or 0
+    path = chat.get_active_path()
+    if path is None:
+        path = _load_persisted_graph(chat)[0].active_path_index()
+    path_ids = [message_id for message_id, _index, _count in path]
+
+    offset = 0
+    if isinstance(since, str):
+        row_revision = (
+            db.session.query(ChatMessage.revision)
+            .filter_by(chat_id=chat.id, message_id=since)
+            .scalar()
+            if chat.id is not None
+            else None
+        )
+        since_revision = None if row_revision is None else row_revision - 1
+    else:
+        since_revision = since if since <= revision else None
+
+    if since_revision is not None and chat.id is not None:
+        _wanted, _branched, condition = _active_path_filter(chat, path)
+        changed_ids: set[str] = set()
+        changed_parents: set[str | None] = set()
+        for message_id, parent_id in db.session.query(
+            ChatMessage.message_id, ChatMessage.parent_id
+        ).filter(condition, ChatMessage.revision > since_revision):
+            changed_ids.add(message_id)
+            changed_parents.add(parent_id)
+        offset = next(
+            (
+                position
+                for position, (message_id, _index, count) in enumerate(path)
+                if message_id in changed_ids
+                or (count > 1 and (path_ids[position - 1] if position else None) in changed_parents)
+            ),
+            len(path),
         )
+        if isinstance(since, str):
+            offset = min(offset, path_ids.index(since) + 1 if since in path_ids else 0)
+
+    return {
+        "revision": revision,
+        "since": since,
+        "offset": offset,
+        "length": len(path),
+        "messages": materialize_chat_history(chat, start=offset) if offset < len(path) else [],
+    }
+
+
+def session_preview(history: list) -> str:
+    if not history:
+        return ""
+    parts = history[-1].get("parts", [])
+    if parts and isinstance(parts[0], dict):
+        return str(parts[0].get("text", ""))[:SESSION_PREVIEW_CHARS]
+    return ""
+
+
+def _has_attachments(history: list) -> bool:
+    return any(
+        isinstance(part, dict)
+        and (isinstance(part.get("file"), dict) or isinstance(part.get("image"), dict))
+        for message in history
+        if isinstance(message, dict)
+        for part in message.get("parts") or []
     )
 
 
+def session_summary_values(history: list, activity_at: datetime | None) -> dict[str, Any]:
+    """Denormalized sidebar columns for a chat whose active branch is ``history``."""
+    return {
+        "last_message_preview": session_preview(history),
+        "message_count": len(history),
+        "last_activity_at": activity_at,
+        "has_attachments": _has_attachments(history),
+    }
+
+
+def ensure_session_summaries(chats: list[UserChatHistory]) -> None:
+    """Compute the summary columns of chats written before they existed, once."""
+    missing = [chat for chat in chats if chat.message_count is None]
+    for chat in missing:
+        values = session_summary_values(
+            materialize_chat_history(chat), chat.updated_at or chat.created_at
+        )
+        # Pinned updated_at: filling in a cache must not reorder the session list.
+        UserChatHistory.query.filter_by(id=chat.id).update(
+            {
+                **{getattr(UserChatHistory, key): value for key, value in values.items()},
+                UserChatHistory.updated_at: UserChatHistory.updated_at,
+            },
+            synchronize_session=False,
+        )
+        for key, value in values.items():
+            set_committed_value(chat, key, value)
+    if missing:
+        db.session.commit()
+
+
 def load_chat_graph(
     session_id: str,
     user_id: int | None = None,
     *,
     allow_file_fallback: bool = False,
     require_guest_token: bool = False,
-) -> list[dict]:
+) -> ConversationGraph:
     safe_session_id = secure_filename(str(session_id))
     if not safe_session_id:
-        return []
+        return ConversationGraph([])
 
     if user_id and isinstance(user_id, int):
         chat = UserChatHistory.query.filter_by(user_id=user_id, session_id=session_id).first()
         if chat:
-            return ensure_conversation_graph(chat.get_messages())
+            return _load_persisted_graph(chat)[0]
 
     if not allow_file_fallback:
-        return []
+        return ConversationGraph([])
 
     data = read_chat_file_secure(safe_session_id, require_auth=require_guest_token)
-    return ensure_conversation_graph(data.get("history", []) if isinstance(data, dict) else [])
+    return ConversationGraph.from_messages(
+        data.get("history", []) if isinstance(data, dict) else []
+    )
+
+
+def load_context_summary(session_id: str, user_id: int | None = None) -> dict | None:
+    safe_session_id = secure_filename(str(session_id))
+    if not safe_session_id:
+        return None
+    if user_id and isinstance(user_id, int):
+        raw = (
+            db.session.query(UserChatHistory.context_summary_data)
+            .filter_by(user_id=user_id, session_id=session_id)
+            .scalar()
+        )
+        try:
+            parsed = json_codec.loads(raw) if raw else None
+        except (TypeError, ValueError):
+            return None
+        return parsed if isinstance(parsed, dict) else None
+    try:
+        return get_guest_chat_store().read_summary(safe_session_id)
+    except Exception:
+        logger.warning("Could not read a guest chat summary", exc_info=True)
+        return None
+
 
+def store_context_summary(session_id: str, user_id: int | None, summary: dict) -> bool:
+    safe_session_id = secure_filename(str(session_id))
+    if not safe_session_id:
+        return False
+    if user_id and isinstance(user_id, int):
+        # Not a graph write: revision stays put and updated_at is pinned so the
+        # session does not jump to the top of the list.
+        updated = UserChatHistory.query.filter_by(user_id=user_id, session_id=session_id).update(
+            {
+                UserChatHistory.context_summary_data: json_codec.dumps(summary),
+                UserChatHistory.updated_at: UserChatHistory.updated_at,
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+        return bool(updated)
+    return get_guest_chat_store().write_summary(safe_session_id, summary)
+
+
+def _load_persisted_graph(
+    chat: UserChatHistory,
+) -> tuple[ConversationGraph, dict[str, ChatMessage]]:
+    rows = list(chat.message_rows)
+    if rows:
+        return (
+            ConversationGraph.from_messages([row.to_message() for row in rows]),
+            {row.message_id: row for row in rows},
+        )
+    return ConversationGraph.from_messages(chat.get_legacy_messages()), {}
+
+
+def _sync_chat_rows(
+    chat: UserChatHistory,
+    rows_by_id: dict[str, ChatMessage],
+    graph: list[dict],
+    *,
+    revision: int,
+    changed_ids: set[str] | frozenset[str] = frozenset(),
+) -> None:
+    # Only new nodes are inserted and only rows whose graph columns (or explicitly
+    # changed payloads) differ are updated, so a send touches a handful of rows.
+    # Touched rows are stamped with ``revision`` for incremental sync.
+    if not rows_by_id:
+        chat.set_messages(graph)
+        for row in chat.message_rows:
+            row.revision = revision
+        chat.active_path_data = _active_path_json(graph)
+        return
 
-def _deactivate_siblings(graph: list[dict], parent_id: str | None) -> None:
+    next_position = max(row.position for row in rows_by_id.values()) + 1
     for message in graph:
-        if message.get("parent_id") == parent_id:
-            message["is_active"] = False
+        message_id = str(message.get("id"))
+        row = rows_by_id.get(message_id)
+        if row is None:
+            chat.message_rows.append(
+                ChatMessage.from_message(message, position=next_position, revision=revision)
+            )
+            next_position += 1
+            continue
+        row.update_from_message(message, payload=message_id in changed_ids, revision=revision)
 
 
-def _activate_ancestry(graph: list[dict], message_id: str | None) -> None:
-    by_id = {message.get("id"): message for message in graph}
-    current = by_id.get(message_id)
-    visited: set[str] = set()
-    while current and current.get("id") not in visited:
-        current_id = str(current.get("id"))
-        visited.add(current_id)
-        parent_id = current.get("parent_id")
-        _deactivate_siblings(graph, parent_id)
-        current["is_active"] = True
-        current = by_id.get(parent_id)
+def _active_path_json(graph: ConversationGraph | list[dict]) -> str:
+    if not isinstance(graph, ConversationGraph):
+        graph = ConversationGraph(list(graph))
+    return json_codec.dumps(graph.active_path_index())
+
+
+def _claim_chat_write(chat: UserChatHistory, values: dict[str, Any], operation: str) -> bool:
+    # Compare-and-swap on the integer revision: concurrent writers serialize on
+    # the row lock and the loser rebases its operation onto the committed graph.
+    updated = UserChatHistory.query.filter_by(id=chat.id, revision=chat.revision or 0).update(
+        {**values, "revision": UserChatHistory.revision + 1},
+        synchronize_session=False,
+    )
+    if updated != 1:
+        CHAT_WRITE_CONFLICTS_TOTAL.labels(operation=operation).inc()
+        return False
+    return True
 
 
 def _apply_chat_operation(
@@ -671,41 +1029,39 @@ def _apply_chat_operation(
     parent_message_id: str | None,
     user_message: dict | None,
     model_message: dict,
-) -> list[dict]:
-    graph = ensure_conversation_graph(messages)
+) -> ConversationGraph:
+    graph = ConversationGraph.from_messages(messages)
     request_id = model_message.get("request_id")
     if request_id and any(message.get("request_id") == request_id for message in graph):
         return graph
 
-    by_id = {message.get("id"): message for message in graph}
     model_node = normalize_message(model_message)
     user_node = normalize_message(user_message) if user_message else None
     incoming_ids = [model_node.get("id")]
     if user_node:
         incoming_ids.append(user_node.get("id"))
     if len(set(incoming_ids)) != len(incoming_ids) or any(
-        message_id in by_id for message_id in incoming_ids
+        message_id in graph.by_id for message_id in incoming_ids
     ):
         raise ValueError("message_id_conflict")
 
     if operation == "send":
-        parent_id = parent_message_id if parent_message_id in by_id else None
+        parent_id = parent_message_id if parent_message_id in graph.by_id else None
         if parent_id is None:
-            active_path = materialize_conversation_history(graph)
-            parent_id = active_path[-1]["id"] if active_path else None
-        _activate_ancestry(graph, parent_id)
+            parent_id = graph.active_leaf_id()
+        graph.activate_ancestry(parent_id)
         if not user_node:
             raise ValueError("missing_user_message")
         user_node["parent_id"] = parent_id
         user_node["is_active"] = True
-        _deactivate_siblings(graph, parent_id)
+        graph.deactivate_siblings(parent_id)
         graph.append(user_node)
         model_node["parent_id"] = user_node["id"]
         model_node["is_active"] = True
         graph.append(model_node)
         return graph
 
-    target = by_id.get(target_message_id)
+    target = graph.get(target_message_id)
     if not target:
         raise ValueError("target_message_not_found")
 
@@ -713,12 +1069,10 @@ def _apply_chat_operation(
         if target.get("role") != "model":
             raise ValueError("invalid_regenerate_target")
         parent_id = target.get("parent_id")
-        if sum(1 for message in graph if message.get("parent_id") == parent_id) >= (
-            CHAT_MAX_VARIANTS_PER_TURN
-        ):
+        if graph.sibling_count(parent_id) >= CHAT_MAX_VARIANTS_PER_TURN:
             raise ValueError("chat_variant_limit_reached")
-        _activate_ancestry(graph, parent_id)
-        _deactivate_siblings(graph, parent_id)
+        graph.activate_ancestry(parent_id)
+        graph.deactivate_siblings(parent_id)
         model_node["parent_id"] = parent_id
         model_node["is_active"] = True
         graph.append(model_node)
@@ -728,12 +1082,10 @@ def _apply_chat_operation(
         if target.get("role") != "user" or not user_node:
             raise ValueError("invalid_edit_target")
         parent_id = target.get("parent_id")
-        if sum(1 for message in graph if message.get("parent_id") == parent_id) >= (
-            CHAT_MAX_VARIANTS_PER_TURN
-        ):
+        if graph.sibling_count(parent_id) >= CHAT_MAX_VARIANTS_PER_TURN:
             raise ValueError("chat_variant_limit_reached")
-        _activate_ancestry(graph, parent_id)
-        _deactivate_siblings(graph, parent_id)
+        graph.activate_ancestry(parent_id)
+        graph.deactivate_siblings(parent_id)
         user_node["parent_id"] = parent_id
         user_node["is_active"] = True
         graph.append(user_node)
@@ -764,7 +1116,7 @@ def persist_chat_operation(
 
     lock = _acquire_session_lock(safe_session_id)
     with lock:
-        result_graph: list[dict] = []
+        result_graph: ConversationGraph | list[dict] = []
         if allow_guest_file_persistence:
             current_data = read_chat_file(safe_session_id)
             file_graph = _apply_chat_operation(
@@ -781,7 +1133,7 @@ def persist_chat_operation(
                     "session_id": session_id,
                     "last_updated": time.time(),
                     "model_used_in_last_message": model_name,
-                    "history": file_graph,
+                    "history": file_graph.nodes,
                     "title": (current_data.get("title") if isinstance(current_data, dict) else None)
                     or _generate_title_from_history(materialize_conversation_history(file_graph)),
                 },
@@ -789,10 +1141,12 @@ def persist_chat_operation(
             result_graph = file_graph
 
         if user_id is not None and isinstance(user_id, int):
-            # Compare-and-swap the JSON graph so two web workers cannot silently
-            # overwrite one another's branches. The unique constraint handles
-            # the equivalent race while creating a brand-new session.
-            for attempt in range(3):
+            # Compare-and-swap the session revision so two web workers cannot silently
+            # overwrite one another's branches. A writer that loses reloads the graph
+            # and replays its operation on top, so sends on different parents both
+            # land; genuine conflicts surface as ValueError from the replay. The
+            # unique constraints handle the same race while creating a new session.
+            for attempt in range(1, CHAT_WRITE_MAX_ATTEMPTS + 1):
                 try:
                     chat = UserChatHistory.query.filter_by(
                         user_id=user_id, session_id=session_id
@@ -814,62 +1168,78 @@ def persist_chat_operation(
                             mind_id=mind_id,
                         )
                         chat.set_messages(db_graph)
+                        chat.active_path_data = _active_path_json(db_graph)
+                        for key, value in session_summary_values(
+                            materialize_conversation_history(db_graph), datetime.utcnow()
+                        ).items():
+                            setattr(chat, key, value)
+                        index_chat(chat, db_graph.nodes)
+                        index_chat_attachments(chat, db_graph.nodes)
+                        retain_managed_files(count_managed_references(db_graph.nodes))
                         db.session.add(chat)
                         db.session.commit()
+                        observe_chat_write(operation, attempt)
                         result_graph = db_graph
                         break
 
-                    previous_messages_data = chat.messages_data
+                    current_graph, rows_by_id = _load_persisted_graph(chat)
+                    known_ids = set(current_graph.by_id)
                     db_graph = _apply_chat_operation(
-                        chat.get_messages(),
+                        current_graph,
                         operation=operation,
                         target_message_id=target_message_id,
                         parent_message_id=parent_message_id,
                         user_message=user_message,
                         model_message=model_message,
                     )
+                    active_history = materialize_conversation_history(db_graph)
                     next_title = chat.title
                     if not next_title or next_title == "Новый чат":
-                        next_title = _generate_title_from_history(
-                            materialize_conversation_history(db_graph)
-                        )
+                        next_title = _generate_title_from_history(active_history)
+                    written_at = datetime.utcnow()
                     values: dict[str, Any] = {
-                        "messages_data": json.dumps(db_graph, ensure_ascii=False),
                         "title": next_title,
-                        "updated_at": datetime.utcnow(),
+                        "updated_at": written_at,
+                        "active_path_data": _active_path_json(db_graph),
+                        **session_summary_values(active_history, written_at),
                     }
                     if mind_id is not None:
                         values["mind_id"] = mind_id
-                    updated = (
-                        UserChatHistory.query.filter_by(id=chat.id)
-                        .filter(UserChatHistory.messages_data == previous_messages_data)
-                        .update(values, synchronize_session=False)
-                    )
-                    if updated != 1:
+                    if not _claim_chat_write(chat, values, operation):
                         db.session.rollback()
                         continue
+                    _sync_chat_rows(chat, rows_by_id, db_graph, revision=(chat.revision or 0) + 1)
+                    index_chat(chat, db_graph.nodes, title=next_title)
+                    index_chat_attachments(chat, db_graph.nodes)
+                    retain_managed_files(
+                        count_managed_references(
+                            node for node in db_graph.nodes if node.get("id") not in known_ids
+                        )
+                    )
                     db.session.commit()
+                    observe_chat_write(operation, attempt)
                     result_graph = db_graph
                     break
                 except IntegrityError:
                     db.session.rollback()
-                    if attempt == 2:
+                    CHAT_WRITE_CONFLICTS_TOTAL.labels(operation=operation).inc()
+                    if attempt == CHAT_WRITE_MAX_ATTEMPTS:
                         raise
                 except Exception:
                     db.session.rollback()
                     raise
             else:
+                CHAT_WRITE_EXHAUSTED_TOTAL.labels(operation=operation).inc()
                 raise RuntimeError("chat_concurrent_update")
 
         return materialize_conversation_history(result_graph)
 
 
-def _select_variant_in_graph(messages: list[Any], message_id: str) -> list[dict]:
-    graph = ensure_conversation_graph(messages)
-    target = next((message for message in graph if message.get("id") == message_id), None)
-    if not target:
+def _select_variant_in_graph(messages: list[Any], message_id: str) -> ConversationGraph:
+    graph = ConversationGraph.from_messages(messages)
+    if not graph.get(message_id):
         raise ValueError("target_message_not_found")
-    _activate_ancestry(graph, message_id)
+    graph.activate_ancestry(message_id)
     return graph
 
 
@@ -886,34 +1256,32 @@ def select_conversation_variant(
     lock = _acquire_session_lock(safe_session_id)
     with lock:
         if user_id is not None:
-            for _attempt in range(3):
+            for attempt in range(1, CHAT_WRITE_MAX_ATTEMPTS + 1):
                 chat = UserChatHistory.query.filter_by(
                     user_id=user_id, session_id=session_id
                 ).first()
                 if not chat:
                     raise ValueError("session_not_found")
-                previous_messages_data = chat.messages_data
-                graph = _select_variant_in_graph(chat.get_messages(), message_id)
-                updated = (
-                    UserChatHistory.query.filter_by(id=chat.id)
-                    .filter(UserChatHistory.messages_data == previous_messages_data)
-                    .update(
-                        {
-                            "messages_data": json.dumps(graph, ensure_ascii=False),
-                            "updated_at": datetime.utcnow(),
-                        },
-                        synchronize_session=False,
-                    )
-                )
-                if updated != 1:
+                current_graph, rows_by_id = _load_persisted_graph(chat)
+                graph = _select_variant_in_graph(current_graph, message_id)
+                written_at = datetime.utcnow()
+                values = {
+                    "updated_at": written_at,
+                    "active_path_data": _active_path_json(graph),
+                    **session_summary_values(materialize_conversation_history(graph), written_at),
+                }
+                if not _claim_chat_write(chat, values, "select"):
                     db.session.rollback()
                     continue
                 try:
+                    _sync_chat_rows(chat, rows_by_id, graph, revision=(chat.revision or 0) + 1)
                     db.session.commit()
                 except Exception:
                     db.session.rollback()
                     raise
+                observe_chat_write("select", attempt)
                 return materialize_conversation_history(graph)
+            CHAT_WRITE_EXHAUSTED_TOTAL.labels(operation="select").inc()
             raise RuntimeError("chat_concurrent_update")
         if allow_guest_file_persistence:
             current_data = read_chat_file_secure(safe_session_id, require_auth=True)
@@ -922,7 +1290,7 @@ def select_conversation_variant(
                 message_id,
             )
             next_data = dict(current_data)
-            next_data["history"] = graph
+            next_data["history"] = graph.nodes
             next_data["last_updated"] = time.time()
             write_chat_file(safe_session_id, next_data)
             return materialize_conversation_history(graph)
@@ -985,14 +1353,48 @@ def append_messages_to_history(
 
                     db_messages = chat.get_messages()
                     to_append_db = _collect_new_messages(db_messages, incoming)
+                    appended_rows: list[ChatMessage] = []
                     if to_append_db:
+                        if chat.message_rows:
+                            next_position = chat.message_rows[-1].position + 1
+                            appended_rows = [
+                                ChatMessage.from_message(message, position=next_position + offset)
+                                for offset, message in enumerate(to_append_db)
+                            ]
+                            chat.message_rows.extend(appended_rows)
+                            chat.active_path_data = _active_path_json(
+                                ConversationGraph.from_messages(db_messages + to_append_db)
+                            )
+                        else:
+                            chat.set_messages(
+                                [normalize_message(message) for message in db_messages]
+                                + to_append_db
+                            )
+                            appended_rows = list(chat.message_rows)
                         db_messages.extend(to_append_db)
-                        chat.set_messages(db_messages)
 
                     if not chat.title or chat.title == "Новый чат":
                         chat.title = _generate_title_from_history(db_messages or incoming)
+                    index_chat(chat, db_messages)
+                    index_chat_attachments(chat, db_messages)
+                    retain_managed_files(count_managed_references(to_append_db))
 
                     chat.updated_at = datetime.utcnow()
+                    if to_append_db or chat.message_count is None:
+                        for key, value in session_summary_values(
+                            materialize_conversation_history(db_messages), chat.updated_at
+                        ).items():
+                            setattr(chat, key, value)
+                    if chat.id is not None:
+                        # Appends are not replayed, but bumping the revision makes
+                        # concurrent graph writers rebase onto them.
+                        chat.revision = UserChatHistory.revision + 1
+                        if appended_rows:
+                            # The flush holds the chat row lock, so the reloaded
+                            # revision is exactly the one this commit publishes.
+                            db.session.flush()
+                            for row in appended_rows:
+                                row.revision = chat.revision
                     db.session.commit()
                 except Exception as exc:
                     logger.exception("Could not save to DB: %s", exc)
@@ -0,0 +1,190 @@
+"""Full-text search over signed-in users' chats.
+
+Every chat write refreshes the chat's ``chat_search_document`` row with its
+title and the plain text of its messages (no JSON keys, URLs of attachments or
+encoded payloads). PostgreSQL searches it through a GIN-indexed ``tsvector``
+and SQLite through an FTS5 table; both rank matches and return a highlighted
+snippet. Other databases, or a SQLite build without FTS5, fall back to a
+substring match over the same documents.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any
+
+from sqlalchemy import false, func, literal_column, or_, table, text
+from sqlalchemy.sql import column
+
+from utils.auth import ChatSearchDocument, UserChatHistory, db
+
+# PostgreSQL rejects tsvectors over 1 MB; the most recent text is kept.
+SEARCH_BODY_MAX_CHARS = 200_000
+MAX_QUERY_TERMS = 8
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+SNIPPET_WORDS = 16
+
+_TERM_RE = re.compile(r"\w+")
+_THINK_BLOCK_RE = re.compile(r"<think(?:\s[^>]*)?>[\s\S]*?</think>", re.IGNORECASE)
+_CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+_HEADLINE_OPTIONS = (
+    f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, "
+    f"MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 2}, "
+    "MaxFragments=1, FragmentDelimiter=…"
+)
+_fts_table = table("chat_search_fts", column("rowid"))
+
+
+def _clean(value: Any) -> str:
+    return _CONTROL_CHARS_RE.sub(" ", str(value or "")).strip()
+
+
+def message_search_text(message: Any) -> str:
+    if not isinstance(message, dict):
+        return ""
+    parts = message.get("parts")
+    if not isinstance(parts, list):
+        return ""
+    texts = [
+        str(part["text"])
+        for part in parts
+        if isinstance(part, dict) and isinstance(part.get("text"), str)
+    ]
+    return _clean(_THINK_BLOCK_RE.sub("", "\n".join(texts)))
+
+
+def search_document_text(messages: list[Any]) -> str:
+    body = "\n".join(text for text in map(message_search_text, messages or []) if text)
+    return body[-SEARCH_BODY_MAX_CHARS:]
+
+
+def index_chat(
+    chat: UserChatHistory, messages: list[Any] | None = None, *, title: str | None = None
+) -> None:
+    """Refresh the search document of ``chat`` in the current transaction."""
+    if messages is None:
+        messages = chat.get_messages()
+    next_title = _clean(chat.title if title is None else title)
+    next_body = search_document_text(messages)
+    document = chat.search_document
+    if document is None:
+        chat.search_document = ChatSearchDocument(
+            user_id=chat.user_id, title=next_title, body=next_body
+        )
+        return
+    # Unchanged documents are left alone so the FTS triggers do not reindex them.
+    if document.title != next_title:
+        document.title = next_title
+    if document.body != next_body:
+        document.body = next_body
+
+
+def set_search_title(chat: UserChatHistory, title: str) -> None:
+    if chat.search_document is None:
+        index_chat(chat, title=title)
+    elif chat.search_document.title != _clean(title):
+        chat.search_document.title = _clean(title)
+
+
+def search_backend() -> str:
+    engine = db.engine
+    backend = getattr(engine, "_remind_chat_search_backend", None)
+    if backend is None:
+        backend = "like"
+        if engine.dialect.name in {"postgresql", "postgres"}:
+            backend = "postgresql"
+        elif engine.dialect.name == "sqlite":
+            with engine.connect() as connection:
+                found = connection.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE name = 'chat_search_fts'")
+                ).first()
+            backend = "sqlite" if found else "like"
+        engine._remind_chat_search_backend = backend
+    return backend
+
+
+def search_terms(query: str) -> list[str]:
+    terms: list[str] = []
+    for term in _TERM_RE.findall(query.casefold()):
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def _tsquery(terms: list[str]):
+    return func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+
+
+def filter_chat_search(query, search_query: str, backend: str):
+    """Restrict a ``UserChatHistory`` query to chats matching ``search_query``.
+
+    Every term must match, as a word or a word prefix.
+    """
+    terms = search_terms(search_query)
+    if not terms:
+        return query.filter(false())
+    query = query.join(ChatSearchDocument, ChatSearchDocument.chat_id == UserChatHistory.id)
+    if backend == "postgresql":
+        return query.filter(
+            literal_column("chat_search_document.search_vector").op("@@")(_tsquery(terms))
+        )
+    if backend == "sqlite":
+        match = " ".join(f'"{term}"*' for term in terms)
+        return query.join(_fts_table, _fts_table.c.rowid == UserChatHistory.id).filter(
+            text("chat_search_fts MATCH :chat_search_match").bindparams(chat_search_match=match)
+        )
+    for term in terms:
+        escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        pattern = f"%{escaped}%"
+        query = query.filter(
+            or_(
+                ChatSearchDocument.title.ilike(pattern, escape="\\"),
+                ChatSearchDocument.body.ilike(pattern, escape="\\"),
+            )
+        )
+    return query
+
+
+def chat_search_ranking(search_query: str, backend: str) -> list:
+    """ORDER BY clauses, best match first, for a query filtered by ``filter_chat_search``."""
+    terms = search_terms(search_query)
+    if not terms:
+        return []
+    if backend == "postgresql":
+        vector = literal_column("chat_search_document.search_vector")
+        return [func.ts_rank_cd(vector, _tsquery(terms)).desc()]
+    if backend == "sqlite":
+        # bm25() is lower for better matches; title hits weigh four times more.
+        return [func.bm25(literal_column("chat_search_fts"), 4.0, 1.0)]
+    return []
+
+
+def chat_search_snippet(search_query: str, backend: str):
+    """Column with a highlighted excerpt, or ``None`` when the backend has none."""
+    terms = search_terms(search_query)
+    if not terms:
+        return None
+    if backend == "postgresql":
+        return func.ts_headline(
+            "simple", ChatSearchDocument.body, _tsquery(terms), _HEADLINE_OPTIONS
+        )
+    if backend == "sqlite":
+        return func.snippet(
+            literal_column("chat_search_fts"),
+            -1,
+            HIGHLIGHT_START,
+            HIGHLIGHT_END,
+            "…",
+            SNIPPET_WORDS,
+        )
+    return None
+
+
+def snippet_segments(raw: Any) -> list[dict[str, Any]]:
+    """Split a highlighted snippet into ``{"text", "match"}`` segments."""
+    segments: list[dict[str, Any]] = []
+    for index, piece in enumerate(re.split(f"[{HIGHLIGHT_START}{HIGHLIGHT_END}]", str(raw or ""))):
+        if piece:
+            segments.append({"text": piece, "match": index % 2 == 1})
+    return segments
@@ -0,0 +1,353 @@
+"""Numbered, replayable journal of streamed ``/chat`` responses.
+
+Every SSE event of a chat stream gets a sequence number and is appended to a
+journal keyed by the chat ``request_id``, so ``GET /chat/stream/<request_id>`` can
+resume a dropped connection after its ``Last-Event-ID``. ``CHAT_STREAM_BACKEND``
+selects where the journal lives:
+
+* ``redis`` - a Redis Stream per request (entry ``0-<seq>``), capped at about
+  ``CHAT_STREAM_MAX_EVENTS`` entries and expiring ``CHAT_STREAM_TTL_SECONDS`` after
+  its last event; resumes work across workers and nodes. Falls back to ``memory``
+  when Redis is unreachable.
+* ``memory`` - the same log in process memory; a resume must reach the same worker.
+* ``off`` - streams are not journaled and cannot be resumed.
+
+A journal has a single writer, the request (or Celery job) that generates the answer,
+and doubles as the in-flight registry: a retry of a running ``request_id`` subscribes
+to its journal instead of generating again. The owner can ``cancel`` a stream; its
+writer polls that flag and stops generating. Readers see ``open`` until the writer
+closes it, ``done`` afterwards and ``gone`` once expired. With Redis the writing
+process keeps a ``CHAT_STREAM_LEASE_SECONDS`` lease alive; a stream whose writer died
+without closing it reads as ``failed`` once the lease lapses.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+
+from config import (
+    CHAT_STREAM_BACKEND,
+    CHAT_STREAM_LEASE_SECONDS,
+    CHAT_STREAM_MAX_EVENTS,
+    CHAT_STREAM_TTL_SECONDS,
+    REDIS_URL,
+)
+from utils.responses import logger
+
+StreamEvents = list[tuple[int, str]]
+
+
+class ChatStreamWriter:
+    CANCEL_CHECK_SECONDS = 0.5
+
+    def __init__(self, journal: "ChatStreamJournal", request_id: str) -> None:
+        self._journal = journal
+        self.request_id = request_id
+        self.seq = 0
+        self._cancelled = False
+        self._next_cancel_check = 0.0
+
+    def cancelled(self, *, refresh: bool = False) -> bool:
+        """Whether the owner stopped this answer; polled at most every half second."""
+        now = time.monotonic()
+        if not self._cancelled and (refresh or now >= self._next_cancel_check):
+            self._next_cancel_check = now + self.CANCEL_CHECK_SECONDS
+            self._cancelled = self._journal.cancelled(self.request_id)
+        return self._cancelled
+
+    def append(self, event: str) -> int:
+        self.seq += 1
+        self._journal._append(self.request_id, self.seq, event)
+        return self.seq
+
+    def close(self) -> None:
+        self._journal._close(self.request_id)
+
+
+class _MemoryStream:
+    def __init__(self, owner: str, max_events: int) -> None:
+        self.owner = owner
+        self.events: deque[tuple[int, str]] = deque(maxlen=max_events)
+        self.done = False
+        self.cancelled = False
+        self.expires_at = 0.0
+        self.changed = threading.Condition()
+
+
+class ChatStreamJournal:
+    """In-process journal; also the interface of the Redis-backed one."""
+
+    def __init__(self, *, ttl_seconds: int, max_events: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_events = max_events
+        self._streams: dict[str, _MemoryStream] = {}
+        self._guard = threading.Lock()
+
+    def open(self, request_id: str, owner: str) -> ChatStreamWriter | None:
+        """Writer for a new stream, or ``None`` if ``request_id`` is already journaled."""
+        now = time.monotonic()
+        with self._guard:
+            for key in [key for key, item in self._streams.items() if item.expires_at < now]:
+                del self._streams[key]
+            if request_id in self._streams:
+                return None
+            stream = _MemoryStream(owner, self.max_events)
+            stream.expires_at = now + self.ttl_seconds
+            self._streams[request_id] = stream
+        return ChatStreamWriter(self, request_id)
+
+    def writer(self, request_id: str) -> ChatStreamWriter:
+        """Writer for a stream opened elsewhere, e.g. by the request that enqueued it."""
+        return ChatStreamWriter(self, request_id)
+
+    def hand_off(self, request_id: str) -> None:
+        """Stop writing here; another process adopts the stream through ``writer``."""
+
+    def discard(self, request_id: str) -> None:
+        with self._guard:
+            self._streams.pop(request_id, None)
+
+    def _stream(self, request_id: str) -> _MemoryStream | None:
+        stream = self._streams.get(request_id)
+        if stream is None or stream.expires_at < time.monotonic():
+            return None
+        return stream
+
+    def _append(self, request_id: str, seq: int, event: str) -> None:
+        stream = self._streams.get(request_id)
+        if stream is None:
+            return
+        with stream.changed:
+            stream.events.append((seq, event))
+            stream.expires_at = time.monotonic() + self.ttl_seconds
+            stream.changed.notify_all()
+
+    def _close(self, request_id: str) -> None:
+        stream = self._streams.get(request_id)
+        if stream is None:
+            return
+        with stream.changed:
+            stream.done = True
+            stream.changed.notify_all()
+
+    def owner(self, request_id: str) -> str | None:
+        stream = self._stream(request_id)
+        return stream.owner if stream else None
+
+    def cancel(self, request_id: str) -> None:
+        stream = self._stream(request_id)
+        if stream is not None:
+            stream.cancelled = True
+
+    def cancelled(self, request_id: str) -> bool:
+        stream = self._stream(request_id)
+        return bool(stream and stream.cancelled)
+
+    def status(self, request_id: str) -> str | None:
+        """``open``, ``done`` or ``failed``; ``None`` when nothing is journaled."""
+        stream = self._stream(request_id)
+        if stream is None:
+            return None
+        return "done" if stream.done else "open"
+
+    def first_seq(self, request_id: str) -> int | None:
+        """Oldest sequence number still retained, ``None`` before the first event."""
+        stream = self._stream(request_id)
+        if stream is None or not stream.events:
+            return None
+        return stream.events[0][0]
+
+    def read(self, request_id: str, after: int, timeout: float) -> tuple[StreamEvents, str]:
+        """Events after ``after``, waiting up to ``timeout`` seconds while the stream is open."""
+        stream = self._stream(request_id)
+        if stream is None:
+            return [], "gone"
+        with stream.changed:
+            if not stream.done and not (stream.events and stream.events[-1][0] > after):
+                stream.changed.wait(timeout)
+            events = [(seq, event) for seq, event in stream.events if seq > after]
+            return events, "done" if stream.done else "open"
+
+
+class RedisChatStreamJournal(ChatStreamJournal):
+    KEY_PREFIX = "remind:chat_stream:"
+
+    def __init__(
+        self, client, *, ttl_seconds: int, max_events: int, lease_seconds: int = 30
+    ) -> None:
+        super().__init__(ttl_seconds=ttl_seconds, max_events=max_events)
+        self.client = client
+        self.lease_seconds = lease_seconds
+        # Streams this process writes: the process-local side of the in-flight registry.
+        self._live: set[str] = set()
+        self._lease_keeper: threading.Thread | None = None
+
+    def _keys(self, request_id: str) -> tuple[str, str]:
+        stream_key = f"{self.KEY_PREFIX}{request_id}"
+        return stream_key, f"{stream_key}:meta"
+
+    def _lease_key(self, request_id: str) -> str:
+        return f"{self.KEY_PREFIX}{request_id}:lease"
+
+    def open(self, request_id: str, owner: str) -> ChatStreamWriter | None:
+        _stream_key, meta_key = self._keys(request_id)
+        if not self.client.hsetnx(meta_key, "owner", owner):
+            return None
+        self.client.expire(meta_key, self.ttl_seconds)
+        return self.writer(request_id)
+
+    def writer(self, request_id: str) -> ChatStreamWriter:
+        self.client.set(self._lease_key(request_id), 1, ex=self.lease_seconds)
+        with self._guard:
+            self._live.add(request_id)
+            if self._lease_keeper is None:
+                self._lease_keeper = threading.Thread(
+                    target=self._keep_leases, name="chat-stream-leases", daemon=True
+                )
+                self._lease_keeper.start()
+        return ChatStreamWriter(self, request_id)
+
+    def hand_off(self, request_id: str) -> None:
+        with self._guard:
+            self._live.discard(request_id)
+        # Covers the queue wait; the adopting writer shortens it to a regular lease.
+        self.client.set(self._lease_key(request_id), 1, ex=self.ttl_seconds)
+
+    def discard(self, request_id: str) -> None:
+        with self._guard:
+            self._live.discard(request_id)
+        self.client.delete(*self._keys(request_id), self._lease_key(request_id))
+
+    def _keep_leases(self) -> None:
+        while True:
+            time.sleep(max(1.0, self.lease_seconds / 3))
+            with self._guard:
+                live = list(self._live)
+            if not live:
+                continue
+            try:
+                pipeline = self.client.pipeline(transaction=False)
+                for request_id in live:
+                    pipeline.set(self._lease_key(request_id), 1, ex=self.lease_seconds)
+                pipeline.execute()
+            except Exception:
+                logger.warning("Could not renew chat stream leases", exc_info=True)
+
+    def _append(self, request_id: str, seq: int, event: str) -> None:
+        stream_key, meta_key = self._keys(request_id)
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.xadd(
+            stream_key,
+            {"e": event},
+            id=f"0-{seq}",
+            maxlen=self.max_events,
+            approximate=True,
+        )
+        pipeline.expire(stream_key, self.ttl_seconds)
+        pipeline.expire(meta_key, self.ttl_seconds)
+        pipeline.execute()
+
+    def _close(self, request_id: str) -> None:
+        with self._guard:
+            self._live.discard(request_id)
+        stream_key, meta_key = self._keys(request_id)
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.hset(meta_key, "done", 1)
+        pipeline.expire(meta_key, self.ttl_seconds)
+        pipeline.expire(stream_key, self.ttl_seconds)
+        pipeline.delete(self._lease_key(request_id))
+        pipeline.execute()
+
+    def owner(self, request_id: str) -> str | None:
+        _stream_key, meta_key = self._keys(request_id)
+        value = self.client.hget(meta_key, "owner")
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def cancel(self, request_id: str) -> None:
+        _stream_key, meta_key = self._keys(request_id)
+        if self.client.exists(meta_key):
+            self.client.hset(meta_key, "cancelled", 1)
+
+    def cancelled(self, request_id: str) -> bool:
+        _stream_key, meta_key = self._keys(request_id)
+        return bool(self.client.hget(meta_key, "cancelled"))
+
+    def status(self, request_id: str) -> str | None:
+        if request_id in self._live:
+            return "open"
+        _stream_key, meta_key = self._keys(request_id)
+        owner, done = self.client.hmget(meta_key, "owner", "done")
+        if owner is None:
+            return None
+        if done:
+            return "done"
+        return "open" if self.client.exists(self._lease_key(request_id)) else "failed"
+
+    def first_seq(self, request_id: str) -> int | None:
+        stream_key, _meta_key = self._keys(request_id)
+        entries = self.client.xrange(stream_key, count=1)
+        return _entry_seq(entries[0][0]) if entries else None
+
+    def read(self, request_id: str, after: int, timeout: float) -> tuple[StreamEvents, str]:
+        stream_key, _meta_key = self._keys(request_id)
+        # Checked before reading: once done, every event is already in the stream.
+        state = self.status(request_id)
+        if state is None:
+            return [], "gone"
+        response = self.client.xread(
+            {stream_key: f"0-{after}"},
+            count=500,
+            block=max(1, int(timeout * 1000)) if state == "open" else None,
+        )
+        events: StreamEvents = []
+        for _key, entries in response or []:
+            for entry_id, fields in entries:
+                event = fields.get(b"e") or fields.get("e") or b""
+                events.append(
+                    (
+                        _entry_seq(entry_id),
+                        event.decode("utf-8") if isinstance(event, bytes) else event,
+                    )
+                )
+        return events, state
+
+
+def _entry_seq(entry_id) -> int:
+    if isinstance(entry_id, bytes):
+        entry_id = entry_id.decode("ascii")
+    return int(str(entry_id).rsplit("-", 1)[-1])
+
+
+def _build_journal() -> ChatStreamJournal | None:
+    if CHAT_STREAM_BACKEND == "off":
+        return None
+    options = {"ttl_seconds": CHAT_STREAM_TTL_SECONDS, "max_events": CHAT_STREAM_MAX_EVENTS}
+    if CHAT_STREAM_BACKEND == "redis":
+        try:
+            import redis
+
+            client = redis.from_url(REDIS_URL)
+            client.ping()
+            return RedisChatStreamJournal(
+                client, lease_seconds=CHAT_STREAM_LEASE_SECONDS, **options
+            )
+        except Exception:
+            logger.warning("Redis chat stream journal unavailable; using memory", exc_info=True)
+    return ChatStreamJournal(**options)
+
+
+_journal: ChatStreamJournal | None = None
+_journal_ready = False
+_journal_guard = threading.Lock()
+
+
+def get_chat_stream_journal() -> ChatStreamJournal | None:
+    global _journal, _journal_ready
+    if not _journal_ready:
+        with _journal_guard:
+            if not _journal_ready:
+                _journal = _build_journal()
+                _journal_ready = True
+    return _journal
@@ -0,0 +1,268 @@
+"""Bounded model context for long conversations.
+
+Only the most recent turns are sent to the model verbatim: at most the model's
+``context_verbatim_turns``, and no more than fit its ``context_token_budget``
+(see ``ai_engine.registry``). Everything older is replaced by a single message
+carrying the session's rolling summary.
+
+The summary records the id of the last message it covers. When the window
+slides past it, a background worker folds the newly dropped turns in with the
+model's summary handler. Until that finishes, turns between the summary and the
+window are represented by short excerpts, so a request never waits on
+summarization.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from flask import current_app, has_app_context
+
+from ai_engine import get_summary_function
+from ai_engine.prompt_templates import render_prompt
+from ai_engine.registry import model_context_limits
+from config import CHAT_CONTEXT_SUMMARY_MAX_CHARS, CHAT_CONTEXT_SUMMARY_WORKERS
+from services.chat_history import load_context_summary, store_context_summary
+from utils.observability import (
+    CHAT_CONTEXT_MESSAGES_DROPPED,
+    CHAT_CONTEXT_SUMMARY_REFRESHES_TOTAL,
+)
+from utils.responses import logger
+
+SUMMARY_MESSAGE_ID = "context_summary"
+# Gemini bills an image tile at 258 tokens; stored files are costed the same.
+ATTACHMENT_TOKEN_ESTIMATE = 258
+# Conservative for Cyrillic text, which tokenizes denser than English.
+CHARS_PER_TOKEN = 3
+MESSAGE_TOKEN_OVERHEAD = 4
+EXCERPT_CHARS = 240
+# Transcript size handed to the summary handler per call.
+FOLD_BATCH_CHARS = 60_000
+
+_THINK_BLOCK_RE = re.compile(r"<think(?:\s[^>]*)?>[\s\S]*?</think>", re.IGNORECASE)
+
+_executor: ThreadPoolExecutor | None = None
+_in_flight: set[tuple[int | None, str]] = set()
+_guard = threading.Lock()
+
+
+def _message_text(message: dict) -> str:
+    parts = message.get("parts")
+    if not isinstance(parts, list):
+        return ""
+    texts = [
+        str(part["text"])
+        for part in parts
+        if isinstance(part, dict) and part.get("text") is not None
+    ]
+    return _THINK_BLOCK_RE.sub("", "\n".join(texts)).strip()
+
+
+def estimate_message_tokens(message: Any) -> int:
+    if not isinstance(message, dict):
+        return 0
+    tokens = MESSAGE_TOKEN_OVERHEAD
+    for part in message.get("parts") or []:
+        if not isinstance(part, dict):
+            continue
+        if part.get("text") is not None:
+            tokens += len(str(part["text"])) // CHARS_PER_TOKEN + 1
+        elif isinstance(part.get("image") or part.get("file"), dict):
+            tokens += ATTACHMENT_TOKEN_ESTIMATE
+    return tokens
+
+
+def window_start(history: list[dict], *, token_budget: int, verbatim_turns: int) -> int:
+    """Index of the first message sent verbatim; 0 keeps the whole history."""
+    user_starts = [
+        index
+        for index, message in enumerate(history)
+        if isinstance(message, dict) and message.get("role") == "user"
+    ]
+    if not user_starts:
+        return 0
+    turn_start = user_starts[-verbatim_turns] if len(user_starts) > verbatim_turns else 0
+
+    # The summary message itself is paid for out of the same budget.
+    available = max(0, token_budget - CHAT_CONTEXT_SUMMARY_MAX_CHARS // CHARS_PER_TOKEN)
+    fits_from = len(history)
+    used = 0
+    for index in range(len(history) - 1, -1, -1):
+        used += estimate_message_tokens(history[index])
+        if used > available:
+            break
+        fits_from = index
+
+    lower = max(turn_start, fits_from)
+    if lower == 0:
+        return 0
+    # Cut on a turn boundary; the newest turn is always kept, even over budget.
+    return next((index for index in user_starts if index >= lower), user_starts[-1])
+
+
+def _covered_count(older: list[dict], summary: dict | None) -> int:
+    through_id = summary.get("through_id") if summary else None
+    if not through_id:
+        return 0
+    for index in range(len(older) - 1, -1, -1):
+        if older[index].get("id") == through_id:
+            return index + 1
+    return 0
+
+
+def _excerpts(messages: list[dict], max_chars: int) -> str:
+    lines: list[str] = []
+    used = 0
+    for message in reversed(messages):
+        text = " ".join(_message_text(message).split())
+        if not text:
+            continue
+        if len(text) > EXCERPT_CHARS:
+            text = text[: EXCERPT_CHARS - 1] + "…"
+        line = f"{'User' if message.get('role') == 'user' else 'Assistant'}: {text}"
+        if used + len(line) > max_chars:
+            break
+        lines.append(line)
+        used += len(line) + 1
+    return "\n".join(reversed(lines))
+
+
+def _transcript_batches(messages: list[dict]) -> list[str]:
+    batches: list[str] = []
+    current: list[str] = []
+    size = 0
+    for message in messages:
+        text = _message_text(message)
+        if not text:
+            continue
+        entry = f"{'User' if message.get('role') == 'user' else 'Assistant'}: {text}"
+        entry = entry[:FOLD_BATCH_CHARS]
+        if current and size + len(entry) > FOLD_BATCH_CHARS:
+            batches.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(entry)
+        size += len(entry) + 2
+    if current:
+        batches.append("\n\n".join(current))
+    return batches
+
+
+def _summary_message(text: str) -> dict:
+    return {
+        "id": SUMMARY_MESSAGE_ID,
+        "role": "user",
+        "parts": [{"text": render_prompt("context/conversation_summary.md", {"SUMMARY": text})}],
+    }
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _guard:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=CHAT_CONTEXT_SUMMARY_WORKERS, thread_name_prefix="context-summary"
+            )
+        return _executor
+
+
+def _refresh_summary(
+    app,
+    summarize,
+    key: tuple[int | None, str],
+    older: list[dict],
+) -> None:
+    user_id, session_id = key
+    try:
+        with app.app_context():
+            summary = load_context_summary(session_id, user_id)
+            covered = _covered_count(older, summary)
+            text = str(summary.get("text") or "") if covered else ""
+            for batch in _transcript_batches(older[covered:]):
+                text = str(summarize(text, batch, CHAT_CONTEXT_SUMMARY_MAX_CHARS) or "").strip()
+                text = text[:CHAT_CONTEXT_SUMMARY_MAX_CHARS]
+            through_id = older[-1].get("id")
+            if not text or not through_id:
+                CHAT_CONTEXT_SUMMARY_REFRESHES_TOTAL.labels(result="skipped").inc()
+                return
+            stored = store_context_summary(
+                session_id,
+                user_id,
+                {"through_id": through_id, "text": text, "updated_at": time.time()},
+            )
+            CHAT_CONTEXT_SUMMARY_REFRESHES_TOTAL.labels(result="ok" if stored else "skipped").inc()
+    except Exception:
+        CHAT_CONTEXT_SUMMARY_REFRESHES_TOTAL.labels(result="error").inc()
+        logger.warning("Could not refresh a chat context summary", exc_info=True)
+    finally:
+        with _guard:
+            _in_flight.discard(key)
+
+
+def schedule_summary_refresh(
+    model_name: str, session_id: str, user_id: int | None, older: list[dict]
+) -> bool:
+    summarize = get_summary_function(model_name)
+    if summarize is None or not older or not has_app_context():
+        return False
+    key = (user_id, session_id)
+    with _guard:
+        # One refresh per session at a time; the next turn picks up whatever
+        # this one leaves uncovered.
+        if key in _in_flight:
+            return False
+        _in_flight.add(key)
+    try:
+        _get_executor().submit(
+            _refresh_summary,
+            current_app._get_current_object(),
+            summarize,
+            key,
+            [dict(message) for message in older],
+        )
+    except RuntimeError:
+        with _guard:
+            _in_flight.discard(key)
+        return False
+    return True
+
+
+def build_context_window(
+    history: list[dict],
+    model_name: str,
+    *,
+    session_id: str | None = None,
+    user_id: int | None = None,
+) -> list[dict]:
+    """History to send to ``model_name``, with older turns folded into a summary.
+
+    Without ``session_id`` (temporary chats) nothing is stored and older turns
+    are represented by excerpts only.
+    """
+    token_budget, verbatim_turns = model_context_limits(model_name)
+    if token_budget <= 0 or not history:
+        return history
+    start = window_start(history, token_budget=token_budget, verbatim_turns=verbatim_turns)
+    if start <= 0:
+        return history
+
+    older = history[:start]
+    summary = load_context_summary(session_id, user_id) if session_id else None
+    covered = _covered_count(older, summary)
+    text = str(summary.get("text") or "") if covered else ""
+    if covered < len(older):
+        through_id = summary.get("through_id") if summary else None
+        # A summary that already reaches into the window (regenerating an older
+        # turn) is kept as is rather than rolled back to this shorter context.
+        ahead = through_id and any(message.get("id") == through_id for message in history[start:])
+        if session_id and not ahead:
+            schedule_summary_refresh(model_name, session_id, user_id, older)
+        excerpt = _excerpts(older[covered:], CHAT_CONTEXT_SUMMARY_MAX_CHARS - len(text))
+        text = "\n\n".join(section for section in (text, excerpt) if section)
+
+    CHAT_CONTEXT_MESSAGES_DROPPED.observe(len(older))
+    window = history[start:]
+    return [_summary_message(text), *window] if text else window
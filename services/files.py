@@ -1,4 +1,5 @@
 import base64
+import os
 import re
 import unicodedata
 import uuid
@@ -14,8 +15,11 @@ from config import (
     PIL_AVAILABLE,
     UPLOAD_FOLDER,
 )
+from services.model_part_cache import PreparedFile, file_cache_key, model_part_cache
 from utils.input_validation import InputValidator
+from utils.observability import UPLOAD_DEDUP_TOTAL
 from utils.secure_upload import (
+    calculate_file_hash,
     is_safe_to_serve,
     validate_file_content,
     validate_mime_type,
@@ -224,11 +228,83 @@ def _classify_chat_file(filepath: Path, extension: str) -> tuple[str, str | None
 
 def _safe_unlink(filepath):
     try:
-        filepath.unlink()
+        remove_stored_upload(filepath)
     except OSError:
         pass
 
 
+# Upload handles are hard links to one blob per distinct content and extension,
+# UPLOAD_FOLDER/blobs/<sha256>.<ext>. A blob only exists once its bytes passed
+# validation, so later uploads of the same file skip classification.
+UPLOAD_BLOB_DIRNAME = "blobs"
+
+
+def _upload_blob_path(upload_root: Path, digest: str, extension: str) -> Path:
+    name = f"{digest}.{extension}" if extension else digest
+    return Path(upload_root) / UPLOAD_BLOB_DIRNAME / name
+
+
+def _link_validated_blob(
+    blob_path: Path, filepath: Path, extension: str
+) -> tuple[str, str | None] | None:
+    # The saved copy is swapped for a link to the blob in one rename; any
+    # failure leaves it in place for full validation.
+    mimetype = (
+        CHAT_IMAGE_MIME_TYPES.get(extension)
+        or CHAT_DOCUMENT_MIME_TYPES.get(extension)
+        or CHAT_TEXT_MIME_TYPES.get(extension)
+    )
+    if not mimetype or not blob_path.is_file():
+        return None
+    text = None
+    if extension in CHAT_TEXT_MIME_TYPES:
+        text = _read_model_text(filepath)
+        if text is None:
+            return None
+    temp_path = filepath.with_name(f"temp_{uuid.uuid4().hex}_{filepath.name}")
+    try:
+        os.link(blob_path, temp_path)
+        os.replace(temp_path, filepath)
+    except OSError:
+        _safe_unlink(temp_path)
+        return None
+    return mimetype, text
+
+
+def _store_upload_blob(filepath: Path, blob_path: Path) -> None:
+    try:
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        os.link(filepath, blob_path)
+    except OSError:
+        # Already stored by a concurrent upload, or links are unsupported: the
+        # upload simply stays a standalone file.
+        pass
+
+
+def remove_stored_upload(filepath: Path) -> None:
+    """Unlink an upload handle, and its blob once no other handle shares it."""
+    filepath = Path(filepath)
+    blob_path = None
+    try:
+        # Any shared handle may turn out to be the last one: when two are removed at
+        # once, each sees the other's link, so the blob is re-checked after unlinking.
+        if filepath.stat().st_nlink >= 2:
+            digest = calculate_file_hash(str(filepath))
+            if digest:
+                extension = filepath.suffix.lstrip(".")
+                blob_path = _upload_blob_path(filepath.parent, digest, extension)
+    except OSError:
+        pass
+    filepath.unlink()
+    model_part_cache.discard(filepath.name)
+    if blob_path is not None:
+        try:
+            if blob_path.stat().st_nlink == 1:
+                blob_path.unlink()
+        except OSError:
+            pass
+
+
 def handle_file_upload(file_storage, user_id):
     if not file_storage or not file_storage.filename:
         return None
@@ -255,7 +331,13 @@ def handle_file_upload(file_storage, user_id):
         if not is_valid:
             _safe_unlink(filepath)
             return None
-        classification = _classify_chat_file(filepath, extension)
+        digest = calculate_file_hash(str(filepath))
+        blob_path = _upload_blob_path(UPLOAD_FOLDER, digest, extension) if digest else None
+        classification = _link_validated_blob(blob_path, filepath, extension) if blob_path else None
+        validated_now = classification is None
+        UPLOAD_DEDUP_TOTAL.labels(result="miss" if validated_now else "hit").inc()
+        if validated_now:
+            classification = _classify_chat_file(filepath, extension)
         if classification is None:
             _safe_unlink(filepath)
             return None
@@ -271,9 +353,12 @@ def handle_file_upload(file_storage, user_id):
             _safe_unlink(filepath)
             return None
 
-        if not is_safe_to_serve(str(filepath)):
-            _safe_unlink(filepath)
-            return None
+        if validated_now:
+            if not is_safe_to_serve(str(filepath)):
+                _safe_unlink(filepath)
+                return None
+            if blob_path is not None:
+                _store_upload_blob(filepath, blob_path)
     except Exception:
         _safe_unlink(filepath)
         return None
@@ -306,36 +391,55 @@ def restore_stored_file_for_model(
 
     upload_root = Path(UPLOAD_FOLDER).resolve()
     filepath = (upload_root / filename).resolve()
-    if filepath.parent != upload_root or not filepath.is_file() or not is_safe_to_serve(filepath):
+    if filepath.parent != upload_root or not filepath.is_file():
         return None
-    is_valid, _error = validate_file_content(str(filepath))
-    if not is_valid:
+    try:
+        stat = filepath.stat()
+    except OSError:
         return None
-    file_size = filepath.stat().st_size
+    file_size = stat.st_size
     if max_bytes is not None and file_size > max(0, max_bytes):
         return None
-    classification = _classify_chat_file(filepath, extension)
-    if classification is None:
-        return None
-    detected_mime, text = classification
+
+    # Validation and encoding are reused while the stored file keeps its size and mtime.
+    cache_key = file_cache_key(filename, stat)
+    prepared = model_part_cache.get(cache_key)
+    validated = prepared is not None
+    if not validated:
+        if not is_safe_to_serve(filepath):
+            return None
+        is_valid, _error = validate_file_content(str(filepath))
+        if not is_valid:
+            return None
+        classification = _classify_chat_file(filepath, extension)
+        if classification is None:
+            return None
+        prepared = PreparedFile(mime_type=classification[0], text=classification[1])
+    detected_mime = prepared.mime_type
+    inline = extension in ALLOWED_IMAGE_EXTENSIONS or extension in CHAT_DOCUMENT_MIME_TYPES
+    if inline and prepared.data is None:
+        try:
+            encoded = base64.b64encode(filepath.read_bytes()).decode("utf-8")
+        except OSError:
+            return None
+        prepared = PreparedFile(mime_type=detected_mime, data=encoded)
+        model_part_cache.put(cache_key, prepared, persist=not validated)
+    elif not validated:
+        model_part_cache.put(cache_key, prepared)
 
     raw_original_name = str(file_info.get("original_name") or filename)
     original_name_valid, _name_error, normalized_original_name = _validate_chat_filename(
         raw_original_name
     )
     original_name = normalized_original_name if original_name_valid else filename
-    try:
-        if extension in ALLOWED_IMAGE_EXTENSIONS or extension in CHAT_DOCUMENT_MIME_TYPES:
-            encoded = base64.b64encode(filepath.read_bytes()).decode("utf-8")
-            model_part: dict[str, Any] = {
-                "inline_data": {"mime_type": detected_mime, "data": encoded}
-            }
-        else:
-            if text is None:
-                return None
-            model_part = {"text": f"--- File: {original_name} ---\n{text}\n--- End File ---"}
-    except (OSError, UnicodeError):
-        return None
+    if inline:
+        model_part: dict[str, Any] = {
+            "inline_data": {"mime_type": detected_mime, "data": prepared.data}
+        }
+    else:
+        if prepared.text is None:
+            return None
+        model_part = {"text": f"--- File: {original_name} ---\n{prepared.text}\n--- End File ---"}
 
     return {
         "path": str(filepath),
@@ -0,0 +1,343 @@
+"""Embedded SQLite storage for guest chat sessions.
+
+Each session is one metadata row plus one row per history entry, so a turn only
+upserts the entries that changed instead of re-serializing the whole chat.
+``last_updated`` is indexed for listing and retention. Legacy
+``<session_id>.json`` files in ``CHATS_FOLDER`` are imported on first access.
+The uploads and generated images a session references are kept in
+``guest_chat_file_ref`` by the same transaction, for the attachment collector.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from config import CHATS_FOLDER
+from services.attachment_lifecycle import collect_managed_references
+from utils import json_codec
+from utils.responses import logger
+from utils.storage_codec import pack_message_payload, unpack_message_payload
+
+STORE_FILENAME = "guest_chats.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS guest_chat (
+    session_id TEXT PRIMARY KEY,
+    last_updated REAL NOT NULL,
+    meta TEXT NOT NULL,
+    fence INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_guest_chat_last_updated ON guest_chat (last_updated);
+CREATE TABLE IF NOT EXISTS guest_chat_message (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS guest_chat_summary (
+    session_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS guest_chat_file_ref (
+    session_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    PRIMARY KEY (session_id, kind, filename)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_guest_chat_file_ref_file ON guest_chat_file_ref (kind, filename);
+"""
+# PRAGMA user_version once guest_chat_file_ref has been filled for existing sessions.
+_FILE_REFS_VERSION = 1
+
+
+class StaleFencingToken(RuntimeError):
+    pass
+
+
+def _dumps(value: Any) -> str:
+    return json_codec.dumps(value)
+
+
+class GuestChatStore:
+    def __init__(self, folder: Path) -> None:
+        self.folder = Path(folder)
+        self.path = self.folder / STORE_FILENAME
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections are per thread and per process: gunicorn may fork after
+        # the master touched the store, and sqlite handles must not cross forks.
+        pid = os.getpid()
+        connection = getattr(self._local, "connection", None)
+        if connection is None or getattr(self._local, "pid", None) != pid:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=10.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+            self._local.pid = pid
+            if connection.execute("PRAGMA user_version").fetchone()[0] < _FILE_REFS_VERSION:
+                self._backfill_file_refs(connection)
+        return connection
+
+    def _backfill_file_refs(self, connection: sqlite3.Connection) -> None:
+        # Legacy JSON chats are imported first so that every guest reference is
+        # visible to the collector; write() records the references of each one.
+        for legacy_path in sorted(self.folder.glob("*.json")):
+            row = connection.execute(
+                "SELECT 1 FROM guest_chat WHERE session_id = ?", (legacy_path.stem,)
+            ).fetchone()
+            if row is None:
+                self._import_legacy(legacy_path.stem)
+        with self._transaction() as transaction:
+            for (session_id,) in transaction.execute(
+                "SELECT session_id FROM guest_chat"
+            ).fetchall():
+                payloads = []
+                for (payload,) in transaction.execute(
+                    "SELECT payload FROM guest_chat_message WHERE session_id = ?", (session_id,)
+                ):
+                    try:
+                        payloads.append(unpack_message_payload(payload))
+                    except (TypeError, ValueError, zlib.error):
+                        continue
+                self._sync_file_refs(transaction, session_id, payloads)
+            transaction.execute(f"PRAGMA user_version = {_FILE_REFS_VERSION}")
+
+    @staticmethod
+    def _sync_file_refs(
+        connection: sqlite3.Connection, safe_session_id: str, history: list[dict]
+    ) -> None:
+        references = collect_managed_references(history)
+        wanted = {(kind, filename) for kind, names in references.items() for filename in names}
+        existing = set(
+            connection.execute(
+                "SELECT kind, filename FROM guest_chat_file_ref WHERE session_id = ?",
+                (safe_session_id,),
+            ).fetchall()
+        )
+        connection.executemany(
+            "DELETE FROM guest_chat_file_ref WHERE session_id = ? AND kind = ? AND filename = ?",
+            [(safe_session_id, kind, filename) for kind, filename in existing - wanted],
+        )
+        connection.executemany(
+            "INSERT OR IGNORE INTO guest_chat_file_ref (session_id, kind, filename) "
+            "VALUES (?, ?, ?)",
+            [(safe_session_id, kind, filename) for kind, filename in wanted - existing],
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _legacy_path(self, safe_session_id: str) -> Path:
+        return self.folder / f"{safe_session_id}.json"
+
+    def _import_legacy(self, safe_session_id: str) -> dict:
+        legacy_path = self._legacy_path(safe_session_id)
+        if not legacy_path.is_file():
+            return {}
+        try:
+            data = json_codec.loads(legacy_path.read_bytes())
+        except (OSError, UnicodeError, json.JSONDecodeError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        self.write(safe_session_id, data)
+        return data
+
+    def read(self, safe_session_id: str) -> dict:
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT meta FROM guest_chat WHERE session_id = ?", (safe_session_id,)
+        ).fetchone()
+        if row is None:
+            return self._import_legacy(safe_session_id)
+        try:
+            data = json_codec.loads(row[0])
+        except (TypeError, ValueError):
+            data = {}
+        history = []
+        for (payload,) in connection.execute(
+            "SELECT payload FROM guest_chat_message WHERE session_id = ? ORDER BY seq",
+            (safe_session_id,),
+        ):
+            try:
+                history.append(unpack_message_payload(payload))
+            except (TypeError, ValueError, zlib.error):
+                continue
+        data["history"] = history
+        return data
+
+    def exists(self, safe_session_id: str) -> bool:
+        row = (
+            self._connection()
+            .execute("SELECT 1 FROM guest_chat WHERE session_id = ?", (safe_session_id,))
+            .fetchone()
+        )
+        return row is not None or self._legacy_path(safe_session_id).is_file()
+
+    def write(self, safe_session_id: str, data: dict, *, fence: int | None = None) -> None:
+        history = data.get("history")
+        history = (
+            [message for message in history if isinstance(message, dict)]
+            if isinstance(history, list)
+            else []
+        )
+        meta = {key: value for key, value in data.items() if key != "history"}
+        try:
+            last_updated = float(data.get("last_updated") or time.time())
+        except (TypeError, ValueError):
+            last_updated = time.time()
+
+        with self._transaction() as connection:
+            if fence is not None:
+                row = connection.execute(
+                    "SELECT fence FROM guest_chat WHERE session_id = ?", (safe_session_id,)
+                ).fetchone()
+                if row is not None and row[0] > fence:
+                    # A newer lock holder already wrote; this writer's lease expired.
+                    raise StaleFencingToken(safe_session_id)
+            connection.execute(
+                "INSERT INTO guest_chat (session_id, last_updated, meta, fence) "
+                "VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET last_updated = excluded.last_updated, "
+                "meta = excluded.meta, fence = max(guest_chat.fence, excluded.fence)",
+                (safe_session_id, last_updated, _dumps(meta), fence or 0),
+            )
+            # Unchanged entries are skipped by the WHERE clause, so appending a
+            # turn writes only the new rows plus any node whose flags flipped.
+            connection.executemany(
+                "INSERT INTO guest_chat_message (session_id, seq, payload) VALUES (?, ?, ?) "
+                "ON CONFLICT (session_id, seq) DO UPDATE SET payload = excluded.payload "
+                "WHERE guest_chat_message.payload <> excluded.payload",
+                [
+                    (safe_session_id, seq, pack_message_payload(message))
+                    for seq, message in enumerate(history)
+                ],
+            )
+            connection.execute(
+                "DELETE FROM guest_chat_message WHERE session_id = ? AND seq >= ?",
+                (safe_session_id, len(history)),
+            )
+            self._sync_file_refs(connection, safe_session_id, history)
+
+        legacy_path = self._legacy_path(safe_session_id)
+        if legacy_path.exists():
+            try:
+                legacy_path.unlink()
+            except OSError:
+                logger.warning("Could not remove a migrated guest chat file", exc_info=True)
+
+    def delete(self, safe_session_id: str) -> bool:
+        with self._transaction() as connection:
+            deleted = connection.execute(
+                "DELETE FROM guest_chat WHERE session_id = ?", (safe_session_id,)
+            ).rowcount
+            connection.execute(
+                "DELETE FROM guest_chat_message WHERE session_id = ?", (safe_session_id,)
+            )
+            connection.execute(
+                "DELETE FROM guest_chat_summary WHERE session_id = ?", (safe_session_id,)
+            )
+            connection.execute(
+                "DELETE FROM guest_chat_file_ref WHERE session_id = ?", (safe_session_id,)
+            )
+        legacy_path = self._legacy_path(safe_session_id)
+        if legacy_path.exists():
+            legacy_path.unlink()
+            deleted = 1
+        return bool(deleted)
+
+    def read_summary(self, safe_session_id: str) -> dict | None:
+        row = (
+            self._connection()
+            .execute(
+                "SELECT payload FROM guest_chat_summary WHERE session_id = ?", (safe_session_id,)
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        try:
+            parsed = json_codec.loads(row[0])
+        except (TypeError, ValueError):
+            return None
+        return parsed if isinstance(parsed, dict) else None
+
+    def write_summary(self, safe_session_id: str, summary: dict) -> bool:
+        # Only sessions that still exist keep a summary; a chat deleted while the
+        # summary was being built must not be resurrected by it.
+        with self._transaction() as connection:
+            return bool(
+                connection.execute(
+                    "INSERT INTO guest_chat_summary (session_id, payload) "
+                    "SELECT session_id, ? FROM guest_chat WHERE session_id = ? "
+                    "ON CONFLICT (session_id) DO UPDATE SET payload = excluded.payload",
+                    (_dumps(summary), safe_session_id),
+                ).rowcount
+            )
+
+    def session_ids(
+        self,
+        *,
+        updated_before: float | None = None,
+        prefix: str = "",
+        limit: int | None = None,
+    ) -> list[str]:
+        query = "SELECT session_id FROM guest_chat WHERE 1 = 1"
+        params: list[Any] = []
+        if updated_before is not None:
+            query += " AND last_updated <= ?"
+            params.append(updated_before)
+        if prefix:
+            escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            query += " AND session_id LIKE ? ESCAPE '\\'"
+            params.append(f"{escaped}%")
+        query += " ORDER BY last_updated DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        return [row[0] for row in self._connection().execute(query, params)]
+
+    def references_file(self, kind: str, filename: str) -> bool:
+        row = (
+            self._connection()
+            .execute(
+                "SELECT 1 FROM guest_chat_file_ref WHERE kind = ? AND filename = ? LIMIT 1",
+                (kind, filename),
+            )
+            .fetchone()
+        )
+        return row is not None
+
+
+_STORES: dict[Path, GuestChatStore] = {}
+_STORES_GUARD = threading.Lock()
+
+
+def get_guest_chat_store(folder: Path | None = None) -> GuestChatStore:
+    key = Path(folder or CHATS_FOLDER).resolve()
+    with _STORES_GUARD:
+        store = _STORES.get(key)
+        if store is None:
+            store = GuestChatStore(key)
+            _STORES[key] = store
+        return store
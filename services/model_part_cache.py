@@ -0,0 +1,125 @@
+"""Bounded cache of stored uploads already prepared for the model.
+
+Restoring an earlier attachment for the model validates it (size, MIME sniffing,
+PIL verification) and base64-encodes it on every turn. Prepared files are kept
+in an in-process LRU bounded by ``MODEL_PART_CACHE_MAX_BYTES`` and keyed by the
+stored file name, size and mtime, so a replaced file is never served stale. With
+``MODEL_PART_CACHE_DIR`` set, the validated classification is also written to
+disk, letting other workers and restarts skip validation and only re-encode.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from config import MODEL_PART_CACHE_DIR, MODEL_PART_CACHE_MAX_BYTES
+from utils import json_codec
+from utils.observability import MODEL_PART_CACHE_REQUESTS_TOTAL
+
+CacheKey = tuple[str, int, int]
+
+
+@dataclass(frozen=True)
+class PreparedFile:
+    mime_type: str
+    text: str | None = None
+    data: str | None = None
+
+    @property
+    def cost(self) -> int:
+        return len(self.data or "") + len(self.text or "") + 256
+
+
+def file_cache_key(filename: str, stat: os.stat_result) -> CacheKey:
+    return (filename, int(stat.st_size), int(stat.st_mtime_ns))
+
+
+class ModelPartCache:
+    def __init__(self, max_bytes: int, directory: str | Path | None = None) -> None:
+        self.max_bytes = max(0, int(max_bytes))
+        self.directory = Path(directory) if directory else None
+        self._entries: OrderedDict[CacheKey, PreparedFile] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey) -> PreparedFile | None:
+        """Cached file for ``key``; a disk hit carries no ``data`` and must be re-encoded."""
+        with self._lock:
+            prepared = self._entries.get(key)
+            if prepared is not None:
+                self._entries.move_to_end(key)
+                MODEL_PART_CACHE_REQUESTS_TOTAL.labels(result="hit").inc()
+                return prepared
+        prepared = self._read_disk(key)
+        MODEL_PART_CACHE_REQUESTS_TOTAL.labels(result="disk_hit" if prepared else "miss").inc()
+        return prepared
+
+    def put(self, key: CacheKey, prepared: PreparedFile, *, persist: bool = True) -> None:
+        if persist:
+            self._write_disk(key, prepared)
+        cost = prepared.cost
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous.cost
+            self._entries[key] = prepared
+            self._size += cost
+            while self._size > self.max_bytes and self._entries:
+                _evicted_key, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.cost
+
+    def discard(self, filename: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == filename]:
+                self._size -= self._entries.pop(key).cost
+        if self.directory is not None:
+            try:
+                (self.directory / f"{filename}.json").unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _read_disk(self, key: CacheKey) -> PreparedFile | None:
+        if self.directory is None:
+            return None
+        try:
+            record = json_codec.loads((self.directory / f"{key[0]}.json").read_bytes())
+        except (OSError, ValueError):
+            return None
+        if not isinstance(record, dict) or record.get("key") != list(key):
+            return None
+        mime_type = record.get("mime_type")
+        text = record.get("text")
+        if not isinstance(mime_type, str) or not (text is None or isinstance(text, str)):
+            return None
+        return PreparedFile(mime_type=mime_type, text=text)
+
+    def _write_disk(self, key: CacheKey, prepared: PreparedFile) -> None:
+        if self.directory is None:
+            return
+        record = {"key": list(key), "mime_type": prepared.mime_type, "text": prepared.text}
+        target = self.directory / f"{key[0]}.json"
+        temp_path = target.with_name(f".{uuid.uuid4().hex}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            temp_path.write_text(json_codec.dumps(record), encoding="utf-8")
+            os.replace(temp_path, target)
+        except OSError:
+            try:
+                temp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+
+model_part_cache = ModelPartCache(MODEL_PART_CACHE_MAX_BYTES, MODEL_PART_CACHE_DIR or None)
@@ -13,6 +13,7 @@ from services.github_app import (
 )
 from services.python_runner import available_input_files, execute_python, python_runner_available
 from services.web_search import public_sources, run_web_search
+from utils import json_codec
 
 logger = logging.getLogger(__name__)
 
@@ -217,20 +218,15 @@ def serialize_tool_output(output: dict[str, Any]) -> str:
         ),
         **output,
     }
-    serialized = json.dumps(
-        envelope,
-        ensure_ascii=False,
-        default=str,
-    )
+    serialized = json_codec.dumps(envelope, default=str)
     if len(serialized) <= MAX_TOOL_OUTPUT_CHARS:
         return serialized
-    return json.dumps(
+    return json_codec.dumps(
         {
             "security": envelope["security"],
             "truncated": True,
             "output_preview": serialized[: MAX_TOOL_OUTPUT_CHARS // 4],
-        },
-        ensure_ascii=False,
+        }
     )
 
 
@@ -0,0 +1,232 @@
+"""Bulk deletion of a signed-in user's chat sessions.
+
+Sessions are removed in batches of ``SESSION_BULK_DELETE_BATCH_SIZE`` with set-based
+statements: one pass over the batch's message payloads releases their managed-file
+references, then every dependent table is cleared with a single ``IN`` delete and the
+batch is committed. Files are left to the attachment sweep. Up to
+``SESSION_BULK_DELETE_INLINE_LIMIT`` sessions are deleted within the request; larger
+selections become a ``chat_delete_job`` run by a background thread, which the client
+polls by its public id. A job whose thread died with its web worker stops updating
+``updated_at``; after ``SESSION_BULK_DELETE_STALE_SECONDS`` the Celery beat task
+``sessions.resume_bulk_deletes`` claims it and finishes it.
+"""
+
+from __future__ import annotations
+
+import secrets
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Iterable
+
+from flask import current_app, has_app_context
+
+from services.attachment_lifecycle import count_managed_references, release_managed_files
+from services.attachment_refs import clear_upload_access_cache
+from utils.auth import (
+    AttachmentRef,
+    ChatDeleteJob,
+    ChatMessage,
+    ChatSearchDocument,
+    ChatShare,
+    ChatShareSnapshot,
+    UserChatHistory,
+    db,
+)
+from utils.observability import SESSIONS_BULK_DELETED_TOTAL
+from utils.responses import logger
+from utils.storage_codec import unpack_message_payload
+
+SESSION_BULK_DELETE_BATCH_SIZE = 200
+SESSION_BULK_DELETE_INLINE_LIMIT = 200
+SESSION_BULK_DELETE_MAX_IDS = 1000
+SESSION_BULK_DELETE_SOURCES = {"web", "telegram"}
+# A live job touches ``updated_at`` after every batch, far more often than this.
+SESSION_BULK_DELETE_STALE_SECONDS = 300
+
+_executor: ThreadPoolExecutor | None = None
+_guard = threading.Lock()
+
+
+def select_chats(
+    user_id: int,
+    *,
+    session_ids: list[str] | None = None,
+    updated_before: datetime | None = None,
+    source: str | None = None,
+) -> list[tuple[int, str]]:
+    """``(id, session_id)`` of the user's chats matching every given selector."""
+    query = db.session.query(UserChatHistory.id, UserChatHistory.session_id).filter(
+        UserChatHistory.user_id == user_id
+    )
+    if session_ids is not None:
+        query = query.filter(UserChatHistory.session_id.in_(session_ids))
+    if updated_before is not None:
+        query = query.filter(UserChatHistory.updated_at < updated_before)
+    if source == "web":
+        query = query.filter(UserChatHistory.source == "web")
+    elif source == "telegram":
+        query = query.filter(UserChatHistory.source.like("telegram\\_%", escape="\\"))
+    return [(chat_id, session_id) for chat_id, session_id in query.order_by(UserChatHistory.id)]
+
+
+def _batch_messages(chat_ids: list[int]) -> Iterable[dict[str, Any]]:
+    rows = db.session.query(ChatMessage.payload_data).filter(ChatMessage.chat_id.in_(chat_ids))
+    for (payload_data,) in rows.yield_per(500):
+        try:
+            yield unpack_message_payload(payload_data)
+        except (TypeError, ValueError, zlib.error):
+            continue
+    # Chats never migrated to chat_message rows still keep their graph in messages_data.
+    legacy = db.session.query(UserChatHistory).filter(
+        UserChatHistory.id.in_(chat_ids), ~UserChatHistory.message_rows.any()
+    )
+    for chat in legacy:
+        yield from chat.get_legacy_messages()
+
+
+def delete_chat_batch(user_id: int, chats: list[tuple[int, str]]) -> int:
+    """Delete one batch of the user's chats in a single transaction."""
+    chat_ids = [chat_id for chat_id, _session_id in chats]
+    if not chat_ids:
+        return 0
+    release_managed_files(count_managed_references(_batch_messages(chat_ids)))
+    for model in (ChatMessage, ChatSearchDocument, ChatShareSnapshot, AttachmentRef):
+        db.session.query(model).filter(model.chat_id.in_(chat_ids)).delete(
+            synchronize_session=False
+        )
+    ChatShare.query.filter(
+        ChatShare.user_id == user_id,
+        ChatShare.session_id.in_([session_id for _chat_id, session_id in chats]),
+    ).delete(synchronize_session=False)
+    deleted = (
+        db.session.query(UserChatHistory)
+        .filter(UserChatHistory.user_id == user_id, UserChatHistory.id.in_(chat_ids))
+        .delete(synchronize_session=False)
+    )
+    db.session.commit()
+    db.session.expire_all()
+    clear_upload_access_cache()
+    SESSIONS_BULK_DELETED_TOTAL.inc(deleted)
+    return deleted
+
+
+def delete_chats(user_id: int, chats: list[tuple[int, str]]) -> int:
+    deleted = 0
+    for start in range(0, len(chats), SESSION_BULK_DELETE_BATCH_SIZE):
+        deleted += delete_chat_batch(user_id, chats[start : start + SESSION_BULK_DELETE_BATCH_SIZE])
+    return deleted
+
+
+def serialize_delete_job(job: ChatDeleteJob) -> dict[str, Any]:
+    return {
+        "job_id": job.public_id,
+        "status": job.status,
+        "total": job.total,
+        "deleted": job.deleted,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _guard:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-bulk-delete")
+        return _executor
+
+
+def _run_delete_job(app, job_id: int) -> None:
+    with app.app_context():
+        job = db.session.get(ChatDeleteJob, job_id)
+        if job is None:
+            return
+        user_id = job.user_id
+        try:
+            job.status = "running"
+            db.session.commit()
+            chat_ids = job.get_chat_ids()
+            for start in range(0, len(chat_ids), SESSION_BULK_DELETE_BATCH_SIZE):
+                # Re-selected per batch, so chats deleted meanwhile are simply skipped.
+                batch_ids = chat_ids[start : start + SESSION_BULK_DELETE_BATCH_SIZE]
+                chats = (
+                    db.session.query(UserChatHistory.id, UserChatHistory.session_id)
+                    .filter(UserChatHistory.user_id == user_id, UserChatHistory.id.in_(batch_ids))
+                    .all()
+                )
+                deleted = delete_chat_batch(user_id, [tuple(chat) for chat in chats])
+                ChatDeleteJob.query.filter_by(id=job_id).update(
+                    {
+                        "deleted": ChatDeleteJob.deleted + deleted,
+                        "updated_at": datetime.utcnow(),
+                    },
+                    synchronize_session=False,
+                )
+                db.session.commit()
+            ChatDeleteJob.query.filter_by(id=job_id).update(
+                {"status": "completed", "updated_at": datetime.utcnow()},
+                synchronize_session=False,
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.exception("Bulk session deletion failed")
+            ChatDeleteJob.query.filter_by(id=job_id).update(
+                {"status": "failed", "error": "delete_failed", "updated_at": datetime.utcnow()},
+                synchronize_session=False,
+            )
+            db.session.commit()
+
+
+def start_delete_job(user_id: int, chats: list[tuple[int, str]]) -> ChatDeleteJob:
+    job = ChatDeleteJob(
+        public_id=f"del_{secrets.token_urlsafe(18)}",
+        user_id=user_id,
+        total=len(chats),
+    )
+    job.set_chat_ids([chat_id for chat_id, _session_id in chats])
+    db.session.add(job)
+    db.session.commit()
+    if has_app_context():
+        _get_executor().submit(_run_delete_job, current_app._get_current_object(), job.id)
+    return job
+
+
+def resume_stale_delete_jobs() -> int:
+    """Finish queued or running jobs abandoned by their worker; returns how many were run."""
+    cutoff = datetime.utcnow() - timedelta(seconds=SESSION_BULK_DELETE_STALE_SECONDS)
+    stale = ChatDeleteJob.updated_at.is_(None) | (ChatDeleteJob.updated_at < cutoff)
+    job_ids = [
+        job_id
+        for (job_id,) in db.session.query(ChatDeleteJob.id)
+        .filter(ChatDeleteJob.status.in_(("queued", "running")), stale)
+        .order_by(ChatDeleteJob.id)
+    ]
+    resumed = 0
+    for job_id in job_ids:
+        # Claimed with a conditional update, so concurrent sweeps never run a job twice.
+        claimed = (
+            ChatDeleteJob.query.filter(
+                ChatDeleteJob.id == job_id,
+                ChatDeleteJob.status.in_(("queued", "running")),
+                stale,
+            ).update(
+                {"status": "running", "updated_at": datetime.utcnow()},
+                synchronize_session=False,
+            )
+            == 1
+        )
+        db.session.commit()
+        if not claimed:
+            continue
+        logger.info("Resuming abandoned bulk session deletion job %s", job_id)
+        _run_delete_job(current_app._get_current_object(), job_id)
+        resumed += 1
+    return resumed
+
+
+def find_delete_job(user_id: int, public_id: str) -> ChatDeleteJob | None:
+    return ChatDeleteJob.query.filter_by(user_id=user_id, public_id=public_id).first()
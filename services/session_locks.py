@@ -0,0 +1,266 @@
+"""Per-session write locks for chat history persistence.
+
+``SESSION_LOCK_BACKEND`` selects how writers to one session are serialized:
+
+* ``memory`` - a ``threading.Lock`` per session; only safe with a single process.
+* ``file`` - ``fcntl.flock`` on one of ``SESSION_LOCK_FILE_STRIPES`` lock files in
+  ``SESSION_LOCK_DIR``, picked by hashing the session id; covers every worker that
+  shares the volume.
+* ``redis`` - ``SET NX PX`` lease in Redis for multi-node deployments.
+
+The file and redis backends hand out a monotonically increasing fencing token per
+session. Stores compare it on write, so a holder whose lease expired mid-write
+cannot overwrite a newer holder's data. Tokens never fall below the current time
+in milliseconds, which keeps them ordered when the backend is switched.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+import weakref
+from pathlib import Path
+
+from config import (
+    REDIS_URL,
+    SESSION_LOCK_BACKEND,
+    SESSION_LOCK_DIR,
+    SESSION_LOCK_LEASE_SECONDS,
+    SESSION_LOCK_WAIT_SECONDS,
+)
+from utils.observability import SESSION_LOCK_TIMEOUTS_TOTAL, SESSION_LOCK_WAIT_DURATION
+from utils.responses import logger
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows development hosts
+    fcntl = None
+
+# Sessions share this many lock files, so the lock directory never grows. Two
+# sessions on one stripe merely serialize their writes.
+SESSION_LOCK_FILE_STRIPES = 1024
+
+
+class SessionLockTimeout(RuntimeError):
+    pass
+
+
+_held_tokens = threading.local()
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def current_fencing_token(key: str) -> int | None:
+    """Fencing token of the session lock this thread holds for ``key``, if any."""
+    return getattr(_held_tokens, "tokens", {}).get(key)
+
+
+class _SessionLock:
+    def __init__(self, provider: "SessionLockProvider", key: str) -> None:
+        self._provider = provider
+        self._key = key
+        self._state = None
+
+    def __enter__(self) -> "_SessionLock":
+        started = time.perf_counter()
+        try:
+            self._state, token = self._provider._acquire(self._key)
+        except SessionLockTimeout:
+            SESSION_LOCK_TIMEOUTS_TOTAL.labels(backend=self._provider.backend).inc()
+            raise
+        finally:
+            SESSION_LOCK_WAIT_DURATION.labels(backend=self._provider.backend).observe(
+                time.perf_counter() - started
+            )
+        if token is not None:
+            tokens = getattr(_held_tokens, "tokens", None)
+            if tokens is None:
+                tokens = _held_tokens.tokens = {}
+            tokens[self._key] = token
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        getattr(_held_tokens, "tokens", {}).pop(self._key, None)
+        self._provider._release(self._key, self._state)
+        self._state = None
+
+
+class SessionLockProvider:
+    backend = "memory"
+
+    def __init__(self) -> None:
+        self._locks: weakref.WeakValueDictionary[str, threading.Lock] = (
+            weakref.WeakValueDictionary()
+        )
+        self._guard = threading.Lock()
+
+    def lock(self, key: str) -> _SessionLock:
+        return _SessionLock(self, key)
+
+    def _thread_lock(self, key: str) -> threading.Lock:
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._locks[key] = lock
+            return lock
+
+    def _acquire_thread_lock(self, key: str) -> threading.Lock:
+        lock = self._thread_lock(key)
+        if not lock.acquire(timeout=SESSION_LOCK_WAIT_SECONDS):
+            raise SessionLockTimeout(key)
+        return lock
+
+    def _acquire(self, key: str):
+        return self._acquire_thread_lock(key), None
+
+    def _release(self, key: str, state) -> None:
+        state.release()
+
+
+class FileSessionLockProvider(SessionLockProvider):
+    backend = "file"
+
+    def __init__(self, directory: Path) -> None:
+        super().__init__()
+        if fcntl is None:
+            raise RuntimeError("fcntl is not available on this platform")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _lock_path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode("utf-8")).digest()
+        stripe = int.from_bytes(digest[:4], "big") % SESSION_LOCK_FILE_STRIPES
+        return self.directory / f"stripe-{stripe:04d}.lock"
+
+    def _acquire(self, key: str):
+        # Threads of one worker queue on the in-process lock first, so each
+        # process holds at most one descriptor per session.
+        thread_lock = self._acquire_thread_lock(key)
+        fd = None
+        try:
+            fd = os.open(str(self._lock_path(key)), os.O_RDWR | os.O_CREAT, 0o600)
+            deadline = time.monotonic() + SESSION_LOCK_WAIT_SECONDS
+            delay = 0.005
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise SessionLockTimeout(key) from None
+                    time.sleep(delay)
+                    delay = min(delay * 2, 0.1)
+            try:
+                previous = int(os.pread(fd, 32, 0).decode("ascii").strip() or 0)
+            except (UnicodeDecodeError, ValueError):
+                previous = 0
+            token = max(previous + 1, _now_ms())
+            encoded = str(token).encode("ascii")
+            os.pwrite(fd, encoded, 0)
+            os.ftruncate(fd, len(encoded))
+        except BaseException:
+            if fd is not None:
+                os.close(fd)
+            thread_lock.release()
+            raise
+        return (thread_lock, fd), token
+
+    def _release(self, key: str, state) -> None:
+        thread_lock, fd = state
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+            thread_lock.release()
+
+
+class RedisSessionLockProvider(SessionLockProvider):
+    backend = "redis"
+    RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+    FENCE_LUA = """
+local token = math.max(tonumber(redis.call('GET', KEYS[1]) or '0') + 1, tonumber(ARGV[1]))
+redis.call('SET', KEYS[1], token)
+return token
+"""
+
+    def __init__(self, client, *, lease_seconds: float) -> None:
+        super().__init__()
+        self.client = client
+        self.lease_ms = max(1000, int(lease_seconds * 1000))
+        self._release_script = client.register_script(self.RELEASE_LUA)
+        self._fence_script = client.register_script(self.FENCE_LUA)
+
+    def _acquire(self, key: str):
+        thread_lock = self._acquire_thread_lock(key)
+        lock_key = f"remind:session_lock:{key}"
+        owner = uuid.uuid4().hex
+        try:
+            deadline = time.monotonic() + SESSION_LOCK_WAIT_SECONDS
+            delay = 0.005
+            while not self.client.set(lock_key, owner, nx=True, px=self.lease_ms):
+                if time.monotonic() >= deadline:
+                    raise SessionLockTimeout(key)
+                time.sleep(delay)
+                delay = min(delay * 2, 0.1)
+            token = int(self._fence_script(keys=[f"remind:session_fence:{key}"], args=[_now_ms()]))
+        except BaseException:
+            thread_lock.release()
+            raise
+        return (thread_lock, lock_key, owner), token
+
+    def _release(self, key: str, state) -> None:
+        thread_lock, lock_key, owner = state
+        try:
+            self._release_script(keys=[lock_key], args=[owner])
+        except Exception:
+            # The lease expires on its own; fencing rejects any late writer.
+            logger.warning("Could not release a session lock", exc_info=True)
+        finally:
+            thread_lock.release()
+
+
+def _build_provider() -> SessionLockProvider:
+    backend = SESSION_LOCK_BACKEND
+    if backend == "file":
+        try:
+            return FileSessionLockProvider(SESSION_LOCK_DIR)
+        except (OSError, RuntimeError):
+            logger.warning("File session locks unavailable; using in-process locks", exc_info=True)
+    elif backend == "redis":
+        try:
+            import redis
+
+            client = redis.from_url(REDIS_URL)
+            client.ping()
+            return RedisSessionLockProvider(client, lease_seconds=SESSION_LOCK_LEASE_SECONDS)
+        except Exception:
+            logger.warning("Redis session locks unavailable; using in-process locks", exc_info=True)
+    return SessionLockProvider()
+
+
+_provider: SessionLockProvider | None = None
+_provider_guard = threading.Lock()
+
+
+def get_session_lock_provider() -> SessionLockProvider:
+    global _provider
+    if _provider is None:
+        with _provider_guard:
+            if _provider is None:
+                _provider = _build_provider()
+    return _provider
+
+
+def session_lock(key: str) -> _SessionLock:
+    return get_session_lock_provider().lock(key)
@@ -0,0 +1,176 @@
+"""Immutable, pre-rendered snapshots of publicly shared chats.
+
+The public view of a share depends only on the share itself, the chat row
+(revision, title, mind) and the mind's last update, so it is rendered once per
+combination of those: the payload is stored as compressed JSON, optionally with
+an HTML fragment for first paint, in ``chat_share_snapshot`` and rebuilt lazily
+when the version changes. The version doubles as a strong ETag, which lets a
+revalidation answer ``304`` without reading the snapshot at all.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from html import escape
+from typing import Any, Callable
+
+from sqlalchemy import and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import defer
+
+from config import SHARE_SNAPSHOT_CACHE_SECONDS, SHARE_SNAPSHOT_HTML
+from services.chat_search import message_search_text
+from utils import json_codec
+from utils.auth import ChatShare, ChatShareSnapshot, Mind, UserChatHistory, db
+from utils.observability import SHARE_SNAPSHOT_REQUESTS_TOTAL
+from utils.storage_codec import decode_value, encode_value
+
+SHARE_SNAPSHOT_HTML_MAX_CHARS = 100_000
+_ROOT_MARKER = '<div id="root"></div>'
+_TITLE_RE = re.compile(r"<title>.*?</title>", re.DOTALL)
+
+
+@dataclass
+class ShareSource:
+    share: ChatShare
+    chat: UserChatHistory
+    mind_updated_at: datetime | None = None
+
+    @property
+    def version(self) -> str:
+        key = [
+            self.share.public_id,
+            bool(self.share.is_public),
+            self.share.updated_at,
+            self.chat.id,
+            self.chat.revision,
+            self.chat.updated_at,
+            self.chat.title,
+            self.chat.mind_id,
+            self.mind_updated_at,
+        ]
+        digest = hashlib.sha256(json_codec.dumps(key, default=str).encode("utf-8"))
+        return digest.hexdigest()[:32]
+
+
+@dataclass
+class ShareSnapshot:
+    version: str
+    payload: dict[str, Any]
+    html: str | None
+
+
+def load_share_source(public_id: str) -> ShareSource | None:
+    """Share, chat and mind timestamp of a public share, in one query."""
+    row = (
+        db.session.query(ChatShare, UserChatHistory, Mind.updated_at)
+        .join(
+            UserChatHistory,
+            and_(
+                UserChatHistory.user_id == ChatShare.user_id,
+                UserChatHistory.session_id == ChatShare.session_id,
+            ),
+        )
+        .outerjoin(Mind, Mind.id == UserChatHistory.mind_id)
+        .filter(ChatShare.public_id == public_id, ChatShare.is_public.is_(True))
+        .options(
+            defer(UserChatHistory.messages_data),
+            defer(UserChatHistory.source_context_data),
+        )
+        .first()
+    )
+    if row is None:
+        return None
+    share, chat, mind_updated_at = row
+    return ShareSource(share=share, chat=chat, mind_updated_at=mind_updated_at)
+
+
+def share_source_for(share: ChatShare, chat: UserChatHistory) -> ShareSource:
+    mind = db.session.get(Mind, chat.mind_id) if chat.mind_id else None
+    return ShareSource(share=share, chat=chat, mind_updated_at=mind.updated_at if mind else None)
+
+
+def share_cache_control() -> str:
+    # Shared caches keep the snapshot for SHARE_SNAPSHOT_CACHE_SECONDS and then
+    # revalidate it with the ETag; browsers always revalidate.
+    return f"public, max-age=0, s-maxage={SHARE_SNAPSHOT_CACHE_SECONDS}, must-revalidate"
+
+
+def render_share_html(payload: dict[str, Any]) -> str:
+    """Static HTML of a shared chat; the SPA replaces it once it mounts."""
+    title = str(payload.get("title") or "")
+    parts = ['<article class="share-snapshot" aria-busy="true">']
+    if title:
+        parts.append(f"<h1>{escape(title)}</h1>")
+    budget = SHARE_SNAPSHOT_HTML_MAX_CHARS
+    for message in payload.get("history") or []:
+        text = message_search_text(message)[:budget]
+        if not text:
+            continue
+        budget -= len(text)
+        role = "user" if message.get("role") == "user" else "model"
+        paragraphs = "".join(
+            f"<p>{escape(paragraph).replace(chr(10), '<br>')}</p>"
+            for paragraph in re.split(r"\n{2,}", text)
+            if paragraph.strip()
+        )
+        parts.append(f'<section class="share-snapshot-message" data-role="{role}">')
+        parts.append(f"{paragraphs}</section>")
+        if budget <= 0:
+            break
+    parts.append("</article>")
+    return "".join(parts)
+
+
+def inject_share_html(index_html: str, fragment: str, title: str | None) -> str:
+    if _ROOT_MARKER not in index_html:
+        return index_html
+    page = index_html.replace(_ROOT_MARKER, f'<div id="root">{fragment}</div>', 1)
+    if title:
+        page = _TITLE_RE.sub(lambda _match: f"<title>{escape(title)} — ReMind</title>", page, 1)
+    return page
+
+
+def get_share_snapshot(
+    source: ShareSource,
+    build_payload: Callable[[ChatShare, UserChatHistory], dict[str, Any]],
+) -> ShareSnapshot:
+    """Stored snapshot for the current version of ``source``, rendering it on a miss."""
+    version = source.version
+    chat_id = source.chat.id
+    row = db.session.get(ChatShareSnapshot, chat_id)
+    if row is not None and row.version == version:
+        SHARE_SNAPSHOT_REQUESTS_TOTAL.labels(result="hit").inc()
+        return ShareSnapshot(
+            version=version,
+            payload=decode_value(row.payload_data),
+            html=decode_value(row.html_data) if row.html_data else None,
+        )
+
+    SHARE_SNAPSHOT_REQUESTS_TOTAL.labels(result="miss").inc()
+    payload = build_payload(source.share, source.chat)
+    html = render_share_html(payload) if SHARE_SNAPSHOT_HTML else None
+    values = {
+        "version": version,
+        "payload_data": encode_value(payload),
+        "html_data": encode_value(html) if html is not None else None,
+        "created_at": datetime.utcnow(),
+    }
+    if row is None:
+        db.session.add(ChatShareSnapshot(chat_id=chat_id, user_id=source.chat.user_id, **values))
+    else:
+        for key, value in values.items():
+            setattr(row, key, value)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another view of the same share stored its snapshot first.
+        db.session.rollback()
+    return ShareSnapshot(version=version, payload=payload, html=html)
+
+
+def drop_share_snapshot(chat_id: int) -> None:
+    ChatShareSnapshot.query.filter_by(chat_id=chat_id).delete(synchronize_session=False)
@@ -6,6 +6,8 @@ import redis
 from celery import shared_task
 
 from ai_engine import get_model_function
+from services.attachment_lifecycle import sweep_managed_files
+from services.session_bulk_delete import resume_stale_delete_jobs
 from utils.logger_config import logger
 
 
@@ -43,3 +45,27 @@ def generate_ai_response(self, channel_id, model_name, db_user_id, user_data):
         r.publish(channel_id, json.dumps({"error": str(e)}))
     finally:
         r.publish(channel_id, "DONE")
+
+
+@shared_task(name="chat.generate", ignore_result=True)
+def generate_chat_response(answer):
+    # Imported here: the route module pulls in the whole web stack.
+    from routes.features.chat import run_chat_generation_job
+
+    run_chat_generation_job(answer)
+
+
+@shared_task(name="attachments.sweep", ignore_result=True)
+def sweep_unreferenced_attachments():
+    result = sweep_managed_files()
+    if result["uploads"] or result["generated_images"]:
+        logger.info("Attachment sweep deleted unreferenced files: %s", result)
+    return result
+
+
+@shared_task(name="sessions.resume_bulk_deletes", ignore_result=True)
+def resume_bulk_session_deletes():
+    resumed = resume_stale_delete_jobs()
+    if resumed:
+        logger.info("Resumed %s abandoned bulk session deletion jobs", resumed)
+    return resumed
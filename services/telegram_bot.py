@@ -45,6 +45,7 @@ from services.chat_history import (
 from services.files import (
     CHAT_UPLOAD_MAX_TOTAL_BYTES,
     handle_file_upload,
+    remove_stored_upload,
     restore_stored_file_for_model,
 )
 from services.telegram_i18n import language_from_telegram, telegram_text
@@ -1072,7 +1073,7 @@ def _remove_uncommitted_upload(file_info: dict[str, Any] | None) -> None:
         upload_root = UPLOAD_FOLDER.resolve()
         path = Path(str(file_info["path"])).resolve()
         if path.parent == upload_root and path.is_file():
-            path.unlink()
+            remove_stored_upload(path)
     except OSError:
         logger.warning("Could not remove an uncommitted Telegram upload", exc_info=True)
 
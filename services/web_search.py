@@ -25,6 +25,7 @@ from config import (
     WEB_SEARCH_PAGE_TEXT_CHARS,
 )
 from services.ai_provider import generate_text, is_ai_provider_configured
+from utils.concurrency import run_blocking
 
 SEARCH_HEADERS = {
     "User-Agent": USER_AGENT,
@@ -1060,7 +1061,8 @@ def web_search_free(query: str, max_results: int | None = None) -> list[dict[str
     if max_results is not None:
         max_results = max(1, int(max_results))
     try:
-        raw_results = _ddgs_text_search(query, max_results)
+        # DDGS does its HTTP in native code, which gevent cannot make cooperative.
+        raw_results = run_blocking(_ddgs_text_search, query, max_results)
     except Exception:
         raw_results = _duckduckgo_html_search(query, max_results)
 
@@ -1093,7 +1095,7 @@ def web_search_news_free(
 ) -> list[dict[str, Any]]:
     if max_results is not None:
         max_results = max(1, int(max_results))
-    raw_results = _ddgs_news_search(query, max_results)
+    raw_results = run_blocking(_ddgs_news_search, query, max_results)
     results: list[dict[str, Any]] = []
     for raw in raw_results:
         url = normalize_search_url(raw.get("url") or raw.get("href") or "")
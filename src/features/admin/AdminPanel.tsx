@@ -1,4 +1,4 @@
-import { useCallback, useDeferredValue, useEffect, useId, useMemo, useState } from 'react';
+import { useCallback, useDeferredValue, useEffect, useId, useMemo, useRef, useState } from 'react';
 import type {
     CSSProperties,
     KeyboardEvent as ReactKeyboardEvent,
@@ -201,11 +201,14 @@ function PaginationControls({
     onPageChange: (page: number) => void;
     pagination: AdminPagination;
 }) {
-    const pageCount = Math.max(1, Math.ceil(pagination.total / pagination.page_size));
+    const total = pagination.total ?? 0;
+    const pageCount = Math.max(pagination.page, Math.ceil(total / pagination.page_size));
+    const hasMore = pagination.has_more ?? pagination.page < pageCount;
+    const suffix = pagination.total_capped ? '+' : '';
     return (
         <div className="admin-pagination">
             <span>
-                {formatNumber(pagination.total)} записей · {pagination.page}/{pageCount}
+                {formatNumber(total)}{suffix} записей · {pagination.page}/{pageCount}{suffix}
             </span>
             <div>
                 <button
@@ -217,7 +220,7 @@ function PaginationControls({
                 </button>
                 <button
                     type="button"
-                    disabled={disabled || pagination.page >= pageCount}
+                    disabled={disabled || !hasMore}
                     onClick={() => onPageChange(pagination.page + 1)}
                 >
                     Вперед
@@ -259,6 +262,9 @@ export default function AdminPanel({ isAuthenticated, onOpenAuth }: {
     const [minds, setMinds] = useState<AdminMind[]>([]);
     const [userPagination, setUserPagination] = useState<AdminPagination>(() => defaultPagination());
     const [mindPagination, setMindPagination] = useState<AdminPagination>(() => defaultPagination());
+    // Keyset cursors of the pages visited so far, keyed by page number.
+    const userCursorsRef = useRef<Record<number, string>>({});
+    const mindCursorsRef = useRef<Record<number, string>>({});
     const [userQuery, setUserQuery] = useState('');
     const [mindQuery, setMindQuery] = useState('');
     const [userStatusFilter, setUserStatusFilter] = useState('all');
@@ -333,12 +339,21 @@ export default function AdminPanel({ isAuthenticated, onOpenAuth }: {
         setLoading(true);
         setError('');
         try {
+            if (page === 1) {
+                userCursorsRef.current = {};
+            }
+            const cursor = userCursorsRef.current[page];
             const data = await apiService.listAdminUsers({
-                page,
+                cursor,
+                page: cursor || page === 1 ? undefined : page,
                 pageSize: userPagination.page_size,
                 q: deferredUserQuery,
                 status: userStatusFilter,
             });
+            const nextCursor = data.pagination.next_cursor;
+            if (nextCursor) {
+                userCursorsRef.current[data.pagination.page + 1] = nextCursor;
+            }
             setUsers(data.users);
             setUserPagination(data.pagination);
         } catch (loadError) {
@@ -353,12 +368,21 @@ export default function AdminPanel({ isAuthenticated, onOpenAuth }: {
         setLoading(true);
         setError('');
         try {
+            if (page === 1) {
+                mindCursorsRef.current = {};
+            }
+            const cursor = mindCursorsRef.current[page];
             const data = await apiService.listAdminMinds({
-                page,
+                cursor,
+                page: cursor || page === 1 ? undefined : page,
                 pageSize: mindPagination.page_size,
                 q: deferredMindQuery,
                 status: mindStatusFilter,
             });
+            const nextCursor = data.pagination.next_cursor;
+            if (nextCursor) {
+                mindCursorsRef.current[data.pagination.page + 1] = nextCursor;
+            }
             setMinds(data.minds);
             setMindPagination(data.pagination);
         } catch (loadError) {
@@ -14,6 +14,7 @@ interface ListSessionsResponse {
     ok?: boolean;
     sessions?: SessionSummary[];
     has_more?: boolean;
+    next_cursor?: string | null;
 }
 
 interface UseSessionListOptions {
@@ -63,12 +64,14 @@ function getGuestSessionTokens(): Record<string, string> {
     }
 }
 
-async function fetchSessionsPage(idsQuery: string, page: number, pageSize: number): Promise<ListSessionsResponse> {
+async function fetchSessionsPage(idsQuery: string, cursor: string | null, pageSize: number): Promise<ListSessionsResponse> {
     const params = new URLSearchParams();
     if (idsQuery) {
         params.set('ids', idsQuery);
     }
-    params.set('page', String(page));
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
     params.set('page_size', String(pageSize));
 
     const guestTokens = getGuestSessionTokens();
@@ -93,18 +96,18 @@ async function fetchSessionsPage(idsQuery: string, page: number, pageSize: numbe
 
 async function loadAllPages(idsQuery = ''): Promise<SessionSummary[]> {
     const merged: SessionSummary[] = [];
-    let page = 1;
+    let cursor: string | null = null;
     const pageSize = 50;
 
-    while (page <= 20) {
-        const data = await fetchSessionsPage(idsQuery, page, pageSize);
+    for (let page = 1; page <= 20; page += 1) {
+        const data = await fetchSessionsPage(idsQuery, cursor, pageSize);
         if (Array.isArray(data?.sessions) && data.sessions.length > 0) {
             merged.push(...data.sessions);
         }
-        if (!data?.has_more) {
+        cursor = data?.next_cursor || null;
+        if (!data?.has_more || !cursor) {
             break;
         }
-        page += 1;
     }
 
     return merged;
@@ -120,6 +120,7 @@ export interface components {
     ChatOperationRequest: {
       assistant_message_id: string;
       history?: components["schemas"]["ChatMessage"][];
+      history_since?: components["schemas"]["HistoryCursor"];
       message?: string;
       model?: string;
       operation?: "send" | "regenerate" | "edit";
@@ -132,10 +133,12 @@ export interface components {
     };
     ChatOperationResponse: {
       delivery_status?: "complete" | "interrupted";
-      history: components["schemas"]["ChatMessage"][];
+      history?: components["schemas"]["ChatMessage"][];
+      history_delta?: components["schemas"]["HistoryDelta"];
       ok: boolean;
       reply?: string;
       request_id: string;
+      revision?: number;
       sessionId: string;
       [key: string]: unknown;
     };
@@ -157,6 +160,14 @@ export interface components {
       uptime_seconds: number;
       [key: string]: unknown;
     };
+    HistoryCursor: number | string;
+    HistoryDelta: {
+      length: number;
+      messages: components["schemas"]["ChatMessage"][];
+      offset: number;
+      revision: number;
+      since: number | string;
+    };
     MessageFileRef: {
       mime_type?: string;
       original_name?: string | null;
@@ -220,8 +231,29 @@ export interface components {
       ok: boolean;
       request_id?: string | null;
     };
+    SearchSnippetSegment: {
+      match: boolean;
+      text: string;
+    };
+    SessionBulkDeleteRequest: {
+      session_ids?: string[];
+      source?: "web" | "telegram";
+      updated_before?: string;
+    };
+    SessionBulkDeleteResponse: {
+      created_at?: string | null;
+      deleted: number;
+      error?: string | null;
+      job_id?: string;
+      ok: boolean;
+      request_id?: string | null;
+      status: "queued" | "running" | "completed" | "failed";
+      total: number;
+      updated_at?: string | null;
+    };
     SessionHistoryResponse: {
-      history: components["schemas"]["ChatMessage"][];
+      history?: components["schemas"]["ChatMessage"][];
+      history_delta?: components["schemas"]["HistoryDelta"];
       is_owner?: boolean;
       is_public?: boolean;
       mind?: components["schemas"]["Mind"] | null;
@@ -229,6 +261,7 @@ export interface components {
       public_id?: string | null;
       read_only?: boolean;
       request_id?: string | null;
+      revision?: number;
       session_id: string;
       share_url?: string | null;
       title?: string | null;
@@ -236,20 +269,25 @@ export interface components {
     };
     SessionListResponse: {
       has_more: boolean;
+      next_cursor: string | null;
       ok: boolean;
       page: number;
       page_size: number;
       request_id?: string | null;
       sessions: components["schemas"]["SessionSummary"][];
-      total: number;
+      total?: number;
+      total_capped?: boolean;
     };
     SessionSummary: {
+      has_attachments?: boolean;
       is_public?: boolean;
       last_message: string;
       last_updated: number;
+      message_count?: number;
       mind?: components["schemas"]["Mind"] | null;
       public_id?: string | null;
       session_id: string;
+      snippet?: components["schemas"]["SearchSnippetSegment"][];
       source?: "web" | "telegram_private" | "telegram_group" | "telegram_guest" | "telegram_inline";
       title: string;
     };
@@ -579,6 +617,32 @@ export interface paths {
       };
     };
   };
+  "/api/share/{public_id}": {
+    get: {
+      parameters: {
+        path: {
+          public_id: string;
+        };
+        header: {
+          If-None-Match?: string;
+        };
+      };
+      responses: {
+        "200": {
+          content: {
+            "application/json": components["schemas"]["SessionHistoryResponse"];
+          };
+        };
+        "304": {
+        };
+        "404": {
+          content: {
+            "application/json": components["schemas"]["ErrorResponse"];
+          };
+        };
+      };
+    };
+  };
   "/api/user/draft": {
     delete: {
       responses: {
@@ -658,6 +722,68 @@ export interface paths {
       };
     };
   };
+  "/chat/stream/{request_id}": {
+    get: {
+      parameters: {
+        query: {
+          last_event_id?: number;
+        };
+        path: {
+          request_id: string;
+        };
+        header: {
+          Last-Event-ID?: number;
+        };
+      };
+      responses: {
+        "200": {
+          content: {
+            "text/event-stream": string;
+          };
+        };
+        "400": {
+          content: {
+            "application/json": components["schemas"]["ErrorResponse"];
+          };
+        };
+        "404": {
+          content: {
+            "application/json": components["schemas"]["ErrorResponse"];
+          };
+        };
+        "410": {
+          content: {
+            "application/json": components["schemas"]["ErrorResponse"];
+          };
+        };
+      };
+    };
+  };
+  "/chat/stream/{request_id}/cancel": {
+    post: {
+      parameters: {
+        path: {
+          request_id: string;
+        };
+      };
+      responses: {
+        "200": {
+          content: {
+            "application/json": {
+              cancelled: boolean;
+              ok: boolean;
+              request_id: string;
+            };
+          };
+        };
+        "404": {
+          content: {
+            "application/json": components["schemas"]["ErrorResponse"];
+          };
+        };
+      };
+    };
+  };
   "/health": {
     get: {
       responses: {
@@ -678,9 +804,12 @@ export interface paths {
     get: {
       parameters: {
         query: {
+          cursor?: string;
           ids?: string;
+          include_total?: boolean;
           page?: number;
           page_size?: number;
+          q?: string;
         };
       };
       responses: {
@@ -692,6 +821,53 @@ export interface paths {
       };
     };
   };
+  "/sessions/bulk-delete": {
+    post: {
+      requestBody: {
+        content: {
+          "application/json": components["schemas"]["SessionBulkDeleteRequest"];
+        };
+      };
+      responses: {
+        "200": {
+          content: {
+            "application/json": components["schemas"]["SessionBulkDeleteResponse"];
+          };
+        };
+        "202": {
+          content: {
+            "application/json": components["schemas"]["SessionBulkDeleteResponse"];
+          };
+        };
+        "400": {
+          content: {
+            "application/json": components["schemas"]["ErrorResponse"];
+          };
+        };
+      };
+    };
+  };
+  "/sessions/bulk-delete/{job_id}": {
+    get: {
+      parameters: {
+        path: {
+          job_id: string;
+        };
+      };
+      responses: {
+        "200": {
+          content: {
+            "application/json": components["schemas"]["SessionBulkDeleteResponse"];
+          };
+        };
+        "404": {
+          content: {
+            "application/json": components["schemas"]["ErrorResponse"];
+          };
+        };
+      };
+    };
+  };
   "/sessions/{session_id}/branch": {
     put: {
       parameters: {
@@ -754,9 +930,15 @@ export interface paths {
   "/sessions/{session_id}/history": {
     get: {
       parameters: {
+        query: {
+          since?: components["schemas"]["HistoryCursor"];
+        };
         path: {
           session_id: string;
         };
+        header: {
+          If-None-Match?: string;
+        };
       };
       responses: {
         "200": {
@@ -764,6 +946,13 @@ export interface paths {
             "application/json": components["schemas"]["SessionHistoryResponse"];
           };
         };
+        "304": {
+        };
+        "400": {
+          content: {
+            "application/json": components["schemas"]["ErrorResponse"];
+          };
+        };
         "401": {
           content: {
             "application/json": components["schemas"]["ErrorResponse"];
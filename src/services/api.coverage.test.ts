@@ -163,6 +163,63 @@ describe('apiService coverage', () => {
         );
     });
 
+    it('resumes a dropped numbered stream after the last event id', async () => {
+        const encoder = new TextEncoder();
+        const droppedReader = {
+            read: vi.fn()
+                .mockResolvedValueOnce({
+                    done: false,
+                    value: encoder.encode(
+                        'id: 1\ndata: {"status":"generating_text"}\n\n' +
+                        'id: 2\ndata: {"reply_part":"Hel"}\n\n',
+                    ),
+                })
+                .mockRejectedValueOnce(new TypeError('network error')),
+        };
+        const resumedReader = {
+            read: vi.fn()
+                .mockResolvedValueOnce({
+                    done: false,
+                    value: encoder.encode(
+                        'id: 3\ndata: {"reply_part":"lo"}\n\n' +
+                        ': keep-alive\n\n' +
+                        'id: 4\ndata: {"reply":"Hello","sessionId":"abc"}\n\n',
+                    ),
+                })
+                .mockResolvedValueOnce({ done: true }),
+        };
+
+        const fetchMock = vi.fn()
+            .mockResolvedValueOnce(
+                createJsonResponse(null, {
+                    headers: { 'content-type': 'text/event-stream', 'X-Chat-Request-Id': 'req_12345678' },
+                    body: { getReader: () => droppedReader },
+                }),
+            )
+            .mockResolvedValueOnce(
+                createJsonResponse(null, {
+                    headers: { 'content-type': 'text/event-stream' },
+                    body: { getReader: () => resumedReader },
+                }),
+            );
+        vi.stubGlobal('fetch', fetchMock);
+
+        const onPart = vi.fn();
+        const onComplete = vi.fn();
+        const onError = vi.fn();
+
+        await apiService.chat(new FormData(), undefined, { onPart, onComplete, onError });
+
+        const [resumeUrl, resumeOptions] = fetchMock.mock.calls[1];
+        expect(String(resumeUrl)).toContain('/chat/stream/req_12345678');
+        expect(resumeOptions.headers).toEqual({ 'Last-Event-ID': '2' });
+        expect(onPart).toHaveBeenCalledWith(expect.objectContaining({ reply_part: 'lo' }));
+        expect(onError).not.toHaveBeenCalled();
+        expect(onComplete).toHaveBeenCalledWith(
+            expect.objectContaining({ reply: 'Hello', sessionId: 'abc' }),
+        );
+    });
+
     it('handles plain chat responses, errors, and aborts', async () => {
         const successFetch = vi.fn().mockResolvedValue(
             createJsonResponse(
@@ -189,6 +246,14 @@ describe('apiService coverage', () => {
         const abortedComplete = vi.fn();
         await apiService.chat(new FormData(), undefined, { onComplete: abortedComplete });
         expect(abortedComplete).toHaveBeenCalledWith({ aborted: true });
+
+        const stoppedForm = new FormData();
+        stoppedForm.append('request_id', 'req_stop_1');
+        await apiService.chat(stoppedForm, undefined, { onComplete: abortedComplete });
+        expect(abortFetch).toHaveBeenLastCalledWith(
+            expect.stringContaining('/chat/stream/req_stop_1/cancel'),
+            expect.objectContaining({ method: 'POST', keepalive: true }),
+        );
     });
 
     it('supports session list and guest-token session operations', async () => {
@@ -219,6 +284,45 @@ describe('apiService coverage', () => {
         expect((deleteOptions.headers as Headers).get('Authorization')).toBe('Bearer jwt-token');
     });
 
+    it('revalidates held session history and applies history deltas', async () => {
+        const first = { id: 'u_1', role: 'user', parts: [{ text: 'hi' }] };
+        const reply = { id: 'm_1', role: 'model', parts: [{ text: 'hello' }] };
+        const regenerated = { id: 'm_2', role: 'model', parts: [{ text: 'hey' }] };
+        const next = { id: 'u_2', role: 'user', parts: [{ text: 'more' }] };
+        const fetchMock = vi.fn()
+            .mockResolvedValueOnce(createJsonResponse(
+                { ok: true, session_id: 'hist-1', is_owner: true, history: [first, reply], revision: 3 },
+                { headers: { ETag: '"e1"' } },
+            ))
+            .mockResolvedValueOnce(createJsonResponse(
+                {
+                    ok: true,
+                    session_id: 'hist-1',
+                    is_owner: true,
+                    revision: 5,
+                    history_delta: { revision: 5, since: 3, offset: 1, length: 3, messages: [regenerated, next] },
+                },
+                { headers: { ETag: '"e2"' } },
+            ))
+            .mockResolvedValueOnce(createJsonResponse(null, { ok: false, status: 304, headers: { ETag: '"e2"' } }));
+        vi.stubGlobal('fetch', fetchMock);
+
+        await apiService.getSessionHistory('hist-1');
+        const updated = await apiService.getSessionHistory('hist-1');
+        const unchanged = await apiService.getSessionHistory('hist-1');
+
+        expect(updated.history).toEqual([first, regenerated, next]);
+        expect(updated).not.toHaveProperty('history_delta');
+        expect(unchanged).toBe(updated);
+
+        const [deltaUrl, deltaOptions] = fetchMock.mock.calls[1];
+        expect(deltaUrl).toContain('/sessions/hist-1/history?since=3');
+        expect((deltaOptions.headers as Headers).get('If-None-Match')).toBeNull();
+        const [revalidateUrl, revalidateOptions] = fetchMock.mock.calls[2];
+        expect(revalidateUrl).toContain('?since=5');
+        expect((revalidateOptions.headers as Headers).get('If-None-Match')).toBe('"e2"');
+    });
+
     it('calls wrapper endpoints for session and privacy actions', async () => {
         const fetchMock = vi.fn().mockResolvedValue(createJsonResponse({ ok: true }));
         vi.stubGlobal('fetch', fetchMock);
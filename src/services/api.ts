@@ -1,6 +1,5 @@
 import { SERIOUS_ERROR_KEYPHRASES } from '../utils/constants';
 import {
-    apiGetSessionHistory,
     apiListSessions,
     apiSynthesize,
     apiTranslate,
@@ -12,12 +11,16 @@ import {
 import {
     buildApiUrl,
     getCsrfToken,
+    requestConditionalJson,
     requestJson,
     withCsrfHeaders,
+    type ConditionalJsonResponse,
     type RequestJsonOptions,
 } from './http';
 
 const GUEST_SESSION_TOKENS_KEY = 'guest_chat_tokens';
+const CHAT_STREAM_RESUME_ATTEMPTS = 3;
+const SESSION_HISTORY_CACHE_LIMIT = 20;
 
 type GuestSessionTokenMap = Record<string, string>;
 
@@ -92,6 +95,7 @@ type ListSessionsOptions =
     | string
     | {
           idsQuery?: string;
+          cursor?: string | null;
           page?: number;
           pageSize?: number;
       };
@@ -312,7 +316,10 @@ type MindCategoryResponse = {
 export type AdminPagination = {
     page: number;
     page_size: number;
-    total: number;
+    total?: number;
+    total_capped?: boolean;
+    has_more?: boolean;
+    next_cursor?: string | null;
 };
 
 export type AdminUser = {
@@ -577,6 +584,63 @@ function getGuestSessionTokens(): GuestSessionTokenMap {
     }
 }
 
+type CachedSessionHistory = {
+    etag: string;
+    since: number | null;
+    body: SessionHistoryWithMind;
+};
+
+// Last history body per session with its ETag. API responses are no-store, so the
+// client revalidates these itself and asks only for what changed after `revision`.
+const sessionHistoryCache = new Map<string, CachedSessionHistory>();
+
+function rememberSessionHistory(sessionId: string, entry: CachedSessionHistory): void {
+    sessionHistoryCache.delete(sessionId);
+    sessionHistoryCache.set(sessionId, entry);
+    while (sessionHistoryCache.size > SESSION_HISTORY_CACHE_LIMIT) {
+        const oldest = sessionHistoryCache.keys().next().value;
+        if (oldest === undefined) break;
+        sessionHistoryCache.delete(oldest);
+    }
+}
+
+function applySessionHistoryDelta(
+    held: SessionHistoryWithMind,
+    received: SessionHistoryWithMind
+): SessionHistoryWithMind | null {
+    const delta = received.history_delta;
+    if (!delta) {
+        return received;
+    }
+    const heldHistory = held.history ?? [];
+    if (
+        delta.offset > heldHistory.length ||
+        received.is_owner !== held.is_owner ||
+        received.is_public !== held.is_public
+    ) {
+        return null;
+    }
+    const history = [...heldHistory.slice(0, delta.offset), ...delta.messages];
+    if (history.length !== delta.length) {
+        return null;
+    }
+    const { history_delta: _historyDelta, ...rest } = received;
+    return { ...rest, history };
+}
+
+function parseStreamEvent(frame: string): { id: string; data: string } | null {
+    let id = '';
+    const data: string[] = [];
+    for (const line of frame.split('\n')) {
+        if (line.startsWith('data: ')) {
+            data.push(line.substring(6));
+        } else if (line.startsWith('id: ')) {
+            id = line.substring(4);
+        }
+    }
+    return data.length ? { id, data: data.join('\n') } : null;
+}
+
 function toApiServiceError(error: unknown): ApiServiceError {
     return error instanceof Error ? (error as ApiServiceError) : new Error(String(error));
 }
@@ -640,6 +704,7 @@ export const apiService = {
         callbacks: ChatCallbacks = {}
     ): Promise<void> {
         const { onPart, onComplete, onError, onWidgetUpdate, onCanvasUpdate, onOpen } = callbacks;
+        let streamRequestId = String(formData.get('request_id') || '');
 
         try {
             const sessionId = String(formData.get('session_id') || '');
@@ -678,135 +743,191 @@ export const apiService = {
 
             const contentType = response.headers.get('content-type');
             if (contentType?.includes('text/event-stream')) {
-                const reader = response.body?.getReader();
-                if (!reader) {
-                    throw new Error('Streaming response body is missing.');
-                }
-
-                const decoder = new TextDecoder();
-                let buffer = '';
+                const requestId = response.headers.get('X-Chat-Request-Id') || '';
+                streamRequestId = requestId || streamRequestId;
                 let finalData: ChatStreamResult = {};
                 let receivedTerminalEvent = false;
+                let lastEventId = '';
 
-                while (true) {
-                    const { value, done } = await reader.read();
-                    if (done) break;
+                const handleEvent = (data: ChatStreamResult) => {
+                    if (data.widget_update && onWidgetUpdate) {
+                        try {
+                            onWidgetUpdate(data.widget_update);
+                        } catch (widgetError) {
+                            console.warn('onWidgetUpdate handler error', widgetError);
+                        }
 
-                    buffer += decoder.decode(value, { stream: true });
-                    const parts = buffer.split('\n\n');
-                    buffer = parts.pop() ?? '';
+                        finalData = { ...finalData, widget_update: data.widget_update };
+                        return;
+                    }
 
-                    for (const part of parts) {
-                        if (!part.startsWith('data: ')) {
-                            continue;
+                    if (data.canvas_update && onCanvasUpdate) {
+                        try {
+                            onCanvasUpdate(data.canvas_update);
+                        } catch (canvasError) {
+                            console.warn('onCanvasUpdate handler error', canvasError);
                         }
 
-                        try {
-                            const data = JSON.parse(part.substring(6)) as ChatStreamResult;
+                        finalData = {
+                            ...finalData,
+                            canvas_update: data.canvas_update,
+                        };
+                        if (data.canvas_update.textdoc !== undefined) {
+                            finalData.canvas_textdoc = data.canvas_update.textdoc;
+                        }
+                        return;
+                    }
 
-                            if (data.widget_update && onWidgetUpdate) {
-                                try {
-                                    onWidgetUpdate(data.widget_update);
-                                } catch (widgetError) {
-                                    console.warn('onWidgetUpdate handler error', widgetError);
-                                }
+                    const shouldEmitPart = [
+                        'reply_part',
+                        'status',
+                        'images',
+                        'sources',
+                        'thinkingTime',
+                        'thinking_update',
+                        'canvas_textdoc',
+                        'canvas_updates',
+                    ].some((key) => key in data);
+
+                    if (shouldEmitPart) {
+                        onPart?.(data);
+                    }
 
-                                finalData = { ...finalData, widget_update: data.widget_update };
-                                continue;
-                            }
+                    if ('reply' in data || data.end_of_stream) {
+                        finalData = { ...finalData, ...data };
+                        receivedTerminalEvent = true;
+                    }
 
-                            if (data.canvas_update && onCanvasUpdate) {
-                                try {
-                                    onCanvasUpdate(data.canvas_update);
-                                } catch (canvasError) {
-                                    console.warn('onCanvasUpdate handler error', canvasError);
-                                }
-
-                                finalData = {
-                                    ...finalData,
-                                    canvas_update: data.canvas_update,
-                                };
-                                if (data.canvas_update.textdoc !== undefined) {
-                                    finalData.canvas_textdoc = data.canvas_update.textdoc;
-                                }
-                                continue;
-                            }
+                    if ('sources' in data) finalData.sources = data.sources;
+                    if ('images' in data) finalData.images = data.images;
+                    if ('thinkingTime' in data) {
+                        finalData.thinkingTime = data.thinkingTime;
+                    }
+                    if ('status' in data) finalData.status = data.status;
+                    if ('sessionId' in data) finalData.sessionId = data.sessionId;
+                    if ('sessionSlug' in data) {
+                        finalData.sessionSlug = data.sessionSlug;
+                    }
+                    if ('canvas_textdoc' in data) {
+                        finalData.canvas_textdoc = data.canvas_textdoc;
+                    }
+                    if ('canvas_updates' in data) {
+                        finalData.canvas_updates = data.canvas_updates;
+                    }
+                    if ('canvas_update' in data) {
+                        finalData.canvas_update = data.canvas_update;
+                        if (data.canvas_update?.textdoc !== undefined) {
+                            finalData.canvas_textdoc = data.canvas_update.textdoc;
+                        }
+                    }
 
-                            const shouldEmitPart = [
-                                'reply_part',
-                                'status',
-                                'images',
-                                'sources',
-                                'thinkingTime',
-                                'thinking_update',
-                                'canvas_textdoc',
-                                'canvas_updates',
-                            ].some((key) => key in data);
-
-                            if (shouldEmitPart) {
-                                onPart?.(data);
-                            }
+                    const knownKeys = new Set([
+                        'reply',
+                        'reply_part',
+                        'end_of_stream',
+                        'images',
+                        'sources',
+                        'thinkingTime',
+                        'thinking_update',
+                        'status',
+                        'aborted',
+                        'sessionId',
+                        'sessionSlug',
+                        'widget_update',
+                        'canvas_update',
+                        'canvas_updates',
+                        'canvas_textdoc',
+                    ]);
+
+                    Object.keys(data).forEach((key) => {
+                        if (!knownKeys.has(key)) {
+                            finalData[key] = data[key];
+                        }
+                    });
+                };
 
-                            if ('reply' in data || data.end_of_stream) {
-                                finalData = { ...finalData, ...data };
-                                receivedTerminalEvent = true;
-                            }
+                const readEvents = async (body: Response['body']) => {
+                    const reader = body?.getReader();
+                    if (!reader) {
+                        throw new Error('Streaming response body is missing.');
+                    }
 
-                            if ('sources' in data) finalData.sources = data.sources;
-                            if ('images' in data) finalData.images = data.images;
-                            if ('thinkingTime' in data) {
-                                finalData.thinkingTime = data.thinkingTime;
-                            }
-                            if ('status' in data) finalData.status = data.status;
-                            if ('sessionId' in data) finalData.sessionId = data.sessionId;
-                            if ('sessionSlug' in data) {
-                                finalData.sessionSlug = data.sessionSlug;
-                            }
-                            if ('canvas_textdoc' in data) {
-                                finalData.canvas_textdoc = data.canvas_textdoc;
+                    const decoder = new TextDecoder();
+                    let buffer = '';
+
+                    while (true) {
+                        const { value, done } = await reader.read();
+                        if (done) break;
+
+                        buffer += decoder.decode(value, { stream: true });
+                        const parts = buffer.split('\n\n');
+                        buffer = parts.pop() ?? '';
+
+                        for (const part of parts) {
+                            const event = parseStreamEvent(part);
+                            if (!event) {
+                                continue;
                             }
-                            if ('canvas_updates' in data) {
-                                finalData.canvas_updates = data.canvas_updates;
+                            if (event.id) {
+                                lastEventId = event.id;
                             }
-                            if ('canvas_update' in data) {
-                                finalData.canvas_update = data.canvas_update;
-                                if (data.canvas_update?.textdoc !== undefined) {
-                                    finalData.canvas_textdoc = data.canvas_update.textdoc;
-                                }
+
+                            try {
+                                handleEvent(JSON.parse(event.data) as ChatStreamResult);
+                            } catch (chunkError) {
+                                console.error(
+                                    'Error parsing stream data chunk:',
+                                    chunkError,
+                                    'Chunk:',
+                                    event.data
+                                );
                             }
+                        }
+                    }
+                };
+
+                // Numbered streams are journaled server-side: a dropped connection resumes
+                // after the last received event instead of failing the whole answer.
+                let streamBody = response.body;
+                for (let attempt = 0; ; attempt += 1) {
+                    try {
+                        await readEvents(streamBody);
+                    } catch (streamError) {
+                        const typedStreamError = toApiServiceError(streamError);
+                        const resumable = Boolean(requestId && lastEventId) &&
+                            attempt < CHAT_STREAM_RESUME_ATTEMPTS;
+                        if (typedStreamError.name === 'AbortError' || !resumable) {
+                            throw streamError;
+                        }
+                    }
+                    if (
+                        receivedTerminalEvent ||
+                        !requestId ||
+                        !lastEventId ||
+                        attempt >= CHAT_STREAM_RESUME_ATTEMPTS
+                    ) {
+                        break;
+                    }
 
-                            const knownKeys = new Set([
-                                'reply',
-                                'reply_part',
-                                'end_of_stream',
-                                'images',
-                                'sources',
-                                'thinkingTime',
-                                'thinking_update',
-                                'status',
-                                'aborted',
-                                'sessionId',
-                                'sessionSlug',
-                                'widget_update',
-                                'canvas_update',
-                                'canvas_updates',
-                                'canvas_textdoc',
-                            ]);
-
-                            Object.keys(data).forEach((key) => {
-                                if (!knownKeys.has(key)) {
-                                    finalData[key] = data[key];
-                                }
-                            });
-                        } catch (chunkError) {
-                            console.error(
-                                'Error parsing stream data chunk:',
-                                chunkError,
-                                'Chunk:',
-                                part.substring(6)
-                            );
+                    if (attempt > 0) {
+                        await new Promise((resolve) => setTimeout(resolve, 500 * attempt));
+                    }
+                    const resumed = await fetch(
+                        buildApiUrl(`/chat/stream/${encodeURIComponent(requestId)}`),
+                        {
+                            method: 'GET',
+                            credentials: 'include',
+                            headers: { 'Last-Event-ID': lastEventId },
+                            ...(signal ? { signal } : {}),
                         }
+                    );
+                    if (
+                        !resumed.ok ||
+                        !resumed.headers.get('content-type')?.includes('text/event-stream')
+                    ) {
+                        break;
                     }
+                    streamBody = resumed.body;
                 }
 
                 if (!receivedTerminalEvent) {
@@ -826,6 +947,14 @@ export const apiService = {
                 console.error('API Chat Error:', typedError);
                 onError?.(typedError);
             } else {
+                // Aborting the fetch alone would let the server finish the answer for a
+                // resume; tell it the user stopped generation.
+                if (streamRequestId) {
+                    void fetch(
+                        buildApiUrl(`/chat/stream/${encodeURIComponent(streamRequestId)}/cancel`),
+                        withCsrfHeaders({ method: 'POST', credentials: 'include', keepalive: true })
+                    ).catch(() => undefined);
+                }
                 onComplete?.({ aborted: true });
             }
         }
@@ -840,6 +969,7 @@ export const apiService = {
             : undefined;
 
         let idsQuery = '';
+        let cursor = '';
         let page = 1;
         let pageSize = 50;
 
@@ -847,6 +977,7 @@ export const apiService = {
             idsQuery = options;
         } else if (options && typeof options === 'object') {
             idsQuery = options.idsQuery || '';
+            cursor = options.cursor || '';
             page = Number(options.page || 1);
             pageSize = Number(options.pageSize || 50);
         }
@@ -855,21 +986,52 @@ export const apiService = {
             return apiListSessions(idsQuery ? { ids: idsQuery } : {}, headers);
         }
 
-        const query: { ids?: string; page: number; page_size: number } = {
-            page,
-            page_size: pageSize,
-        };
+        const query: { ids?: string; cursor?: string; page?: number; page_size: number } = cursor
+            ? { cursor, page_size: pageSize }
+            : { page, page_size: pageSize };
         if (idsQuery) query.ids = idsQuery;
 
         return apiListSessions(query, headers);
     },
 
-    async getSessionHistory(sessionId: string): Promise<SessionHistoryWithMind> {
+    async getSessionHistory(sessionId: string, { full = false } = {}): Promise<SessionHistoryWithMind> {
         const token = getGuestSessionToken(sessionId);
-        const headers: HeadersInit | undefined = token
-            ? { Authorization: `Bearer ${token}` }
-            : undefined;
-        return apiGetSessionHistory(sessionId, headers) as Promise<SessionHistoryWithMind>;
+        const cached = full ? undefined : sessionHistoryCache.get(sessionId);
+        const revision = cached?.body.revision;
+        const since = typeof revision === 'number' && revision > 0 ? revision : null;
+        const headers = new Headers(token ? { Authorization: `Bearer ${token}` } : undefined);
+        if (cached && cached.since === since) {
+            headers.set('If-None-Match', cached.etag);
+        }
+
+        let result: ConditionalJsonResponse<SessionHistoryWithMind>;
+        try {
+            result = await requestConditionalJson<SessionHistoryWithMind>(
+                `/sessions/${encodeURIComponent(sessionId)}/history`,
+                { method: 'GET', headers, ...(since !== null ? { query: { since } } : {}) }
+            );
+        } catch (error) {
+            sessionHistoryCache.delete(sessionId);
+            throw error;
+        }
+
+        if (result.notModified && cached) {
+            rememberSessionHistory(sessionId, cached);
+            return cached.body;
+        }
+        const received = result.data as SessionHistoryWithMind;
+        const body = cached ? applySessionHistoryDelta(cached.body, received) : received;
+        if (!body) {
+            // The held copy no longer lines up with the delta: start over from the full history.
+            sessionHistoryCache.delete(sessionId);
+            return this.getSessionHistory(sessionId, { full: true });
+        }
+        if (result.etag) {
+            rememberSessionHistory(sessionId, { etag: result.etag, since, body });
+        } else {
+            sessionHistoryCache.delete(sessionId);
+        }
+        return body;
     },
 
     async selectSessionBranch(sessionId: string, messageId: string): Promise<SessionHistoryWithMind> {
@@ -1135,6 +1297,7 @@ export const apiService = {
     },
 
     async listAdminUsers(params: {
+        cursor?: string;
         page?: number;
         pageSize?: number;
         q?: string;
@@ -1143,8 +1306,10 @@ export const apiService = {
         const data = await fetchApi<AdminUsersResponse>('/api/admin/users', {
             method: 'GET',
             query: {
+                cursor: params.cursor,
                 page: params.page,
                 page_size: params.pageSize,
+                include_total: '1',
                 q: params.q,
                 status: params.status,
             },
@@ -1180,6 +1345,7 @@ export const apiService = {
     },
 
     async listAdminMinds(params: {
+        cursor?: string;
         page?: number;
         pageSize?: number;
         q?: string;
@@ -1188,8 +1354,10 @@ export const apiService = {
         const data = await fetchApi<AdminMindsResponse>('/api/admin/minds', {
             method: 'GET',
             query: {
+                cursor: params.cursor,
                 page: params.page,
                 page_size: params.pageSize,
+                include_total: '1',
                 q: params.q,
                 status: params.status,
             },
@@ -215,3 +215,31 @@ export async function requestJson<TResponse>(
 
     return response.json() as Promise<TResponse>;
 }
+
+export type ConditionalJsonResponse<TResponse> = {
+    data: TResponse | null;
+    etag: string | null;
+    notModified: boolean;
+};
+
+// GET with caller-managed validators: a 304 resolves with notModified instead of throwing.
+export async function requestConditionalJson<TResponse>(
+    path: string,
+    options: RequestJsonOptions = {}
+): Promise<ConditionalJsonResponse<TResponse>> {
+    const requestOptions = withCsrfHeaders({
+        ...options,
+        credentials: options.credentials || 'include',
+    });
+    const response = await fetch(buildApiUrl(path, options.query), requestOptions);
+    rememberCsrfTokenFromResponse(response);
+    const etag = response.headers?.get?.('ETag') || null;
+
+    if (response.status === 304) {
+        return { data: null, etag, notModified: true };
+    }
+    if (!response.ok) {
+        throw buildApiClientError(response, await readResponseData(response));
+    }
+    return { data: (await response.json()) as TResponse, etag, notModified: false };
+}
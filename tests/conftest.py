@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+# config.py reads the environment at import time, so the app under test is
+# configured before anything imports it.
+_DB_DIR = tempfile.mkdtemp(prefix="remind-tests-")
+os.environ.update(
+    {
+        "LOAD_DOTENV": "false",
+        "FLASK_DEBUG": "1",
+        "SECRET_KEY": "test-secret-key-" + "x" * 32,
+        "DATABASE_URL": f"sqlite:///{os.path.join(_DB_DIR, 'remind.db')}",
+    }
+)
+
+import pytest  # noqa: E402
+
+BROWSER_USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0 Safari/537.36"
+)
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app_factory import create_app
+
+    return create_app()
+
+
+@pytest.fixture
+def db(app):
+    from utils.auth import db as database
+
+    with app.app_context():
+        yield database
+        database.session.rollback()
+        for table in reversed(database.metadata.sorted_tables):
+            database.session.execute(table.delete())
+        database.session.commit()
+        database.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    test_client = app.test_client()
+    test_client.environ_base["HTTP_USER_AGENT"] = BROWSER_USER_AGENT
+    return test_client
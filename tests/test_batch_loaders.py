@@ -0,0 +1,85 @@
+"""Listing endpoints issue the same number of queries whatever the page size."""
+
+import pytest
+from sqlalchemy import event
+
+LISTINGS = [
+    ("/sessions", "sessions"),
+    ("/api/minds", "minds"),
+    ("/api/admin/users", "users"),
+    ("/api/admin/minds", "minds"),
+]
+ROWS = 30
+
+
+@pytest.fixture
+def admin_id(db):
+    from utils.auth import Mind, MindPin, User, UserChatHistory
+
+    admin = User(username="admin", email="admin@example.com", is_admin=True)
+    owners = [User(username=f"owner{i}", email=f"owner{i}@example.com") for i in range(ROWS)]
+    db.session.add(admin)
+    db.session.add_all(owners)
+    db.session.flush()
+    for i, owner in enumerate(owners):
+        mind = Mind(
+            public_id=f"mind{i}",
+            user_id=owner.id,
+            name=f"Mind {i}",
+            description="description",
+            instructions="instructions",
+            visibility="store",
+        )
+        db.session.add(mind)
+        db.session.flush()
+        if i % 2:
+            db.session.add(MindPin(user_id=admin.id, mind_id=mind.id))
+        db.session.add(
+            UserChatHistory(
+                user_id=admin.id,
+                session_id=f"s{i}",
+                title=f"Chat {i}",
+                mind_id=mind.id,
+                # Chats written by the app carry their summary; legacy rows are backfilled once.
+                message_count=2,
+            )
+        )
+        db.session.add(
+            UserChatHistory(
+                user_id=owner.id,
+                session_id=f"o{i}",
+                title=f"Chat {i}",
+                mind_id=mind.id,
+                message_count=2,
+            )
+        )
+    db.session.commit()
+    return admin.id
+
+
+@pytest.fixture
+def statements(db):
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(db.engine, "before_cursor_execute", record)
+
+
+@pytest.mark.parametrize(("path", "key"), LISTINGS)
+def test_query_count_does_not_grow_with_page_size(client, admin_id, statements, path, key):
+    with client.session_transaction() as session:
+        session["user_id"] = admin_id
+
+    counts = []
+    for page_size in (3, 25):
+        statements.clear()
+        response = client.get(f"{path}?page_size={page_size}")
+        assert response.status_code == 200, response.get_json()
+        assert len(response.get_json()[key]) == page_size
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1]
@@ -4,6 +4,8 @@ import os
 import re
 import secrets
 import unicodedata
+import zlib
+from collections import Counter
 from datetime import datetime, timedelta
 from typing import Any
 from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
@@ -26,15 +28,17 @@ from flask import (
 )
 from flask_sqlalchemy import SQLAlchemy
 from itsdangerous import BadData, URLSafeTimedSerializer
-from sqlalchemy import bindparam, func, inspect, text
+from sqlalchemy import bindparam, func, inspect, or_, text
 from sqlalchemy.exc import IntegrityError
 from werkzeug.security import check_password_hash, generate_password_hash
 
+from . import json_codec
 from .input_validation import InputValidator, ValidationError
 from .mailer import send_email
 from .rate_limiting import login_limiter, rate_limit
 from .responses import make_error
 from .session_security import is_loopback_hostname, resolve_cookie_domain
+from .storage_codec import pack_message_payload, unpack_message_payload
 
 db: Any = SQLAlchemy()
 oauth = OAuth()
@@ -629,6 +633,7 @@ class UserChatHistory(db.Model):
             "external_ref_hash",
             name="uq_user_chat_history_user_external_ref",
         ),
+        db.Index("ix_user_chat_history_user_updated", "user_id", "updated_at", "id"),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -643,21 +648,98 @@ class UserChatHistory(db.Model):
     )
     external_ref_hash = db.Column(db.String(64), nullable=True, index=True)
     source_context_data = db.Column(db.Text, default="{}", nullable=False)
-    messages_data = db.Column(db.Text, default="[]")  # JSON array of messages
+    # Legacy JSON array of messages. Conversation graphs now live in ``chat_message``;
+    # this column is only read for chats that have not been migrated yet.
+    messages_data = db.Column(db.Text, default="[]")
+    # Bumped on every graph write; writers compare-and-swap on it.
+    revision = db.Column(db.Integer, default=0, server_default=text("0"), nullable=False)
+    # JSON [[message_id, variant_index, variant_count], ...] for the active branch,
+    # rewritten with each graph write. NULL means it has not been computed yet.
+    active_path_data = db.Column(db.Text, nullable=True)
+    # JSON {"through_id", "text"}: rolling summary of the turns older than the model
+    # context window. Only read by the context window engine, so it is deferred.
+    context_summary_data = db.deferred(db.Column(db.Text, nullable=True))
+    # Sidebar summary of the active branch, rewritten with each graph write so
+    # session lists never load messages. NULL message_count means not computed yet.
+    last_message_preview = db.Column(db.String(120), nullable=True)
+    message_count = db.Column(db.Integer, nullable=True)
+    last_activity_at = db.Column(db.DateTime, nullable=True)
+    has_attachments = db.Column(
+        db.Boolean, default=False, server_default=text("FALSE"), nullable=False
+    )
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    message_rows = db.relationship(
+        "ChatMessage",
+        back_populates="chat",
+        cascade="all, delete-orphan",
+        order_by="ChatMessage.position",
+        lazy="select",
+    )
+    search_document = db.relationship(
+        "ChatSearchDocument",
+        back_populates="chat",
+        cascade="all, delete-orphan",
+        uselist=False,
+        lazy="select",
+    )
+    share_snapshot = db.relationship(
+        "ChatShareSnapshot",
+        back_populates="chat",
+        cascade="all, delete-orphan",
+        uselist=False,
+        lazy="select",
+    )
+    attachment_refs = db.relationship(
+        "AttachmentRef",
+        back_populates="chat",
+        cascade="all, delete-orphan",
+        lazy="select",
+    )
 
     def __repr__(self):
         return f"<UserChatHistory {self.session_id}>"
 
-    def get_messages(self):
+    @classmethod
+    def messages_contain(cls, fragment: str):
+        return or_(
+            cls.messages_data.contains(fragment),
+            cls.message_rows.any(ChatMessage.payload_data.contains(fragment)),
+        )
+
+    def get_legacy_messages(self):
         try:
-            return json.loads(self.messages_data) if self.messages_data else []
+            parsed = json_codec.loads(self.messages_data) if self.messages_data else []
+            return parsed if isinstance(parsed, list) else []
         except (TypeError, ValueError, json.JSONDecodeError):
             return []
 
+    def get_messages(self):
+        if self.id is not None and self.message_rows:
+            return [row.to_message() for row in self.message_rows]
+        return self.get_legacy_messages()
+
     def set_messages(self, messages):
-        self.messages_data = json.dumps(messages, ensure_ascii=False)
+        self.message_rows = [
+            ChatMessage.from_message(message, position=position)
+            for position, message in enumerate(messages or [])
+            if isinstance(message, dict) and message.get("id")
+        ]
+        self.messages_data = "[]"
+        self.active_path_data = None
+
+    def get_active_path(self):
+        if self.active_path_data is None:
+            return None
+        try:
+            parsed = json_codec.loads(self.active_path_data)
+        except (TypeError, ValueError, json.JSONDecodeError):
+            return None
+        if not isinstance(parsed, list) or not all(
+            isinstance(entry, list) and len(entry) == 3 for entry in parsed
+        ):
+            return None
+        return [(str(entry[0]), int(entry[1]), int(entry[2])) for entry in parsed]
 
     def get_source_context(self):
         try:
@@ -685,6 +767,272 @@ class UserChatHistory(db.Model):
         }
 
 
+class ChatMessage(db.Model):
+    """One node of a conversation graph; ``parent_id`` refers to another ``message_id``."""
+
+    __tablename__ = "chat_message"
+    __table_args__ = (
+        db.UniqueConstraint("chat_id", "message_id", name="uq_chat_message_chat_message"),
+        db.Index("ix_chat_message_chat_parent", "chat_id", "parent_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    chat_id = db.Column(
+        db.Integer,
+        db.ForeignKey("user_chat_history.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    message_id = db.Column(db.String(200), nullable=False)
+    parent_id = db.Column(db.String(200), nullable=True)
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    role = db.Column(db.String(16), default="user", nullable=False)
+    payload_data = db.Column(db.Text, default="{}", nullable=False)
+    # Chat revision that last inserted or changed this row; drives incremental sync.
+    revision = db.Column(db.Integer, default=0, server_default=text("0"), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    chat = db.relationship("UserChatHistory", back_populates="message_rows")
+
+    @staticmethod
+    def _payload_from_message(message: dict[str, Any]) -> str:
+        return pack_message_payload(
+            {
+                key: value
+                for key, value in message.items()
+                if key not in {"id", "parent_id", "is_active"}
+            }
+        )
+
+    @classmethod
+    def from_message(
+        cls, message: dict[str, Any], *, position: int, revision: int = 0
+    ) -> "ChatMessage":
+        return cls(
+            message_id=str(message.get("id")),
+            parent_id=message.get("parent_id"),
+            is_active=bool(message.get("is_active", True)),
+            position=position,
+            role=str(message.get("role") or "user")[:16],
+            payload_data=cls._payload_from_message(message),
+            revision=revision,
+        )
+
+    def update_from_message(
+        self, message: dict[str, Any], *, payload: bool = False, revision: int | None = None
+    ) -> bool:
+        changed = False
+        parent_id = message.get("parent_id")
+        is_active = bool(message.get("is_active", True))
+        if self.parent_id != parent_id:
+            self.parent_id = parent_id
+            changed = True
+        if self.is_active != is_active:
+            self.is_active = is_active
+            changed = True
+        if payload:
+            payload_data = self._payload_from_message(message)
+            if self.payload_data != payload_data:
+                self.payload_data = payload_data
+                changed = True
+        if changed and revision is not None:
+            self.revision = revision
+        return changed
+
+    def to_message(self) -> dict[str, Any]:
+        try:
+            message = unpack_message_payload(self.payload_data)
+        except (TypeError, ValueError, zlib.error):
+            message = {}
+        message["id"] = self.message_id
+        message.setdefault("role", self.role)
+        message["parent_id"] = self.parent_id
+        message["is_active"] = bool(self.is_active)
+        return message
+
+
+class ChatSearchDocument(db.Model):
+    """Plain text of a chat's title and messages, fed to the full-text index.
+
+    PostgreSQL indexes it through the generated ``search_vector`` column and
+    SQLite through the ``chat_search_fts`` FTS5 table; both are created by
+    ``_ensure_chat_search_index`` because neither fits the portable model.
+    """
+
+    __tablename__ = "chat_search_document"
+
+    chat_id = db.Column(
+        db.Integer,
+        db.ForeignKey("user_chat_history.id", ondelete="CASCADE"),
+        primary_key=True,
+        autoincrement=False,
+    )
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    title = db.Column(db.Text, default="", nullable=False)
+    body = db.Column(db.Text, default="", nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    chat = db.relationship("UserChatHistory", back_populates="search_document")
+
+
+class ChatShareSnapshot(db.Model):
+    """Pre-rendered public view of a shared chat, rebuilt when ``version`` goes stale.
+
+    ``version`` hashes everything the public view depends on (share state, chat
+    revision and title, mind), so a snapshot is immutable for a given version.
+    """
+
+    __tablename__ = "chat_share_snapshot"
+
+    chat_id = db.Column(
+        db.Integer,
+        db.ForeignKey("user_chat_history.id", ondelete="CASCADE"),
+        primary_key=True,
+        autoincrement=False,
+    )
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    version = db.Column(db.String(64), nullable=False)
+    # storage_codec-compressed JSON payload and HTML fragment.
+    payload_data = db.Column(db.Text, nullable=False)
+    html_data = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    chat = db.relationship("UserChatHistory", back_populates="share_snapshot")
+
+
+class AttachmentRef(db.Model):
+    """An ``/uploads/<filename>`` attachment referenced by one message of a chat.
+
+    Rows are rewritten with every chat write and ``is_public`` follows the
+    chat's share, so serving an upload is one lookup by ``filename``.
+    """
+
+    __tablename__ = "attachment_ref"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "chat_id", "message_id", "filename", name="uq_attachment_ref_chat_message_file"
+        ),
+        db.Index("ix_attachment_ref_filename_user", "filename", "user_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(64), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    chat_id = db.Column(
+        db.Integer,
+        db.ForeignKey("user_chat_history.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    session_id = db.Column(db.String(100), nullable=False)
+    message_id = db.Column(db.String(200), nullable=False)
+    original_name = db.Column(db.String(255), nullable=True)
+    mime_type = db.Column(db.String(128), nullable=True)
+    is_public = db.Column(db.Boolean, default=False, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    chat = db.relationship("UserChatHistory", back_populates="attachment_refs")
+
+
+class ManagedFile(db.Model):
+    """Number of signed-in users' chat messages referencing an upload or generated image.
+
+    Chat writes adjust ``ref_count`` in their own transaction. ``released_at`` is
+    set when the count drops to zero, and the garbage collector removes files
+    that stay unreferenced, here and in the guest chat store, past a grace period.
+    """
+
+    __tablename__ = "managed_file"
+    __table_args__ = (
+        db.UniqueConstraint("kind", "filename", name="uq_managed_file_kind_filename"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)
+    filename = db.Column(db.String(128), nullable=False)
+    ref_count = db.Column(db.Integer, default=0, server_default=text("0"), nullable=False)
+    released_at = db.Column(db.DateTime, nullable=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ChatDeleteJob(db.Model):
+    """Bulk session deletion running in the background; ``public_id`` is the client's handle."""
+
+    __tablename__ = "chat_delete_job"
+
+    id = db.Column(db.Integer, primary_key=True)
+    public_id = db.Column(db.String(64), nullable=False, unique=True, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    status = db.Column(db.String(20), default="queued", nullable=False)
+    chat_ids_data = db.Column(db.Text, default="[]", nullable=False)
+    total = db.Column(db.Integer, default=0, nullable=False)
+    deleted = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.String(200), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def get_chat_ids(self) -> list[int]:
+        try:
+            parsed = json_codec.loads(self.chat_ids_data) if self.chat_ids_data else []
+        except (TypeError, ValueError):
+            return []
+        return [int(chat_id) for chat_id in parsed if isinstance(chat_id, int)]
+
+    def set_chat_ids(self, chat_ids: list[int]) -> None:
+        self.chat_ids_data = json_codec.dumps([int(chat_id) for chat_id in chat_ids])
+
+
+# Composite indexes matching the keyset order of the paginated listings.
+LISTING_KEYSET_INDEXES = frozenset(
+    {
+        "ix_user_chat_history_user_updated",
+        "ix_mind_store_listing",
+        "ix_mind_user_updated",
+        "ix_mind_featured_updated",
+        "ix_mind_pin_user_created",
+    }
+)
+
+CHAT_SEARCH_POSTGRES_DDL = (
+    "ALTER TABLE chat_search_document ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(body, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_chat_search_document_vector "
+    "ON chat_search_document USING gin (search_vector)",
+)
+# External-content FTS5 table kept in step with chat_search_document by triggers.
+CHAT_SEARCH_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chat_search_fts USING fts5("
+    "title, body, content='chat_search_document', content_rowid='chat_id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS chat_search_document_ai AFTER INSERT ON chat_search_document "
+    "BEGIN INSERT INTO chat_search_fts(rowid, title, body) "
+    "VALUES (new.chat_id, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS chat_search_document_ad AFTER DELETE ON chat_search_document "
+    "BEGIN INSERT INTO chat_search_fts(chat_search_fts, rowid, title, body) "
+    "VALUES ('delete', old.chat_id, old.title, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS chat_search_document_au AFTER UPDATE ON chat_search_document "
+    "BEGIN INSERT INTO chat_search_fts(chat_search_fts, rowid, title, body) "
+    "VALUES ('delete', old.chat_id, old.title, old.body); "
+    "INSERT INTO chat_search_fts(rowid, title, body) "
+    "VALUES (new.chat_id, new.title, new.body); END",
+)
+
+
+def _ensure_chat_search_index(engine) -> None:
+    dialect = engine.dialect.name
+    if dialect in {"postgresql", "postgres"}:
+        statements = CHAT_SEARCH_POSTGRES_DDL
+    elif dialect == "sqlite":
+        statements = CHAT_SEARCH_SQLITE_DDL
+    else:
+        return
+    try:
+        with engine.begin() as connection:
+            for statement in statements:
+                connection.execute(text(statement))
+    except Exception as exc:
+        # Without the index, session search falls back to LIKE over the documents.
+        current_app.logger.warning("Could not create the chat search index: %s", exc)
+
+
 class TelegramInlineResult(db.Model):
     __tablename__ = "telegram_inline_result"
 
@@ -773,6 +1121,13 @@ class ChatShare(db.Model):
 
 class Mind(db.Model):
     __tablename__ = "mind"
+    __table_args__ = (
+        db.Index(
+            "ix_mind_store_listing", "visibility", "is_featured", "is_verified", "updated_at", "id"
+        ),
+        db.Index("ix_mind_user_updated", "user_id", "updated_at", "id"),
+        db.Index("ix_mind_featured_updated", "is_featured", "updated_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     public_id = db.Column(db.String(128), unique=True, nullable=False, index=True)
@@ -827,7 +1182,10 @@ class Mind(db.Model):
 
 class MindPin(db.Model):
     __tablename__ = "mind_pin"
-    __table_args__ = (db.UniqueConstraint("user_id", "mind_id", name="uq_mind_pin_user_mind"),)
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "mind_id", name="uq_mind_pin_user_mind"),
+        db.Index("ix_mind_pin_user_created", "user_id", "created_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
@@ -973,6 +1331,60 @@ def _remove_legacy_default_minds(app):
         app.logger.exception("Failed to remove legacy default minds")
 
 
+def _backfill_attachment_refs(app, batch_size: int = 200) -> None:
+    # Databases upgraded without Alembic build the upload index once, when the
+    # attachment_ref table is first created; chat writes keep it current after that.
+    from services.attachment_refs import index_chat_attachments
+
+    try:
+        last_id = 0
+        while True:
+            chats = (
+                UserChatHistory.query.filter(UserChatHistory.id > last_id)
+                .order_by(UserChatHistory.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not chats:
+                break
+            for chat in chats:
+                index_chat_attachments(chat)
+            last_id = chats[-1].id
+            db.session.commit()
+            db.session.expunge_all()
+    except Exception:
+        db.session.rollback()
+        app.logger.exception("Failed to backfill attachment references")
+
+
+def _backfill_managed_files(app, batch_size: int = 200) -> None:
+    # Counts for chats written before managed_file existed; one transaction, so a
+    # failed backfill leaves no partial counts behind.
+    from services.attachment_lifecycle import count_managed_references, retain_managed_files
+
+    try:
+        counts = Counter()
+        last_id = 0
+        while True:
+            chats = (
+                UserChatHistory.query.filter(UserChatHistory.id > last_id)
+                .order_by(UserChatHistory.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not chats:
+                break
+            for chat in chats:
+                counts.update(count_managed_references(chat.get_messages()))
+            last_id = chats[-1].id
+            db.session.expunge_all()
+        retain_managed_files(counts)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        app.logger.exception("Failed to backfill managed file references")
+
+
 def is_valid_password(password):
 
     if len(password) < 8:
@@ -3519,6 +3931,9 @@ def setup_auth(app):
         )
         app.logger.info("Google OAuth registered successfully")
     with app.app_context():
+        existing_tables = set(inspect(db.engine).get_table_names())
+        had_attachment_refs = "attachment_ref" in existing_tables
+        had_managed_files = "managed_file" in existing_tables
         db.create_all()
         inspector = inspect(db.engine)
         date_time_type = (
@@ -3567,6 +3982,17 @@ def setup_auth(app):
                         )
                     )
                 app.logger.info("Added missing user_settings.automatic_web_search column")
+        if "chat_message" in inspector.get_table_names():
+            message_columns = {column["name"] for column in inspector.get_columns("chat_message")}
+            if "revision" not in message_columns:
+                with db.engine.begin() as connection:
+                    connection.execute(
+                        text(
+                            "ALTER TABLE chat_message ADD COLUMN revision INTEGER DEFAULT 0 NOT NULL"
+                        )
+                    )
+                app.logger.info("Added missing chat_message.revision column")
+        _ensure_chat_search_index(db.engine)
         if "user_chat_history" in inspector.get_table_names():
             chat_columns = {column["name"] for column in inspector.get_columns("user_chat_history")}
             chat_source_columns = {
@@ -3581,6 +4007,24 @@ def setup_auth(app):
                     "ALTER TABLE user_chat_history "
                     "ADD COLUMN source_context_data TEXT DEFAULT '{}' NOT NULL"
                 ),
+                "revision": (
+                    "ALTER TABLE user_chat_history ADD COLUMN revision INTEGER DEFAULT 0 NOT NULL"
+                ),
+                "active_path_data": "ALTER TABLE user_chat_history ADD COLUMN active_path_data TEXT",
+                "context_summary_data": (
+                    "ALTER TABLE user_chat_history ADD COLUMN context_summary_data TEXT"
+                ),
+                "last_message_preview": (
+                    "ALTER TABLE user_chat_history ADD COLUMN last_message_preview VARCHAR(120)"
+                ),
+                "message_count": "ALTER TABLE user_chat_history ADD COLUMN message_count INTEGER",
+                "last_activity_at": (
+                    f"ALTER TABLE user_chat_history ADD COLUMN last_activity_at {date_time_type}"
+                ),
+                "has_attachments": (
+                    "ALTER TABLE user_chat_history "
+                    "ADD COLUMN has_attachments BOOLEAN DEFAULT FALSE NOT NULL"
+                ),
             }
             missing_chat_source_columns = [
                 ddl
@@ -3641,10 +4085,19 @@ def setup_auth(app):
                     )
                 app.logger.info("Added missing user_chat_history.mind_id column")
             ensure_chat_session_uniqueness(db.engine)
+        # create_all() skips indexes of tables that already exist.
+        for model in (UserChatHistory, Mind, MindPin):
+            for index in model.__table__.indexes:
+                if index.name in LISTING_KEYSET_INDEXES:
+                    index.create(db.engine, checkfirst=True)
         # ORM backfills must run only after every compatibility column above exists.
         # Otherwise SQLAlchemy selects the full current model from a legacy table and
         # fails before the schema upgrader gets a chance to add missing columns.
         _ensure_auth_identity_backfill(app)
         _remove_legacy_default_minds(app)
+        if not had_attachment_refs:
+            _backfill_attachment_refs(app)
+        if not had_managed_files:
+            _backfill_managed_files(app)
         app.logger.info("Database tables created successfully")
     register_auth_routes(app)
@@ -0,0 +1,77 @@
+"""Cooperative blocking I/O for the gevent serving mode.
+
+With ``GUNICORN_WORKER_CLASS=gevent`` every request runs on a greenlet of a
+monkey-patched worker. Pure-Python sockets (the Gemini HTTP client, ``requests``,
+redis) then yield on their own; libraries doing their I/O in C do not. psycopg2
+gets a wait callback, gRPC its gevent integration, and native calls such as the
+DDGS search client are moved to the hub's thread pool with ``run_blocking``.
+In the threaded worker all of this is a no-op.
+"""
+
+from __future__ import annotations
+
+import sys
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+def gevent_active() -> bool:
+    if "gevent" not in sys.modules:
+        return False
+    from gevent import monkey
+
+    return bool(monkey.is_module_patched("socket"))
+
+
+def _psycopg2_wait(connection: Any, timeout: float | None = None) -> None:
+    from gevent.socket import wait_read, wait_write
+    from psycopg2 import OperationalError, extensions
+
+    while True:
+        state = connection.poll()
+        if state == extensions.POLL_OK:
+            return
+        if state == extensions.POLL_READ:
+            wait_read(connection.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(connection.fileno(), timeout=timeout)
+        else:
+            raise OperationalError(f"Bad result from poll: {state!r}")
+
+
+def make_blocking_libraries_cooperative() -> bool:
+    """Hook C-level I/O into the gevent hub; call before the app opens connections."""
+    if not gevent_active():
+        return False
+    try:
+        from psycopg2 import extensions
+    except ImportError:
+        pass
+    else:
+        extensions.set_wait_callback(_psycopg2_wait)
+    try:
+        from grpc.experimental import gevent as grpc_gevent
+    except ImportError:
+        pass
+    else:
+        grpc_gevent.init_gevent()
+    return True
+
+
+def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Call ``func`` on a native thread when it would otherwise stall every greenlet."""
+    if not gevent_active():
+        return func(*args, **kwargs)
+    import gevent
+
+    return gevent.get_hub().threadpool.apply(func, args, kwargs)
+
+
+def release_idle_db_connection() -> None:
+    """End a read-only transaction so a long provider wait does not pin a pooled connection."""
+    from utils.auth import db
+
+    session = db.session
+    if session.in_transaction() and not (session.new or session.dirty or session.deleted):
+        session.commit()
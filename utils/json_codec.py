@@ -0,0 +1,77 @@
+"""JSON encoding for chat hot paths.
+
+SSE frames, stored message payloads, guest chat rows and tool outputs are
+encoded several times per turn. ``orjson`` is used when installed; otherwise the
+stdlib ``json`` module. Both backends emit compact, non-ASCII-escaped JSON that
+parses to the same values. Anything ``orjson`` rejects (integers beyond 64 bits,
+invalid surrogates, very deep nesting) falls back to the stdlib so callers see
+stdlib behaviour and exceptions. ``orjson`` writes ``NaN`` and infinities as
+``null`` instead of rejecting them, so values holding such floats are encoded by
+the stdlib too and keep their ``NaN``/``Infinity`` literals.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from collections.abc import Callable
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+if orjson is not None:
+    # Datetimes and dataclasses go through ``default`` like they do with the
+    # stdlib, so ``default=str`` keeps producing the same strings.
+    _ORJSON_OPTIONS = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+
+def _stdlib_dumps(value: Any, sort_keys: bool, default: Callable[[Any], Any] | None) -> str:
+    return json.dumps(
+        value, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys, default=default
+    )
+
+
+def _has_non_finite_float(value: Any) -> bool:
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_has_non_finite_float(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_has_non_finite_float(item) for item in value)
+    return False
+
+
+def dumps(
+    value: Any, *, sort_keys: bool = False, default: Callable[[Any], Any] | None = None
+) -> str:
+    if orjson is not None:
+        options = _ORJSON_OPTIONS | orjson.OPT_SORT_KEYS if sort_keys else _ORJSON_OPTIONS
+        try:
+            encoded = orjson.dumps(value, default=default, option=options)
+        except (orjson.JSONEncodeError, OverflowError):
+            pass
+        else:
+            # Non-finite floats come out as ``null``; only then is the value walked.
+            if b"null" not in encoded or not _has_non_finite_float(value):
+                return encoded.decode("utf-8")
+    return _stdlib_dumps(value, sort_keys, default)
+
+
+def loads(raw: str | bytes | bytearray | memoryview) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # Re-parse with the stdlib: it accepts NaN/Infinity and raises the
+            # json.JSONDecodeError callers already handle.
+            pass
+    if isinstance(raw, memoryview):
+        raw = raw.tobytes()
+    return json.loads(raw)
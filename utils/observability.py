@@ -35,6 +35,105 @@ ERROR_BUDGET_BURN_TOTAL = Counter(
     "Error budget burn events (5xx responses).",
     ["endpoint", "method"],
 )
+CHAT_WRITE_CONFLICTS_TOTAL = Counter(
+    "remind_chat_write_conflicts_total",
+    "Chat graph writes that lost the revision compare-and-swap.",
+    ["operation"],
+)
+CHAT_WRITE_REBASES_TOTAL = Counter(
+    "remind_chat_write_rebases_total",
+    "Chat graph writes committed after rebasing onto a newer revision.",
+    ["operation"],
+)
+CHAT_WRITE_EXHAUSTED_TOTAL = Counter(
+    "remind_chat_write_exhausted_total",
+    "Chat graph writes abandoned after exhausting retries.",
+    ["operation"],
+)
+CHAT_WRITE_ATTEMPTS = Histogram(
+    "remind_chat_write_attempts",
+    "Attempts needed to commit a chat graph write.",
+    ["operation"],
+    buckets=(1, 2, 3, 4, 6, 8, 12, 20),
+)
+
+SESSION_LOCK_WAIT_DURATION = Histogram(
+    "remind_session_lock_wait_seconds",
+    "Time spent waiting for a chat session write lock.",
+    ["backend"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+SESSION_LOCK_TIMEOUTS_TOTAL = Counter(
+    "remind_session_lock_timeouts_total",
+    "Chat session write locks that could not be acquired in time.",
+    ["backend"],
+)
+
+SESSION_SEARCH_DURATION = Histogram(
+    "remind_session_search_seconds",
+    "Time spent counting and fetching a page of session search results.",
+    ["backend"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+CHAT_CONTEXT_MESSAGES_DROPPED = Histogram(
+    "remind_chat_context_messages_dropped",
+    "History messages replaced by the rolling summary in a model request.",
+    buckets=(0, 10, 25, 50, 100, 250, 500, 1000, 2500),
+)
+CHAT_CONTEXT_SUMMARY_REFRESHES_TOTAL = Counter(
+    "remind_chat_context_summary_refreshes_total",
+    "Background rolling summary refreshes by outcome.",
+    ["result"],
+)
+SHARE_SNAPSHOT_REQUESTS_TOTAL = Counter(
+    "remind_share_snapshot_requests_total",
+    "Public share views by snapshot outcome (hit, miss, not_modified).",
+    ["result"],
+)
+UPLOAD_DEDUP_TOTAL = Counter(
+    "remind_upload_dedup_total",
+    "Chat uploads by whether their content was already stored and validated (hit, miss).",
+    ["result"],
+)
+MODEL_PART_CACHE_REQUESTS_TOTAL = Counter(
+    "remind_model_part_cache_requests_total",
+    "Restored history attachments by prepared-part cache outcome (hit, disk_hit, miss).",
+    ["result"],
+)
+SESSIONS_BULK_DELETED_TOTAL = Counter(
+    "remind_sessions_bulk_deleted_total",
+    "Chat sessions removed through bulk deletion.",
+)
+CHAT_STREAM_RESUMES_TOTAL = Counter(
+    "remind_chat_stream_resumes_total",
+    "Resume requests for streamed chat responses by outcome (resumed, not_found, expired).",
+    ["result"],
+)
+CHAT_STREAM_REPLAYED_EVENTS_TOTAL = Counter(
+    "remind_chat_stream_replayed_events_total",
+    "Journaled chat stream events delivered through resume requests.",
+)
+CHAT_GENERATIONS_DEDUPLICATED_TOTAL = Counter(
+    "remind_chat_generations_deduplicated_total",
+    "Retried /chat requests attached to the running or finished stream of their request_id.",
+)
+CHAT_GENERATION_JOBS_TOTAL = Counter(
+    "remind_chat_generation_jobs_total",
+    "Streamed chat turns in worker generation mode by outcome (enqueued, inline_fallback).",
+    ["result"],
+)
+MANAGED_FILES_DELETED_TOTAL = Counter(
+    "remind_managed_files_deleted_total",
+    "Unreferenced uploads and generated images removed by the garbage collector.",
+    ["kind"],
+)
+
+
+def observe_chat_write(operation: str, attempts: int) -> None:
+    CHAT_WRITE_ATTEMPTS.labels(operation=operation).observe(attempts)
+    if attempts > 1:
+        CHAT_WRITE_REBASES_TOTAL.labels(operation=operation).inc()
 
 
 def _is_valid_request_id(value: str) -> bool:
@@ -1,5 +1,5 @@
 import hashlib
-import os
+import sqlite3
 from datetime import datetime
 from pathlib import Path
 
@@ -7,10 +7,13 @@ from flask import current_app, has_app_context
 
 from config import CHATS_FOLDER, CREATE_IMAGE_FOLDER, UPLOAD_FOLDER
 from services.attachment_lifecycle import (
-    collect_managed_references,
+    count_managed_references,
     delete_unreferenced_managed_files,
-    merge_managed_references,
+    references_from_counts,
+    release_managed_files,
 )
+from services.attachment_refs import clear_upload_access_cache
+from services.guest_chat_store import get_guest_chat_store
 from utils.responses import logger
 
 SERVICE_IMPROVEMENT_SETTING_KEY = "service_improvement_opt_in"
@@ -45,6 +48,7 @@ def get_user_data_locations(user_id):
             "user",
             "user_settings",
             "user_chat_history",
+            "chat_message",
             "ai_response_feedback",
             "chat_share",
             "mind",
@@ -149,8 +153,13 @@ def delete_user_data(user_id, delete_account=False):
     from utils.auth import (
         AIResponseFeedback,
         AppleAuthChallenge,
+        AttachmentRef,
         AuthIdentity,
+        ChatDeleteJob,
+        ChatMessage,
+        ChatSearchDocument,
         ChatShare,
+        ChatShareSnapshot,
         GitHubAgentTask,
         GitHubInstallation,
         Mind,
@@ -168,6 +177,7 @@ def delete_user_data(user_id, delete_account=False):
     }
 
     try:
+        ChatDeleteJob.query.filter_by(user_id=user_id).delete()
         github_tasks_deleted = GitHubAgentTask.query.filter_by(user_id=user_id).delete()
         results["items_deleted"]["github_agent_tasks"] = github_tasks_deleted
         github_installations_deleted = GitHubInstallation.query.filter_by(user_id=user_id).delete()
@@ -178,9 +188,18 @@ def delete_user_data(user_id, delete_account=False):
         results["items_deleted"]["ai_response_feedback"] = feedback_deleted
         chats = UserChatHistory.query.filter_by(user_id=user_id).all()
         chat_session_ids = [chat.session_id for chat in chats]
-        managed_references = merge_managed_references(
-            *(collect_managed_references(chat.get_messages()) for chat in chats)
+        managed_counts = count_managed_references(
+            message for chat in chats for message in chat.get_messages()
         )
+        managed_references = references_from_counts(managed_counts)
+        release_managed_files(managed_counts)
+        if chats:
+            ChatMessage.query.filter(ChatMessage.chat_id.in_([chat.id for chat in chats])).delete(
+                synchronize_session=False
+            )
+        ChatSearchDocument.query.filter_by(user_id=user_id).delete()
+        ChatShareSnapshot.query.filter_by(user_id=user_id).delete()
+        AttachmentRef.query.filter_by(user_id=user_id).delete()
         chats_deleted = UserChatHistory.query.filter_by(user_id=user_id).delete()
         results["items_deleted"]["chats"] = chats_deleted
         owned_mind_ids = [mind.id for mind in Mind.query.filter_by(user_id=user_id).all()]
@@ -212,17 +231,16 @@ def delete_user_data(user_id, delete_account=False):
                 results["account_deleted"] = True
 
         db.session.commit()
+        clear_upload_access_cache()
 
         files_deleted = 0
         chats_folder = _configured_folder("CHATS_FOLDER", CHATS_FOLDER)
         for session_id in chat_session_ids:
             try:
                 safe_id = "".join(c for c in session_id if c.isalnum() or c in "-_")
-                chat_file = chats_folder / f"{safe_id}.json"
-                if chat_file.exists():
-                    os.remove(chat_file)
+                if safe_id and get_guest_chat_store(chats_folder).delete(safe_id):
                     files_deleted += 1
-            except OSError:
+            except (OSError, sqlite3.Error):
                 logger.warning("Could not remove a legacy chat file", exc_info=True)
         results["items_deleted"]["chat_files"] = files_deleted
         try:
@@ -252,7 +270,10 @@ def anonymize_user_data(user_id):
     from utils.auth import (
         AIResponseFeedback,
         AppleAuthChallenge,
+        AttachmentRef,
         AuthIdentity,
+        ChatSearchDocument,
+        ChatShareSnapshot,
         GitHubAgentTask,
         GitHubInstallation,
         User,
@@ -280,12 +301,23 @@ def anonymize_user_data(user_id):
     UserSettings.query.filter_by(user_id=user_id).delete()
     AIResponseFeedback.query.filter_by(user_id=user_id).delete()
     chats = UserChatHistory.query.filter_by(user_id=user_id).all()
-    managed_references = merge_managed_references(
-        *(collect_managed_references(chat.get_messages()) for chat in chats)
+    managed_counts = count_managed_references(
+        message for chat in chats for message in chat.get_messages()
     )
+    managed_references = references_from_counts(managed_counts)
+    release_managed_files(managed_counts)
     for chat in chats:
         chat.title = "Deleted Chat"
-        chat.messages_data = "[]"
+        chat.set_messages([])
+        chat.revision = UserChatHistory.revision + 1
+        chat.last_message_preview = ""
+        chat.message_count = 0
+        chat.has_attachments = False
+    ChatSearchDocument.query.filter_by(user_id=user_id).update(
+        {"title": "Deleted Chat", "body": ""}, synchronize_session=False
+    )
+    ChatShareSnapshot.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    AttachmentRef.query.filter_by(user_id=user_id).delete(synchronize_session=False)
 
     db.session.commit()
     try:
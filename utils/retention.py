@@ -7,9 +7,10 @@ from pathlib import Path
 from config import CHATS_FOLDER, TEMPORARY_CHAT_RETENTION_DAYS
 from services.attachment_lifecycle import (
     collect_managed_references,
-    delete_unreferenced_managed_files,
+    mark_managed_files_released,
     merge_managed_references,
 )
+from services.guest_chat_store import get_guest_chat_store
 
 
 def prune_guest_chat_files(
@@ -25,6 +26,16 @@ def prune_guest_chat_files(
     deleted = 0
     deleted_references = collect_managed_references({})
 
+    store = get_guest_chat_store(chats_folder)
+    for session_id in store.session_ids(updated_before=cutoff, prefix="guest_"):
+        scanned += 1
+        deleted_references = merge_managed_references(
+            deleted_references, collect_managed_references(store.read(session_id))
+        )
+        if store.delete(session_id):
+            deleted += 1
+
+    # Files not yet imported into the store are still pruned by mtime.
     for path in chats_folder.glob("guest_*.json"):
         scanned += 1
         try:
@@ -42,9 +53,7 @@ def prune_guest_chat_files(
             continue
 
     if deleted:
-        delete_unreferenced_managed_files(
-            deleted_references,
-            chats_folder=chats_folder,
-        )
+        # Files are removed by the next sweep once nothing references them.
+        mark_managed_files_released(deleted_references)
 
     return {"scanned": scanned, "deleted": deleted}
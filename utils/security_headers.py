@@ -7,6 +7,8 @@ from config import BACKEND_URL, CORS_ORIGINS, ENABLE_STRICT_HTTPS
 JSON_LD_SCRIPT_HASH = "'sha256-529wnUTyEzuvHzh9W52mngjs3kPjTj0o1Y74Rgsw7Eg='"
 HTML_PREVIEW_PATH = "/html-preview.html"
 MOBILE_TURNSTILE_PATH = "/api/auth/turnstile/mobile"
+# Public share snapshots are viewer-independent and set their own shared-cache policy.
+PUBLIC_SHARE_SNAPSHOT_PREFIX = "/api/share/"
 
 
 def _origin_from_url(raw_url: str | None) -> str | None:
@@ -140,8 +142,7 @@ def get_permissions_policy():
 
 def apply_security_headers(response):
     is_apple_app_site_association = bool(
-        has_request_context()
-        and request.path == "/.well-known/apple-app-site-association"
+        has_request_context() and request.path == "/.well-known/apple-app-site-association"
     )
     is_html_preview = bool(has_request_context() and request.path == HTML_PREVIEW_PATH)
     if is_html_preview:
@@ -154,9 +155,7 @@ def apply_security_headers(response):
         response.headers["Cross-Origin-Resource-Policy"] = "same-origin"
         return response
 
-    is_mobile_turnstile = bool(
-        has_request_context() and request.path == MOBILE_TURNSTILE_PATH
-    )
+    is_mobile_turnstile = bool(has_request_context() and request.path == MOBILE_TURNSTILE_PATH)
     if is_mobile_turnstile:
         response.headers["Content-Security-Policy"] = get_mobile_turnstile_csp_header()
         response.headers["X-Content-Type-Options"] = "nosniff"
@@ -189,12 +188,25 @@ def apply_security_headers(response):
     content_type = (response.headers.get("Content-Type") or "").lower()
     is_json_response = "application/json" in content_type
     is_api_request = bool(has_request_context() and request.path.startswith("/api/"))
+    is_public_share_snapshot = bool(
+        has_request_context()
+        and request.path.startswith(PUBLIC_SHARE_SNAPSHOT_PREFIX)
+        and response.status_code in (200, 304)
+        and "Set-Cookie" not in response.headers
+    )
     if response.status_code in (401, 403) or (
-        not is_apple_app_site_association and (is_json_response or is_api_request)
+        not is_apple_app_site_association
+        and not is_public_share_snapshot
+        and (is_json_response or is_api_request)
     ):
         response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, private"
         response.headers["Pragma"] = "no-cache"
         response.headers["Expires"] = "0"
+    if response.cache_control.public and "Set-Cookie" in response.headers:
+        # A shared cache would hand this viewer's cookies to everyone else.
+        response.cache_control.public = False
+        response.cache_control.s_maxage = None
+        response.cache_control.private = True
 
     return response
 
@@ -16,10 +16,17 @@ SESSIONLESS_REQUEST_PATHS = frozenset(
         "/.well-known/security.txt",
     }
 )
+# Public share views are cached by shared caches, so they must not carry any
+# viewer's session or CSRF cookie.
+SESSIONLESS_REQUEST_PREFIXES = ("/api/share/", "/c/")
 
 
 def is_sessionless_request() -> bool:
-    return has_request_context() and request.path in SESSIONLESS_REQUEST_PATHS
+    if not has_request_context():
+        return False
+    return request.path in SESSIONLESS_REQUEST_PATHS or request.path.startswith(
+        SESSIONLESS_REQUEST_PREFIXES
+    )
 
 
 def _extract_hostname(raw_host: str | None) -> str:
@@ -77,6 +84,13 @@ class RequestAwareSessionInterface(SecureCookieSessionInterface):
             return False
         return super().should_set_cookie(app, session)
 
+    def save_session(self, app, session, response):
+        # Skipping the save also keeps ``Vary: Cookie`` and cookie deletions off
+        # responses that do not depend on the viewer.
+        if is_sessionless_request():
+            return None
+        return super().save_session(app, session, response)
+
 
 def regenerate_session():
     session_data = dict(session)
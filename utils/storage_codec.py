@@ -0,0 +1,98 @@
+"""Versioned codec for bulky conversation payload fields at rest.
+
+Canvas documents, web sources and tool artifacts dominate stored message size.
+``pack_message_payload`` writes compact JSON and replaces every top-level field
+larger than ``STORAGE_COMPRESSION_MIN_BYTES`` with a string of the form
+``rmz1:<codec>:<base64>``. ``parts`` stays plain so text search and attachment
+reference lookups keep working on the stored column. Decoding accepts legacy
+uncompressed JSON, so existing rows migrate lazily as they are rewritten.
+
+zstd is used when the optional ``zstandard`` package is installed; otherwise zlib.
+"""
+
+from __future__ import annotations
+
+import base64
+import zlib
+from typing import Any
+
+from config import STORAGE_COMPRESSION_MIN_BYTES
+from utils import json_codec
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+MAGIC = "rmz1:"
+UNCOMPRESSED_FIELDS = frozenset({"id", "role", "parts", "timestamp", "request_id"})
+
+_ZSTD_LEVEL = 6
+_ZLIB_LEVEL = 6
+
+
+def _dumps(value: Any) -> str:
+    return json_codec.dumps(value)
+
+
+def _compress(raw: bytes) -> tuple[str, bytes]:
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, _ZLIB_LEVEL)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("zstandard is required to decode this payload")
+        try:
+            return zstandard.ZstdDecompressor().decompress(data)
+        except zstandard.ZstdError as exc:
+            # ZstdError is not a ValueError; payload readers skip rows on ValueError.
+            raise ValueError(f"corrupt zstd payload: {exc}") from exc
+    raise ValueError(f"unknown storage codec: {codec}")
+
+
+def is_encoded(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(MAGIC)
+
+
+def encode_value(value: Any) -> str:
+    codec, data = _compress(_dumps(value).encode("utf-8"))
+    return f"{MAGIC}{codec}:{base64.b64encode(data).decode('ascii')}"
+
+
+def decode_value(encoded: str) -> Any:
+    codec, _, data = encoded[len(MAGIC) :].partition(":")
+    return json_codec.loads(_decompress(codec, base64.b64decode(data)))
+
+
+def pack_message_payload(payload: dict[str, Any]) -> str:
+    if STORAGE_COMPRESSION_MIN_BYTES <= 0:
+        return _dumps(payload)
+    packed: dict[str, Any] = {}
+    for key, value in payload.items():
+        if key in UNCOMPRESSED_FIELDS or isinstance(value, (bool, int, float)) or value is None:
+            packed[key] = value
+            continue
+        serialized = _dumps(value)
+        if len(serialized.encode("utf-8")) < STORAGE_COMPRESSION_MIN_BYTES:
+            packed[key] = value
+            continue
+        encoded = encode_value(value)
+        packed[key] = encoded if len(encoded) < len(serialized) else value
+    return _dumps(packed)
+
+
+def unpack_message_payload(raw: str | bytes | None) -> dict[str, Any]:
+    if not raw:
+        return {}
+    parsed = json_codec.loads(raw)
+    if not isinstance(parsed, dict):
+        return {}
+    for key, value in parsed.items():
+        if is_encoded(value):
+            parsed[key] = decode_value(value)
+    return parsed
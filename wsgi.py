@@ -6,6 +6,9 @@ sys.path.insert(0, str(base_dir))
 
 
 def create_application():
+    from utils.concurrency import make_blocking_libraries_cooperative
+
+    make_blocking_libraries_cooperative()
     from main import create_app
 
     return create_app()